@@ -0,0 +1,136 @@
+import json
+from datetime import datetime
+from sqlalchemy import func
+from database import insert_ignoring_conflict
+from models import CategoryStats, UserAchievements, UserStats
+from user_stats import current_streak
+
+# Server-side achievements.
+#
+# Every achievement is a threshold on a metric of the user's stats rows,
+# which are already kept up to date incrementally on each expense write
+# (see user_stats.py). After each write applies its stats deltas,
+# update_achievements records any newly reached thresholds and the longest
+# streak in the user's single user_achievements row. Unlocks are kept when
+# a later delete takes a metric back below its target.
+#
+# get_achievements combines that row with the stats rows. That is three
+# small lookups, whatever the size of the user's history, so clients no
+# longer need the expense list to show progress.
+
+# Metrics: expenses (count), amount (total tracked), streak (longest run of
+# consecutive days), categories (categories used), category_expenses
+# (expenses in the busiest category)
+ACHIEVEMENTS = (
+    {"id": "first_expense", "title": "First Steps", "description": "Add your first expense",
+     "rarity": "common", "metric": "expenses", "target": 1},
+    {"id": "ten_expenses", "title": "Getting Started", "description": "Track 10 expenses",
+     "rarity": "common", "metric": "expenses", "target": 10},
+    {"id": "hundred_expenses", "title": "Dedicated Tracker", "description": "Track 100 expenses",
+     "rarity": "rare", "metric": "expenses", "target": 100},
+    {"id": "thousand_expenses", "title": "Ledger Legend", "description": "Track 1,000 expenses",
+     "rarity": "legendary", "metric": "expenses", "target": 1000},
+    {"id": "week_streak", "title": "Week Warrior", "description": "Track expenses for 7 consecutive days",
+     "rarity": "rare", "metric": "streak", "target": 7},
+    {"id": "month_streak", "title": "Monthly Master", "description": "Track expenses for 30 consecutive days",
+     "rarity": "epic", "metric": "streak", "target": 30},
+    {"id": "tracked_1000", "title": "Money Mapper", "description": "Track $1,000 of spending",
+     "rarity": "rare", "metric": "amount", "target": 1000},
+    {"id": "tracked_10000", "title": "Big Picture", "description": "Track $10,000 of spending",
+     "rarity": "epic", "metric": "amount", "target": 10000},
+    {"id": "category_explorer", "title": "Category Explorer", "description": "Track expenses in 5 categories",
+     "rarity": "rare", "metric": "categories", "target": 5},
+    {"id": "category_specialist", "title": "Category Specialist",
+     "description": "Track 50 expenses in one category",
+     "rarity": "epic", "metric": "category_expenses", "target": 50},
+)
+RARITY_POINTS = {'common': 10, 'rare': 25, 'epic': 50, 'legendary': 100}
+
+def _get_stats(db, user_id):
+    return db.query(
+        UserStats.total_expenses, UserStats.total_amount, UserStats.streak_days, UserStats.last_expense_date
+    ).filter(UserStats.user_id == user_id).first()
+
+def _metrics(db, user_id, stats, best_streak):
+    categories, category_expenses = db.query(
+        func.count(CategoryStats.id), func.max(CategoryStats.total_expenses)
+    ).filter(CategoryStats.user_id == user_id, CategoryStats.total_expenses > 0).one()
+    expenses, amount, streak = (stats.total_expenses, stats.total_amount, stats.streak_days) if stats else (0, 0, 0)
+    return {
+        "expenses": expenses or 0,
+        "amount": amount or 0.0,
+        "streak": max(streak or 0, best_streak),
+        "categories": categories,
+        "category_expenses": category_expenses or 0
+    }
+
+def _get_or_create_row(db, user_id):
+    query = db.query(UserAchievements).filter(UserAchievements.user_id == user_id).with_for_update()
+    row = query.first()
+    if not row:
+        insert_ignoring_conflict(db, UserAchievements, {
+            'user_id': user_id,
+            'unlocked': '{}',
+            'best_streak': 0
+        }, ['user_id'])
+        row = query.first()
+    return row
+
+def update_achievements(db, user_id):
+    """Record the achievements the user's stats now reach, returning the ids
+    of new unlocks
+
+    Runs after the stats deltas of an expense write; the caller commits.
+    """
+    # Stats deltas are SQL expressions until flushed
+    db.flush()
+    row = _get_or_create_row(db, user_id)
+    metrics = _metrics(db, user_id, _get_stats(db, user_id), row.best_streak)
+    unlocked = json.loads(row.unlocked)
+    now = datetime.utcnow().isoformat()
+    new = {
+        achievement["id"]: now for achievement in ACHIEVEMENTS
+        if achievement["id"] not in unlocked and metrics[achievement["metric"]] >= achievement["target"]
+    }
+    if metrics["streak"] > row.best_streak:
+        row.best_streak = metrics["streak"]
+    if new:
+        row.unlocked = json.dumps({**unlocked, **new})
+    return list(new)
+
+def get_achievements(db, user_id, today=None):
+    """Body of /api/achievements: every achievement with its progress, plus
+    points and streaks
+
+    Thresholds already reached but not recorded yet, while the derived job
+    is pending or for users who have not written since achievements were
+    added, show as unlocked without an unlock time.
+    """
+    row = db.query(UserAchievements.unlocked, UserAchievements.best_streak).filter(
+        UserAchievements.user_id == user_id
+    ).first()
+    unlocked = json.loads(row.unlocked) if row else {}
+    stats = _get_stats(db, user_id)
+    metrics = _metrics(db, user_id, stats, row.best_streak if row else 0)
+
+    achievements = []
+    points = 0
+    for achievement in ACHIEVEMENTS:
+        current = metrics[achievement["metric"]]
+        is_unlocked = achievement["id"] in unlocked or current >= achievement["target"]
+        if is_unlocked:
+            points += RARITY_POINTS[achievement["rarity"]]
+        achievements.append({
+            **{key: value for key, value in achievement.items() if key != "metric"},
+            "current": round(current, 2),
+            "progress": 100 if is_unlocked else int(current * 100 / achievement["target"]),
+            "unlocked": is_unlocked,
+            "unlocked_at": unlocked.get(achievement["id"])
+        })
+    return {
+        "achievements": achievements,
+        "points": points,
+        "unlocked": sum(1 for achievement in achievements if achievement["unlocked"]),
+        "streak_days": current_streak(stats, today),
+        "best_streak": metrics["streak"]
+    }
@@ -0,0 +1,61 @@
+from sqlalchemy import func
+from datetime import datetime, timedelta
+from models import Expense
+
+# Aggregation queries for user statistics. Every function here pushes the
+# work into SQL and only returns scalars or small result sets, so the cost
+# of a stats request does not grow with the size of the user's history.
+
+DAILY_AVERAGE_DAYS = 30
+RECENT_EXPENSES_LIMIT = 10
+
+def get_totals(db, user_id):
+    """Return (expense count, total amount) for a user"""
+    count, total = db.query(
+        func.count(Expense.id),
+        func.coalesce(func.sum(Expense.amount), 0.0)
+    ).filter(Expense.user_id == user_id).one()
+    return count, total
+
+def get_category_totals(db, user_id):
+    """Return a {category: total amount} dict for a user"""
+    rows = db.query(Expense.category, func.sum(Expense.amount)).filter(
+        Expense.user_id == user_id
+    ).group_by(Expense.category).all()
+    return {category: total for category, total in rows}
+
+def get_daily_average(db, user_id, days=DAILY_AVERAGE_DAYS, now=None):
+    """Return the average amount spent per day over the last `days` days"""
+    since = (now or datetime.utcnow()) - timedelta(days=days)
+    total = db.query(func.sum(Expense.amount)).filter(
+        Expense.user_id == user_id,
+        Expense.date >= since
+    ).scalar()
+    return total / days if total is not None else 0
+
+def get_recent_expenses(db, user_id, limit=RECENT_EXPENSES_LIMIT):
+    """Return the user's most recent expenses as dicts"""
+    expenses = db.query(Expense).filter(Expense.user_id == user_id).order_by(
+        Expense.date.desc(), Expense.id.desc()
+    ).limit(limit).all()
+    return [expense.to_dict() for expense in expenses]
+
+def get_stats_summary(db, user_id, now=None):
+    """Compute the /api/stats payload (without streak) in SQL"""
+    count, total_amount = get_totals(db, user_id)
+    if not count:
+        return {
+            "total_expenses": 0,
+            "total_amount": 0,
+            "categories": {},
+            "recent_expenses": [],
+            "daily_average": 0
+        }
+
+    return {
+        "total_expenses": count,
+        "total_amount": total_amount,
+        "categories": get_category_totals(db, user_id),
+        "recent_expenses": get_recent_expenses(db, user_id),
+        "daily_average": get_daily_average(db, user_id, now=now)
+    }
@@ -0,0 +1,185 @@
+import asyncio
+import bisect
+import os
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from cache import LRUCache
+
+# AI tip generation off the request thread.
+#
+# Model calls run on a small thread pool and the request waits at most
+# AI_TIPS_TIMEOUT seconds before answering with a fallback tip. A call that
+# finishes late still fills the cache. Tips are cached by a coarse spending
+# fingerprint, so similar spending profiles share one model call.
+
+AI_TIPS_TIMEOUT = float(os.getenv('AI_TIPS_TIMEOUT', '8'))
+# Upper bound for a model call that keeps running after the deadline
+AI_TIPS_CALL_TIMEOUT = float(os.getenv('AI_TIPS_CALL_TIMEOUT', '30'))
+AI_TIPS_WORKERS = int(os.getenv('AI_TIPS_WORKERS', '4'))
+AI_TIPS_CACHE_SIZE = int(os.getenv('AI_TIPS_CACHE_SIZE', '1000'))
+AI_TIPS_CACHE_TTL = int(os.getenv('AI_TIPS_CACHE_TTL', '3600'))
+
+FALLBACK_TIPS = [
+    "Try the 50/30/20 rule: 50% needs, 30% wants, 20% savings! 💰",
+    "Set up automatic transfers to your savings account on payday! 🎯",
+    "Track every coffee and snack - small expenses add up quickly! ☕",
+    "Use cash for discretionary spending to feel the money leaving your hand! 💳",
+    "Review your subscriptions monthly - cancel what you don't use! 📱"
+]
+
+TOTAL_BUCKETS = [50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000]
+COUNT_BUCKETS = [5, 10, 25, 50, 100, 250, 500, 1000]
+
+def fallback_tip():
+    return {
+        "tip": random.choice(FALLBACK_TIPS),
+        "category": "general"
+    }
+
+def spending_fingerprint(total_spent, top_category, expense_count):
+    """Normalize spending data to (total bucket, top category, count bucket)"""
+    return (
+        bisect.bisect_right(TOTAL_BUCKETS, total_spent),
+        (top_category or '').strip().lower(),
+        bisect.bisect_right(COUNT_BUCKETS, expense_count)
+    )
+
+def format_expenses(expenses):
+    """Render [{category, amount}] compactly, e.g. 'Food $12.50, Bills $40.00'"""
+    return ', '.join(f"{exp['category']} ${exp['amount']:.2f}" for exp in expenses) or 'none'
+
+def build_prompt(total_spent, top_category, expense_count, recent_expenses):
+    return f"""
+        You are a premium financial advisor for Gen-Z students and early earners.
+        Based on the following spending data, provide ONE specific, actionable tip that's:
+        - Practical and easy to implement immediately
+        - Relevant to their specific spending patterns
+        - Encouraging and positive in tone
+        - Include an emoji for Gen-Z appeal
+        - Focus on building wealth and financial independence
+
+        User Profile:
+        - Spending Data: ${total_spent:.2f} total
+        - Top Category: {top_category[0] if top_category else 'N/A'} (${top_category[1] if top_category else 0:.2f})
+        - Transaction Count: {expense_count}
+
+        Recent expenses: {format_expenses(recent_expenses)}
+
+        Provide your response in this exact format:
+        Tip: [Your specific, actionable tip here] 💡
+        Category: [spending/saving/investing/general]
+        """
+
+def parse_tip(ai_response):
+    """Parse the model's 'Tip: ... Category: ...' answer"""
+    ai_response = ai_response.strip()
+    if "Tip:" in ai_response and "Category:" in ai_response:
+        return {
+            "tip": ai_response.split("Category:")[0].replace("Tip:", "").strip(),
+            "category": ai_response.split("Category:")[1].strip()
+        }
+    # Fallback if parsing fails
+    return {
+        "tip": ai_response,
+        "category": "general"
+    }
+
+class TipGenerator:
+    """Generate tips with a deadline, a bounded pool and a fingerprint cache"""
+
+    def __init__(self, model, timeout=AI_TIPS_TIMEOUT, workers=AI_TIPS_WORKERS, cache=None):
+        self.model = model
+        self.timeout = timeout
+        self.cache = cache if cache is not None else LRUCache(max_entries=AI_TIPS_CACHE_SIZE)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ai-tips')
+        # Calls beyond this are answered with a fallback instead of queueing
+        self._slots = threading.BoundedSemaphore(workers * 2)
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def _generate(self, prompt):
+        try:
+            response = self.model.generate_content(
+                prompt,
+                request_options={"timeout": AI_TIPS_CALL_TIMEOUT}
+            )
+            return parse_tip(response.text)
+        finally:
+            self._slots.release()
+
+    def _submit(self, key, prompt):
+        """Start (or join) the model call for a fingerprint"""
+        with self._lock:
+            future = self._pending.get(key)
+            if future is not None:
+                return future
+            if not self._slots.acquire(blocking=False):
+                return None
+            future = self._executor.submit(self._generate, prompt)
+            self._pending[key] = future
+
+        def store(done):
+            with self._lock:
+                self._pending.pop(key, None)
+            if done.cancelled():
+                # _generate never ran, so its slot was never released
+                self._slots.release()
+            elif done.exception() is None:
+                self.cache.set(key, done.result(), ttl=AI_TIPS_CACHE_TTL)
+
+        future.add_done_callback(store)
+        return future
+
+    def _start(self, total_spent, categories, expense_count, recent_expenses):
+        """Return (cached tip, None) or (None, future of the model call);
+        the future is None when no call slot is free"""
+        top_category = max(categories.items(), key=lambda x: x[1]) if categories else None
+        key = spending_fingerprint(total_spent, top_category[0] if top_category else None, expense_count)
+
+        cached = self.cache.get(key)
+        if cached:
+            return cached, None
+
+        prompt = build_prompt(total_spent, top_category, expense_count, recent_expenses)
+        return None, self._submit(key, prompt)
+
+    def get_tip(self, total_spent, categories, expense_count, recent_expenses):
+        """Return a tip dict, falling back when the model is slow or failing"""
+        tip, future = self._start(total_spent, categories, expense_count, recent_expenses)
+        if tip:
+            return tip
+        if future is None:
+            return fallback_tip()
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            print(f"AI Tips timed out after {self.timeout}s, using fallback tip")
+            return fallback_tip()
+        except Exception as e:
+            print(f"AI Tips Error: {str(e)}")
+            return fallback_tip()
+
+    async def get_tip_async(self, total_spent, categories, expense_count, recent_expenses):
+        """get_tip for the event loop: the model call still runs on the
+        pool, and the loop serves other requests while it waits"""
+        tip, future = self._start(total_spent, categories, expense_count, recent_expenses)
+        if tip:
+            return tip
+        if future is None:
+            return fallback_tip()
+        try:
+            # Shielded so the deadline does not cancel the call, which
+            # still fills the cache when it finishes late
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), self.timeout)
+        except asyncio.TimeoutError:
+            print(f"AI Tips timed out after {self.timeout}s, using fallback tip")
+            return fallback_tip()
+        except Exception as e:
+            print(f"AI Tips Error: {str(e)}")
+            return fallback_tip()
+
+    def shutdown(self, wait=True):
+        """Cancel queued calls and stop the pool; running calls finish
+        within AI_TIPS_CALL_TIMEOUT"""
+        self._executor.shutdown(wait=wait, cancel_futures=True)
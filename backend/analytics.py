@@ -0,0 +1,194 @@
+import os
+from datetime import datetime, timedelta
+import numpy as np
+from models import ExpenseRollup
+
+# Vectorized spending analytics for /api/insights.
+#
+# A user's rollup rows (see rollups.py) over the analysis window are loaded
+# into a days x categories matrix, and every insight is computed with NumPy
+# array operations on it. The cost depends on the window length and the
+# number of categories, not on how many expenses the user has.
+#
+# NumPy takes ~100ms to import, so app.py imports this module on first use.
+
+# Days of history analysed, ending today and extended back to the start
+# of the first month
+INSIGHTS_WINDOW_DAYS = int(os.getenv('INSIGHTS_WINDOW_DAYS', '365'))
+# Trailing days of the daily series returned to clients
+INSIGHTS_SERIES_DAYS = 90
+MOVING_AVERAGE_DAYS = (7, 30)
+# A category day is anomalous when its amount is this many standard
+# deviations above the category's mean over the days it had spending
+ANOMALY_ZSCORE = 2.5
+# Categories with fewer spending days have no meaningful deviation
+ANOMALY_MIN_DAYS = 5
+MAX_ANOMALIES = 10
+# Trailing days the forecast trend line is fitted on
+FORECAST_FIT_DAYS = 90
+
+class SpendingMatrix:
+    """Daily spending per category: amounts[day index, category index]"""
+
+    def __init__(self, start, amounts, categories):
+        self.start = start
+        self.amounts = amounts
+        self.categories = categories
+
+    @property
+    def days(self):
+        return np.arange(self.amounts.shape[0]) + np.datetime64(self.start, 'D')
+
+    @property
+    def daily_totals(self):
+        return self.amounts.sum(axis=1)
+
+def load_spending_matrix(db, user_id, start, end):
+    """Load the rollup rows between the start and end days into a
+    SpendingMatrix covering every day of the range"""
+    rows = db.query(ExpenseRollup.day, ExpenseRollup.category, ExpenseRollup.total_amount).filter(
+        ExpenseRollup.user_id == user_id,
+        ExpenseRollup.day >= start,
+        ExpenseRollup.day <= end
+    ).all()
+    categories = sorted({category for _, category, _ in rows})
+    amounts = np.zeros(((end - start).days + 1, len(categories)))
+    if rows:
+        category_index = {category: i for i, category in enumerate(categories)}
+        day_offsets = np.array([(day - start).days for day, _, _ in rows])
+        columns = np.array([category_index[category] for _, category, _ in rows])
+        np.add.at(amounts, (day_offsets, columns), np.array([amount for _, _, amount in rows]))
+    return SpendingMatrix(start, amounts, categories)
+
+def moving_average(values, window):
+    """Trailing mean over `window` values; shorter at the start of the series"""
+    sums = np.cumsum(values)
+    sums[window:] = sums[window:] - sums[:-window]
+    counts = np.minimum(np.arange(1, len(values) + 1), window)
+    return sums / counts
+
+def monthly_totals(matrix):
+    """Return (month starts as datetime64[M], total spent per month)"""
+    months = matrix.days.astype('datetime64[M]')
+    month_index = (months - months[0]).astype(int)
+    totals = np.bincount(month_index, weights=matrix.daily_totals)
+    return np.arange(len(totals)) + months[0], totals
+
+def month_over_month(totals):
+    """Absolute and relative change of each month against the previous one;
+    the relative change is NaN where the previous month had no spending"""
+    previous = np.concatenate(([np.nan], totals[:-1]))
+    change = totals - previous
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.where(previous > 0, change / previous, np.nan)
+    return change, ratio
+
+def category_anomalies(matrix, threshold=ANOMALY_ZSCORE, min_days=ANOMALY_MIN_DAYS):
+    """Return (day index, category index, z-score) arrays for category days
+    spending more than threshold deviations above the category's mean"""
+    amounts = matrix.amounts
+    active = amounts > 0
+    counts = active.sum(axis=0)
+    safe_counts = np.maximum(counts, 1)
+    means = amounts.sum(axis=0) / safe_counts
+    variances = np.where(active, (amounts - means) ** 2, 0.0).sum(axis=0) / safe_counts
+    stds = np.sqrt(variances)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scores = np.where(active & (stds > 0), (amounts - means) / stds, 0.0)
+    scores[:, counts < min_days] = 0.0
+    day_index, category_index = np.nonzero(scores > threshold)
+    return day_index, category_index, scores[day_index, category_index]
+
+def forecast_month(matrix, today, fit_days=FORECAST_FIT_DAYS):
+    """Project this month's total from a linear trend of recent daily totals
+
+    Returns (spent so far this month, projected month total, trend per day).
+    """
+    totals = matrix.daily_totals
+    today_index = (today - matrix.start).days
+    recent = totals[max(0, today_index + 1 - fit_days):today_index + 1]
+    x = np.arange(len(recent))
+    if len(recent) >= 2 and recent.any():
+        slope, intercept = np.polyfit(x, recent, 1)
+    else:
+        slope, intercept = 0.0, float(recent.mean()) if len(recent) else 0.0
+
+    month_start = today.replace(day=1)
+    next_month = (month_start + timedelta(days=32)).replace(day=1)
+    start_index = max(0, (month_start - matrix.start).days)
+    spent = float(totals[start_index:today_index + 1].sum())
+    remaining = np.arange(1, (next_month - today).days) + len(recent) - 1
+    projected = np.clip(slope * remaining + intercept, 0.0, None).sum()
+    return spent, spent + float(projected), float(slope)
+
+def compute_insights(db, user_id, today=None, window_days=INSIGHTS_WINDOW_DAYS):
+    """Build the /api/insights payload for a user"""
+    today = today or datetime.utcnow().date()
+    # Start on a month boundary so the first month total is complete
+    start = (today - timedelta(days=window_days - 1)).replace(day=1)
+    matrix = load_spending_matrix(db, user_id, start, today)
+    totals = matrix.daily_totals
+    day_labels = matrix.days.astype(str).tolist()
+
+    series_start = max(0, len(totals) - INSIGHTS_SERIES_DAYS)
+    averages = {window: moving_average(totals, window) for window in MOVING_AVERAGE_DAYS}
+    daily = [
+        {
+            "day": day_labels[i],
+            "total": float(totals[i]),
+            **{f"ma{window}": float(averages[window][i]) for window in MOVING_AVERAGE_DAYS}
+        }
+        for i in range(series_start, len(totals))
+    ]
+
+    months, month_totals = monthly_totals(matrix)
+    change, ratio = month_over_month(month_totals)
+    monthly = [
+        {
+            "month": str(months[i]),
+            "total": float(month_totals[i]),
+            "change": None if np.isnan(change[i]) else float(change[i]),
+            "change_pct": None if np.isnan(ratio[i]) else float(ratio[i] * 100)
+        }
+        for i in range(len(months))
+    ]
+
+    category_totals = matrix.amounts.sum(axis=0)
+    grand_total = category_totals.sum()
+    order = np.argsort(-category_totals, kind='stable')
+    categories = [
+        {
+            "category": matrix.categories[i],
+            "total": float(category_totals[i]),
+            "share": float(category_totals[i] / grand_total) if grand_total else 0.0
+        }
+        for i in order
+    ]
+
+    day_index, category_index, scores = category_anomalies(matrix)
+    strongest = np.argsort(-scores, kind='stable')[:MAX_ANOMALIES]
+    anomalies = [
+        {
+            "day": day_labels[day_index[i]],
+            "category": matrix.categories[category_index[i]],
+            "amount": float(matrix.amounts[day_index[i], category_index[i]]),
+            "zscore": float(scores[i])
+        }
+        for i in strongest
+    ]
+
+    spent, projected, trend = forecast_month(matrix, today)
+    return {
+        "start": start.isoformat(),
+        "end": today.isoformat(),
+        "daily": daily,
+        "monthly": monthly,
+        "categories": categories,
+        "anomalies": anomalies,
+        "forecast": {
+            "month": today.strftime('%Y-%m'),
+            "spent_to_date": spent,
+            "projected_total": projected,
+            "daily_trend": trend
+        }
+    }
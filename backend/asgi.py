@@ -0,0 +1,295 @@
+import asyncio
+import contextvars
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from asgiref.sync import ThreadSensitiveContext
+from asgiref.wsgi import WsgiToAsgi
+from limits import parse
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from werkzeug.http import parse_etags, quote_etag
+import clients
+from ai_tips import fallback_tip
+from app import (
+    CORS_EXPOSE_HEADERS, CORS_ORIGINS, DEFAULT_RATE_LIMITS, SECURITY_HEADERS, SERVER_TIMING, STATS_MAX_AGE,
+    TIPS_RATE_LIMIT, create_app, limiter, response_cache, stats_summary, tip_contexts, verify_token
+)
+from data_version import get_data_version, make_etag
+from database import create_async_db_engine
+from instrumentation import end_profile, instrument_engine, request_seconds, span, start_profile
+from rate_limits import limit_key
+from serializer import dumps
+from users import resolve_user_id
+
+# ASGI serving mode.
+#
+#     uvicorn --factory asgi:create_asgi_app
+#
+# Under gunicorn's sync workers a request holds its worker for as long as it
+# runs, so one slow model call or query stalls every request behind it. Here
+# the routes that mostly wait are async handlers on the event loop:
+#
+# - POST /api/tips awaits the tip generator's thread pool for the model
+# - GET /api/stats queries through an async engine (aiosqlite or asyncpg)
+#
+# Both verify the token and count rate limits on a worker thread, under the
+# same limiter keys as the Flask routes, and reuse the sync query helpers
+# through AsyncSession.run_sync. Their reads go to the read replicas under
+# the same routing as the Flask routes, through async engines of their own.
+# Every other route is served by the Flask app from create_app(), each
+# request on a thread of its own, up to ASGI_THREADS at a time.
+# gunicorn 'app:create_app()' remains the synchronous mode.
+
+# Concurrent Flask requests, and threads for token verification and limiter checks
+ASGI_THREADS = int(os.getenv('ASGI_THREADS', '16'))
+
+class ThreadedWsgiToAsgi(WsgiToAsgi):
+    """asgiref's WSGI adapter, running up to max_requests requests at once
+
+    asgiref runs WSGI apps thread-sensitively, which serves every request
+    on one shared thread, one at a time. Inside a ThreadSensitiveContext a
+    request gets a thread of its own instead.
+    """
+
+    def __init__(self, wsgi_application, max_requests):
+        super().__init__(wsgi_application)
+        self.slots = asyncio.Semaphore(max_requests)
+
+    async def __call__(self, scope, receive, send):
+        async with self.slots:
+            async with ThreadSensitiveContext():
+                await super().__call__(scope, receive, send)
+
+class AsyncRequest:
+    """The parts of an ASGI HTTP request the async handlers read"""
+
+    def __init__(self, scope):
+        self.method = scope['method']
+        self.path = scope['path']
+        self.query_string = scope.get('query_string', b'').decode('latin-1')
+        self.headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope['headers']}
+        client = scope.get('client')
+        self.remote_addr = client[0] if client else '127.0.0.1'
+
+    @property
+    def token(self):
+        return self.headers.get('authorization', '').replace('Bearer ', '')
+
+    @property
+    def full_path(self):
+        # Same form as Flask's request.full_path, so ETags and response
+        # cache keys match the Flask routes
+        return f"{self.path}?{self.query_string}"
+
+class FinMateASGI:
+    """ASGI app: async handlers for waiting-heavy routes, Flask for the rest"""
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.executor = ThreadPoolExecutor(max_workers=ASGI_THREADS, thread_name_prefix='asgi')
+        self.wsgi = ThreadedWsgiToAsgi(flask_app, ASGI_THREADS)
+        database = flask_app.extensions['finmate_db']
+        self.engine = create_async_db_engine(database.url)
+        instrument_engine(self.engine.sync_engine)
+        self.sessions = async_sessionmaker(self.engine, expire_on_commit=False)
+        # Reads are routed like the Flask routes' (see replicas.py), to
+        # async engines of the same replicas keyed by their sync sessions
+        self.router = database.router
+        self.replica_engines = []
+        self.replica_sessions = {}
+        for replica in (self.router.replicas if self.router else []):
+            engine = create_async_db_engine(replica.url)
+            instrument_engine(engine.sync_engine)
+            replica.watch(engine.sync_engine)
+            self.replica_engines.append(engine)
+            self.replica_sessions[replica.SessionLocal] = async_sessionmaker(engine, expire_on_commit=False)
+        self.default_limits = [parse(value) for value in DEFAULT_RATE_LIMITS]
+        self.tips_limits = [parse(TIPS_RATE_LIMIT)]
+        self.routes = {
+            ('GET', '/api/stats'): ('api.get_user_stats', self.stats),
+            ('POST', '/api/tips'): ('api.get_ai_tips', self.tips)
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        route = self.routes.get((scope.get('method'), scope.get('path'))) if scope['type'] == 'http' else None
+        if route is None:
+            await self.wsgi(scope, receive, send)
+            return
+
+        endpoint, handler = route
+        request = AsyncRequest(scope)
+        profile = start_profile()
+        try:
+            status, body, headers = await handler(request, endpoint)
+        finally:
+            end_profile()
+        seconds = profile.elapsed()
+        request_seconds.observe(seconds, endpoint, request.method, str(status))
+        headers = headers + [('Content-Length', str(len(body)))] + self.cors_headers(request.headers.get('origin'))
+        # The headers after_request adds to the Flask routes' responses
+        headers.extend(SECURITY_HEADERS.items())
+        if SERVER_TIMING:
+            headers.append(('Server-Timing', profile.server_timing()))
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.dispose()
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def cors_headers(self, origin):
+        # The policy flask-cors applies to the Flask routes
+        if not origin or origin not in CORS_ORIGINS:
+            return []
+        return [
+            ('Access-Control-Allow-Origin', origin),
+            ('Access-Control-Allow-Credentials', 'true'),
+            ('Access-Control-Expose-Headers', ', '.join(CORS_EXPOSE_HEADERS)),
+            ('Vary', 'Origin')
+        ]
+
+    async def run_blocking(self, function, *args):
+        """Run function on the executor, keeping the request's profile"""
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, partial(context.run, function, *args)
+        )
+
+    async def dispose(self):
+        for engine in [self.engine] + self.replica_engines:
+            await engine.dispose()
+
+    def read_sessions(self, firebase_uid):
+        """Async session factory for a read-only handler of the user; the
+        counterpart of read_sessions in app.py. Blocking: the router may
+        look up the shared store and probe a replica."""
+        if not self.router:
+            return self.sessions
+        return self.replica_sessions.get(self.router.read_sessions(firebase_uid), self.sessions)
+
+    async def run_db(self, function, *args, sessions=None):
+        """Run function(db, *args) with a sync Session facade over an async
+        engine, the primary's by default"""
+        async with (sessions or self.sessions)() as session:
+            return await session.run_sync(function, *args)
+
+    async def resolve_reads(self, claims):
+        """Return (user id, async session factory for the user's reads)
+
+        The user is resolved on the primary, which may create them.
+        """
+        def resolve(db):
+            return resolve_user_id(db, claims['uid'], claims['email'])
+
+        user_id = await self.run_db(resolve)
+        return user_id, await self.run_blocking(self.read_sessions, claims['uid'])
+
+    async def authenticate(self, request, endpoint, limits):
+        """Return (claims or None, error response or None) for the request
+
+        Limits are checked first, as flask-limiter does before the view.
+        """
+        def check():
+            claims = verify_token(request.token) if request.token else None
+            if limiter.enabled:
+                key = limit_key(claims, request.remote_addr)
+                for item in limits:
+                    if not limiter.limiter.hit(item, key, endpoint):
+                        return claims, json_response({"error": f"Rate limit exceeded: {item}"}, 429)
+            return claims, None
+
+        claims, error = await self.run_blocking(check)
+        if error:
+            return None, error
+        if not request.token:
+            return None, json_response({"error": "Authorization header required"}, 401)
+        if not claims:
+            return None, json_response({"error": "Authentication required"}, 401)
+        return claims, None
+
+    async def stats(self, request, endpoint):
+        """GET /api/stats, with the ETag and response cache scheme of
+        conditional_response"""
+        claims, error = await self.authenticate(request, endpoint, self.default_limits)
+        if error:
+            return error
+        key = f"{request.full_path}|{int(time.time() // STATS_MAX_AGE)}" if STATS_MAX_AGE else request.full_path
+        if_none_match = parse_etags(request.headers.get('if-none-match'))
+
+        def load(db, user_id):
+            version = get_data_version(db, user_id)
+            etag = make_etag(user_id, version, key)
+            if if_none_match.contains(etag):
+                return etag, None
+            cached = response_cache.get(user_id, version, key)
+            if cached:
+                return etag, cached[0]
+            body = dumps(stats_summary(db, user_id))
+            response_cache.set(user_id, version, key, body, {})
+            return etag, body
+
+        try:
+            with span('db'):
+                user_id, sessions = await self.resolve_reads(claims)
+                etag, body = await self.run_db(load, user_id, sessions=sessions)
+        except Exception as e:
+            return json_response({"error": str(e)}, 500)
+        headers = [('ETag', quote_etag(etag)), ('Cache-Control', 'private, no-cache')]
+        if body is None:
+            return 304, b'', headers
+        return 200, body, headers + [('Content-Type', 'application/json')]
+
+    async def tips(self, request, endpoint):
+        """POST /api/tips; the request body is not read"""
+        claims, error = await self.authenticate(request, endpoint, self.tips_limits)
+        if error:
+            return error
+        try:
+            with span('db'):
+                user_id, sessions = await self.resolve_reads(claims)
+                context = await self.run_db(tip_contexts.get, user_id, sessions=sessions)
+            if not context["expense_count"]:
+                return json_response({
+                    "tip": "Start tracking your expenses to get personalized financial advice! 💰",
+                    "category": "general"
+                })
+
+            # The first call imports and configures the Gemini client
+            if clients.tip_generator.initialized:
+                tip_generator = clients.tip_generator.get()
+            else:
+                tip_generator = await self.run_blocking(clients.tip_generator.get)
+            if not tip_generator:
+                return json_response(fallback_tip())
+
+            with span('model'):
+                tip = await tip_generator.get_tip_async(
+                    context["total_spent"], context["categories"],
+                    context["expense_count"], context["recent_expenses"]
+                )
+            return json_response(tip)
+        except Exception as e:
+            print(f"AI Tips Error: {str(e)}")
+            return json_response(fallback_tip())
+
+def json_response(data, status=200):
+    return status, dumps(data), [('Content-Type', 'application/json')]
+
+def create_asgi_app(database_url=None, config=None):
+    """Build the ASGI app around create_app(database_url, config)"""
+    return FinMateASGI(create_app(database_url, config))
@@ -0,0 +1,95 @@
+import os
+from datetime import date, datetime, timedelta
+from sqlalchemy import delete, func, update
+from achievements import update_achievements
+from data_version import next_data_version
+from models import User, Expense
+from rollups import apply_rollup_deltas
+from sync import add_tombstones
+from user_stats import apply_expense_deltas
+
+# Set-based batch deletes and updates of a user's expenses.
+#
+# A batch selects expenses by id list and/or a date range and category
+# filter, and is applied with a single DELETE or UPDATE statement. Stats and
+# rollups are adjusted once from a grouped summary of the affected rows, and
+# achievements from the new stats. The user's row is locked first; every
+# expense write updates it (to bump the data version) before committing, so
+# no concurrent write can slip in between the summary and the statement. Updated rows are stamped with the
+# new data version and deleted ones leave tombstones for /api/sync.
+
+BATCH_MAX_IDS = int(os.getenv('BATCH_MAX_IDS', '1000'))
+BATCH_ACTIONS = ('delete', 'update')
+
+def batch_criteria(user_id, ids=None, start=None, end=None, category=None):
+    """WHERE clauses selecting the user's expenses for a batch or a list
+
+    start and end are inclusive; an end date without a time includes the
+    whole day.
+    """
+    criteria = [Expense.user_id == user_id]
+    if ids is not None:
+        criteria.append(Expense.id.in_(ids))
+    if start:
+        criteria.append(Expense.date >= start)
+    if isinstance(end, datetime):
+        criteria.append(Expense.date <= end)
+    elif end:
+        criteria.append(Expense.date < datetime.combine(end + timedelta(days=1), datetime.min.time()))
+    if category:
+        criteria.append(Expense.category == category)
+    return criteria
+
+def _summarize(db, criteria):
+    """Return {(day, category): (count, amount)} for the matching expenses"""
+    day = func.date(Expense.date)
+    rows = db.query(day, Expense.category, func.count(Expense.id), func.sum(Expense.amount)).filter(
+        *criteria
+    ).group_by(day, Expense.category).all()
+    # SQLite returns date() as text
+    return {
+        (date.fromisoformat(str(row_day)), category): (count, amount)
+        for row_day, category, count, amount in rows
+    }
+
+def _add_totals(totals, key, count, amount):
+    total_count, total_amount = totals.get(key, (0, 0.0))
+    totals[key] = (total_count + count, total_amount + amount)
+
+def run_batch(db, user_id, action, criteria, values=None):
+    """Delete or update the expenses matching criteria
+
+    values holds the new category and/or amount for updates. Returns the
+    number of affected expenses. The data version is bumped when any are;
+    the caller commits.
+    """
+    db.query(User.id).filter(User.id == user_id).with_for_update().first()
+    before = _summarize(db, criteria)
+    affected = sum(count for count, _ in before.values())
+    if not affected:
+        return 0
+    version = next_data_version(db, user_id)
+
+    if action == 'delete':
+        add_tombstones(db, criteria, version)
+        db.execute(delete(Expense).where(*criteria).execution_options(synchronize_session=False))
+        day_deltas = {key: (-count, -amount) for key, (count, amount) in before.items()}
+        apply_expense_deltas(db, user_id, day_deltas)
+        apply_rollup_deltas(db, user_id, day_deltas)
+        update_achievements(db, user_id)
+        return affected
+
+    db.execute(update(Expense).where(*criteria).values(
+        updated_at=datetime.utcnow(), sync_version=version, **values
+    ).execution_options(synchronize_session=False))
+    # Net change per (day, category): the old totals move out and the
+    # updated ones move in
+    day_deltas = {}
+    for (day, category), (count, amount) in before.items():
+        _add_totals(day_deltas, (day, category), -count, -amount)
+        new_amount = values['amount'] * count if 'amount' in values else amount
+        _add_totals(day_deltas, (day, values.get('category', category)), count, new_amount)
+    apply_expense_deltas(db, user_id, day_deltas)
+    apply_rollup_deltas(db, user_id, day_deltas)
+    update_achievements(db, user_id)
+    return affected
@@ -0,0 +1,148 @@
+"""Cost of /api/insights analytics per user history size.
+
+Seeds an in-memory SQLite database with one user per size, expenses spread
+over the past year, and times computing the same insights three ways:
+
+- python: query(Expense).all() and per-expense Python loops
+- numpy/expenses: the expense columns loaded into NumPy arrays
+- numpy/rollup: compute_insights, reading only the rollup table
+
+    python benchmarks/bench_analytics.py --sizes 1000 10000 100000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import numpy as np
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+import analytics
+from models import Base, User, Expense
+from rollups import rebuild_user_rollups
+
+CATEGORIES = ['Food', 'Transport', 'Shopping', 'Bills', 'Fun', 'Health']
+
+def seed(session, user_id, rows, today):
+    end = datetime.combine(today, datetime.min.time()) + timedelta(days=1)
+    random.seed(17)
+    session.execute(insert(Expense), [
+        {
+            'user_id': user_id,
+            'amount': round(random.uniform(1, 200), 2),
+            'category': random.choice(CATEGORIES),
+            'note': '',
+            'date': end - timedelta(seconds=random.randrange(365 * 86400))
+        }
+        for _ in range(rows)
+    ])
+    rebuild_user_rollups(session, user_id)
+    session.commit()
+
+def python_insights(session, user_id, today):
+    """The same insights computed with plain Python over ORM objects"""
+    start = (today - timedelta(days=analytics.INSIGHTS_WINDOW_DAYS - 1)).replace(day=1)
+    expenses = session.query(Expense).filter(
+        Expense.user_id == user_id,
+        Expense.date >= datetime.combine(start, datetime.min.time())
+    ).all()
+    days = (today - start).days + 1
+    daily = [0.0] * days
+    per_category = {}
+    for expense in expenses:
+        index = (expense.date.date() - start).days
+        daily[index] += expense.amount
+        per_category.setdefault(expense.category, [0.0] * days)[index] += expense.amount
+
+    averages = {
+        window: [statistics.fmean(daily[max(0, i + 1 - window):i + 1]) for i in range(days)]
+        for window in analytics.MOVING_AVERAGE_DAYS
+    }
+    months = {}
+    for i, amount in enumerate(daily):
+        key = (start + timedelta(days=i)).strftime('%Y-%m')
+        months[key] = months.get(key, 0.0) + amount
+    totals = list(months.values())
+    changes = [None] + [current - previous for previous, current in zip(totals, totals[1:])]
+
+    anomalies = []
+    for category, values in per_category.items():
+        active = [value for value in values if value > 0]
+        if len(active) < analytics.ANOMALY_MIN_DAYS:
+            continue
+        mean = statistics.fmean(active)
+        std = statistics.pstdev(active)
+        anomalies.extend(
+            (i, category, (value - mean) / std) for i, value in enumerate(values)
+            if value > 0 and std and (value - mean) / std > analytics.ANOMALY_ZSCORE
+        )
+    recent = daily[-analytics.FORECAST_FIT_DAYS:]
+    slope, intercept = statistics.linear_regression(range(len(recent)), recent)
+    return averages, changes, anomalies, slope, intercept
+
+def numpy_from_expenses(session, user_id, today):
+    """compute_insights' math on a matrix built from the expense columns"""
+    start = (today - timedelta(days=analytics.INSIGHTS_WINDOW_DAYS - 1)).replace(day=1)
+    rows = session.query(Expense.date, Expense.category, Expense.amount).filter(
+        Expense.user_id == user_id,
+        Expense.date >= datetime.combine(start, datetime.min.time())
+    ).all()
+    dates, categories, amounts = zip(*rows)
+    names, columns = np.unique(np.array(categories), return_inverse=True)
+    offsets = (np.array(dates, dtype='datetime64[D]') - np.datetime64(start, 'D')).astype(int)
+    values = np.zeros(((today - start).days + 1, len(names)))
+    np.add.at(values, (offsets, columns), np.array(amounts))
+    matrix = analytics.SpendingMatrix(start, values, names.tolist())
+    for window in analytics.MOVING_AVERAGE_DAYS:
+        analytics.moving_average(matrix.daily_totals, window)
+    analytics.month_over_month(analytics.monthly_totals(matrix)[1])
+    analytics.category_anomalies(matrix)
+    return analytics.forecast_month(matrix, today)
+
+def best_of(function, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    today = datetime.utcnow().date()
+
+    print(f"{'rows':>7} {'path':<16} {'ms':>10} {'speedup':>8}")
+    for size in args.sizes:
+        user = User(firebase_uid=f'bench-analytics-{size}', email='bench@example.com')
+        session.add(user)
+        session.commit()
+        user_id = user.id
+        seed(session, user_id, size, today)
+
+        def python_path():
+            session.expunge_all()
+            python_insights(session, user_id, today)
+
+        baseline = best_of(python_path, args.repeat)
+        print(f"{size:>7} {'python':<16} {baseline:>10.2f} {'1.0x':>8}")
+        for name, function in (
+            ('numpy/expenses', lambda: numpy_from_expenses(session, user_id, today)),
+            ('numpy/rollup', lambda: analytics.compute_insights(session, user_id, today=today)),
+        ):
+            elapsed = best_of(function, args.repeat)
+            print(f"{size:>7} {name:<16} {elapsed:>10.2f} {baseline / elapsed:>7.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,356 @@
+"""Latency and throughput of the FinMate API routes.
+
+Seeds a database with synthetic users and expenses, then drives every route
+in app.py with the AI model stubbed out, either in process through the Flask
+test client or over HTTP against a real gunicorn server. Reports p50, p95 and
+p99 latency and throughput per route.
+
+    python benchmarks/bench_api.py --rows 100000
+    python benchmarks/bench_api.py --server gunicorn --workers 4 --concurrency 16
+    python benchmarks/bench_api.py --database-url postgresql://.../finmate_bench --rows 1000000
+
+    # Store a baseline, then fail (exit 1) when a later run regresses
+    python benchmarks/bench_api.py --save-baseline bench_api_baseline.json
+    python benchmarks/bench_api.py --compare bench_api_baseline.json --tolerance 0.25
+
+Requests authenticate as the development user (no FIREBASE_CREDENTIALS), who
+owns rows / users of the seeded expenses. Seeding drops and recreates the
+FinMate tables, so it only runs against a database whose name contains
+"bench" unless --drop is given.
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(BENCH_DIR, '..')
+sys.path.insert(0, BACKEND_DIR)
+
+from sqlalchemy import insert
+from sqlalchemy.engine import make_url
+from models import Base, User, Expense
+from bench_indexes import CATEGORIES, is_bench_database
+
+# Identity verify_token falls back to without FIREBASE_CREDENTIALS
+DEV_UID = 'dev-user'
+DEV_EMAIL = 'dev@example.com'
+
+AUTH_HEADERS = {'Authorization': 'Bearer bench-token'}
+
+class StubModel:
+    """Stands in for the Gemini model, answering after a fixed latency"""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+
+    def generate_content(self, prompt, request_options=None):
+        time.sleep(self.latency)
+        return type('StubResponse', (), {
+            'text': 'Tip: Move 10% of every payday into savings first 💡\nCategory: saving'
+        })()
+
+def create_bench_app(database_url=None, model_latency=None):
+    """App with rate limits off and the stub model, also used by gunicorn"""
+    import clients
+    from ai_tips import TipGenerator
+    from app import create_app
+
+    if model_latency is None:
+        model_latency = float(os.getenv('BENCH_MODEL_LATENCY', '0'))
+    clients.tip_generator = clients.LazyClient(lambda: TipGenerator(StubModel(model_latency)))
+    return create_app(database_url or os.getenv('BENCH_DATABASE_URL'), {'RATELIMIT_ENABLED': False})
+
+def seed(database_url, rows, users, chunk_size=50000):
+    """Recreate the schema and insert synthetic expenses spread over users"""
+    from app import DatabaseManager
+    from rollups import rebuild_all_rollups
+    from user_stats import reconcile_all_stats
+
+    database = DatabaseManager(database_url)
+    Base.metadata.drop_all(bind=database.engine)
+    with database.engine.begin() as conn:
+        conn.exec_driver_sql('DROP TABLE IF EXISTS schema_migrations')
+    database.create_all()
+
+    user_ids = [str(uuid.uuid4()) for _ in range(users)]
+    now = datetime.utcnow()
+    random.seed(42)
+    with database.engine.begin() as conn:
+        conn.execute(insert(User), [
+            {
+                'id': user_id,
+                'firebase_uid': DEV_UID if i == 0 else f'bench-{i}',
+                'email': DEV_EMAIL if i == 0 else f'bench{i}@example.com'
+            }
+            for i, user_id in enumerate(user_ids)
+        ])
+
+    inserted = 0
+    while inserted < rows:
+        batch = min(chunk_size, rows - inserted)
+        with database.engine.begin() as conn:
+            conn.execute(insert(Expense), [
+                {
+                    'user_id': user_ids[(inserted + i) % users],
+                    'amount': round(random.uniform(1, 500), 2),
+                    'category': random.choice(CATEGORIES),
+                    'note': '',
+                    'date': now - timedelta(minutes=random.randint(0, 60 * 24 * 730)),
+                    'created_at': now,
+                    'updated_at': now
+                }
+                for i in range(batch)
+            ])
+        inserted += batch
+        print(f"  seeded {inserted}/{rows} expenses", end='\r', flush=True)
+    print()
+
+    db = database.SessionLocal()
+    try:
+        reconcile_all_stats(db)
+        rebuild_all_rollups(db)
+    finally:
+        db.close()
+    database.engine.dispose()
+
+def scenarios():
+    """(name, method, path factory, json body) for every route
+
+    "uncached" variants add a unique query parameter so each request misses
+    the per-user response cache and runs the queries.
+    """
+    expense = {'amount': 12.5, 'category': 'Food', 'note': 'bench'}
+    tips = {'expenses': [{'amount': 12.5, 'category': 'Food'}] * 20}
+    return [
+        ('GET /api/expenses (page of 100)', 'GET', lambda i: '/api/expenses?limit=100', None),
+        ('GET /api/expenses (uncached)', 'GET', lambda i: f'/api/expenses?limit=100&bench={i}', None),
+        ('GET /api/stats', 'GET', lambda i: '/api/stats', None),
+        ('GET /api/stats (uncached)', 'GET', lambda i: f'/api/stats?bench={i}', None),
+        ('GET /api/learning/path (uncached)', 'GET', lambda i: f'/api/learning/path?bench={i}', None),
+        ('POST /api/tips', 'POST', lambda i: '/api/tips', tips),
+        ('POST /api/expenses', 'POST', lambda i: '/api/expenses', expense),
+        # Deletes the expenses created by the POST scenario
+        ('DELETE /api/expenses/<id>', 'DELETE', None, None),
+    ]
+
+class TestClientTransport:
+    """Send requests in process through the Flask test client"""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, body=None):
+        response = self.client.open(path, method=method, json=body, headers=AUTH_HEADERS)
+        return response.status_code, response.get_data()
+
+    def close(self):
+        pass
+
+def absolute_database_url(database_url):
+    """Make a relative SQLite path absolute, since gunicorn runs in BACKEND_DIR"""
+    url = make_url(database_url)
+    if url.get_backend_name() == 'sqlite' and url.database and url.database != ':memory:':
+        return url.set(database=os.path.abspath(url.database)).render_as_string(hide_password=False)
+    return database_url
+
+class GunicornTransport:
+    """Send requests over HTTP to a gunicorn process serving create_bench_app()"""
+
+    def __init__(self, database_url, workers, model_latency):
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            self.port = sock.getsockname()[1]
+        env = dict(
+            os.environ,
+            BENCH_DATABASE_URL=absolute_database_url(database_url),
+            BENCH_MODEL_LATENCY=str(model_latency)
+        )
+        self.process = subprocess.Popen([
+            sys.executable, '-m', 'gunicorn',
+            '--bind', f'127.0.0.1:{self.port}',
+            '--workers', str(workers),
+            '--threads', '4',
+            '--chdir', BACKEND_DIR,
+            '--pythonpath', BENCH_DIR,
+            '--log-level', 'warning',
+            'bench_api:create_bench_app()'
+        ], env=env)
+        self._wait_until_ready()
+
+    def _wait_until_ready(self, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError('gunicorn exited during startup')
+            try:
+                self.request('GET', '/api/status')
+                return
+            except OSError:
+                time.sleep(0.2)
+        raise RuntimeError('gunicorn did not start in time')
+
+    def request(self, method, path, body=None):
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        headers = dict(AUTH_HEADERS)
+        if data is not None:
+            headers['Content-Type'] = 'application/json'
+        http_request = urllib.request.Request(
+            f'http://127.0.0.1:{self.port}{path}', data=data, headers=headers, method=method
+        )
+        try:
+            with urllib.request.urlopen(http_request, timeout=60) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+    def close(self):
+        self.process.terminate()
+        self.process.wait(timeout=30)
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+def run_scenario(transport, method, paths, bodies, concurrency):
+    """Issue the requests, returning (latencies in ms, wall seconds, responses)"""
+    def timed(args):
+        path, body = args
+        start = time.perf_counter()
+        status, data = transport.request(method, path, body)
+        return (time.perf_counter() - start) * 1000, status, data
+
+    start = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(timed, zip(paths, bodies)))
+    else:
+        results = [timed(args) for args in zip(paths, bodies)]
+    return [latency for latency, _, _ in results], time.perf_counter() - start, results
+
+def summarize(latencies, wall_seconds, errors):
+    latencies = sorted(latencies)
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'p50': statistics.median(latencies),
+        'p95': percentile(latencies, 0.95),
+        'p99': percentile(latencies, 0.99),
+        'rps': len(latencies) / wall_seconds if wall_seconds else 0.0
+    }
+
+def run_benchmark(transport, requests_per_route, concurrency, warmup=5):
+    results = {}
+    created_ids = []
+    for name, method, path_for, body in scenarios():
+        if method == 'DELETE':
+            paths = [f'/api/expenses/{expense_id}' for expense_id in created_ids]
+        else:
+            for i in range(warmup):
+                transport.request(method, path_for(-1 - i), body)
+            paths = [path_for(i) for i in range(requests_per_route)]
+        if not paths:
+            continue
+        latencies, wall_seconds, responses = run_scenario(
+            transport, method, paths, [body] * len(paths), concurrency
+        )
+        errors = sum(1 for _, status, _ in responses if status >= 400)
+        if method == 'POST' and path_for(0) == '/api/expenses':
+            created_ids = [json.loads(data)['id'] for _, status, data in responses if status == 201]
+        results[name] = summarize(latencies, wall_seconds, errors)
+    return results
+
+def report(results):
+    print(f"\n{'route':<36} {'reqs':>6} {'errs':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>9}")
+    for name, result in results.items():
+        print(f"{name:<36} {result['requests']:>6} {result['errors']:>5} {result['p50']:>9.2f} "
+              f"{result['p95']:>9.2f} {result['p99']:>9.2f} {result['rps']:>9.1f}")
+
+def compare(results, baseline, tolerance):
+    """Print regressions against a baseline; return True if any were found"""
+    regressed = False
+    print(f"\n== compared with baseline (tolerance {tolerance:.0%}) ==")
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            print(f"{name:<36} new")
+            continue
+        slower = result['p95'] > previous['p95'] * (1 + tolerance)
+        fewer = result['rps'] < previous['rps'] * (1 - tolerance)
+        status = 'REGRESSED' if slower or fewer else 'ok'
+        regressed = regressed or slower or fewer
+        print(f"{name:<36} p95 {previous['p95']:8.2f} -> {result['p95']:8.2f} ms   "
+              f"req/s {previous['rps']:8.1f} -> {result['rps']:8.1f}   {status}")
+    return regressed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url', default='sqlite:///bench_api.db')
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--requests', type=int, default=200, help='requests per route')
+    parser.add_argument('--server', choices=('client', 'gunicorn'), default='client')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn worker processes')
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--model-latency', type=float, default=0.0,
+                        help='seconds the stub AI model takes per call')
+    parser.add_argument('--no-seed', action='store_true', help='reuse the data of a previous run')
+    parser.add_argument('--drop', action='store_true',
+                        help='allow dropping the tables of a database not named *bench*')
+    parser.add_argument('--save-baseline', metavar='PATH')
+    parser.add_argument('--compare', metavar='PATH')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed relative p95/throughput regression in --compare')
+    args = parser.parse_args()
+
+    if not args.no_seed:
+        if not args.drop and not is_bench_database(args.database_url):
+            parser.error('refusing to drop the tables of a non-benchmark database; '
+                         'use a database named *bench* or pass --drop')
+        print(f"Seeding {args.rows} expenses for {args.users} users...")
+        seed(args.database_url, args.rows, args.users)
+
+    if args.server == 'gunicorn':
+        transport = GunicornTransport(args.database_url, args.workers, args.model_latency)
+    else:
+        transport = TestClientTransport(create_bench_app(args.database_url, args.model_latency))
+    try:
+        results = run_benchmark(transport, args.requests, args.concurrency)
+    finally:
+        transport.close()
+
+    # Results are only comparable between runs with the same settings
+    settings = {
+        'server': args.server,
+        'workers': args.workers if args.server == 'gunicorn' else None,
+        'concurrency': args.concurrency,
+        'rows': None if args.no_seed else args.rows,
+        'users': None if args.no_seed else args.users,
+        'model_latency': args.model_latency
+    }
+    print(f"\n== {', '.join(f'{key} {value}' for key, value in settings.items() if value is not None)} ==")
+    report(results)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump({'settings': settings, 'results': results}, f, indent=2)
+        print(f"\nBaseline saved to {args.save_baseline}")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline['settings'] != settings:
+            print(f"\nWarning: baseline was recorded with different settings: {baseline['settings']}")
+        if compare(results, baseline['results'], args.tolerance):
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
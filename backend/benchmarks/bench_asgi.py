@@ -0,0 +1,156 @@
+"""Concurrent throughput of the sync (gunicorn) and ASGI (uvicorn) modes.
+
+Seeds a database like bench_api.py, then serves it with each mode in turn
+and sends a mix of POST /api/tips and GET /api/stats from --concurrency
+client threads:
+
+- sync: gunicorn sync workers, as start.sh runs the app (or gthread
+  workers with --threads)
+- asgi: uvicorn serving asgi:create_asgi_app
+
+The AI model is stubbed with a fixed latency and every tip request gets a
+fingerprint of its own, so each one waits on a model call instead of the
+tip cache. Stats requests carry a unique query parameter to miss the
+response cache. Reports throughput and p50/p95 latency per route.
+
+    python benchmarks/bench_asgi.py --concurrency 32 --model-latency 0.5
+    python benchmarks/bench_asgi.py --workers 2 --threads 8 --tips-share 0.1
+"""
+import argparse
+import itertools
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(BENCH_DIR, '..')
+sys.path.insert(0, BACKEND_DIR)
+
+from bench_api import GunicornTransport, absolute_database_url, create_bench_app, percentile, seed
+from bench_indexes import is_bench_database
+
+def _unique_fingerprints():
+    import ai_tips
+    counter = itertools.count()
+    ai_tips.spending_fingerprint = lambda *args: next(counter)
+
+def create_bench_sync_app():
+    """create_bench_app() with a model call for every tip request"""
+    _unique_fingerprints()
+    return create_bench_app()
+
+def create_bench_asgi_app():
+    """The ASGI app around create_bench_sync_app()"""
+    from asgi import FinMateASGI
+    return FinMateASGI(create_bench_sync_app())
+
+class ServerTransport(GunicornTransport):
+    """GunicornTransport for any server command, given the port to use"""
+
+    def __init__(self, command, database_url, model_latency, port):
+        self.port = port
+        env = dict(
+            os.environ,
+            BENCH_DATABASE_URL=absolute_database_url(database_url),
+            BENCH_MODEL_LATENCY=str(model_latency),
+            # Room for every concurrent tip request in the model pool
+            AI_TIPS_WORKERS='64',
+            PYTHONPATH=os.pathsep.join([BENCH_DIR, BACKEND_DIR])
+        )
+        self.process = subprocess.Popen(command, env=env, cwd=BACKEND_DIR)
+        self._wait_until_ready()
+
+def server_command(mode, port, workers, threads):
+    if mode == 'sync':
+        return [
+            sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{port}', '--workers', str(workers),
+            '--threads', str(threads), '--log-level', 'warning', 'bench_asgi:create_bench_sync_app()'
+        ]
+    return [
+        sys.executable, '-m', 'uvicorn', '--factory', 'bench_asgi:create_bench_asgi_app',
+        '--host', '127.0.0.1', '--port', str(port), '--workers', str(workers), '--log-level', 'warning'
+    ]
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def run_mix(transport, requests, concurrency, tips_share):
+    """Send the mixed requests, returning ({route: [latency ms]}, wall seconds, errors)"""
+    rng = random.Random(22)
+    plan = [
+        ('POST', '/api/tips') if rng.random() < tips_share else ('GET', f'/api/stats?bench={i}')
+        for i in range(requests)
+    ]
+
+    def timed(request):
+        method, path = request
+        start = time.perf_counter()
+        status, _ = transport.request(method, path)
+        return method, (time.perf_counter() - start) * 1000, status
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(timed, plan))
+    wall_seconds = time.perf_counter() - start
+    latencies = {'POST /api/tips': [], 'GET /api/stats': []}
+    for method, latency, _ in results:
+        latencies['POST /api/tips' if method == 'POST' else 'GET /api/stats'].append(latency)
+    errors = sum(1 for _, _, status in results if status >= 400)
+    return latencies, wall_seconds, errors
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url', default='sqlite:///bench_api.db')
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--tips-share', type=float, default=0.2, help='fraction of requests that ask for tips')
+    parser.add_argument('--model-latency', type=float, default=0.5,
+                        help='seconds the stub AI model takes per call')
+    parser.add_argument('--workers', type=int, default=1, help='server worker processes per mode')
+    parser.add_argument('--threads', type=int, default=1,
+                        help='gunicorn threads per sync worker (more than 1 selects gthread workers)')
+    parser.add_argument('--modes', nargs='+', choices=('sync', 'asgi'), default=['sync', 'asgi'])
+    parser.add_argument('--no-seed', action='store_true', help='reuse the data of a previous run')
+    parser.add_argument('--drop', action='store_true',
+                        help='allow dropping the tables of a database not named *bench*')
+    args = parser.parse_args()
+
+    if not args.no_seed:
+        if not args.drop and not is_bench_database(args.database_url):
+            parser.error('refusing to drop the tables of a non-benchmark database; '
+                         'use a database named *bench* or pass --drop')
+        print(f"Seeding {args.rows} expenses for {args.users} users...")
+        seed(args.database_url, args.rows, args.users)
+
+    print(f"\n== {args.requests} requests, concurrency {args.concurrency}, {args.tips_share:.0%} tips, "
+          f"model latency {args.model_latency}s, {args.workers} worker(s) ==")
+    print(f"{'mode':<6} {'req/s':>8} {'errs':>5}   {'route':<16} {'reqs':>5} {'p50 ms':>9} {'p95 ms':>9}")
+    for mode in args.modes:
+        port = free_port()
+        transport = ServerTransport(
+            server_command(mode, port, args.workers, args.threads), args.database_url, args.model_latency, port
+        )
+        try:
+            # Warm up the connection pools and lazy clients
+            run_mix(transport, 20, 4, args.tips_share)
+            latencies, wall_seconds, errors = run_mix(transport, args.requests, args.concurrency, args.tips_share)
+        finally:
+            transport.close()
+        rps = args.requests / wall_seconds
+        for i, (route, values) in enumerate(latencies.items()):
+            values = sorted(values) or [0.0]
+            prefix = f"{mode:<6} {rps:>8.1f} {errors:>5}" if i == 0 else ' ' * 20
+            print(f"{prefix}   {route:<16} {len(values):>5} {statistics.median(values):>9.1f} "
+                  f"{percentile(values, 0.95):>9.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+"""Query plans and latency of the expense hot queries with and without indexes.
+
+Seeds a database with synthetic expenses, then runs the queries behind
+/api/expenses, /api/stats and the stats maintenance path twice: once with
+only the primary keys, and once after the migration indexes are created.
+
+    python benchmarks/bench_indexes.py --rows 1000000 --users 100
+    python benchmarks/bench_indexes.py --database-url postgresql://.../finmate_bench --rows 1000000
+
+Seeding drops and recreates the FinMate tables, so it only runs against a
+database whose name contains "bench" unless --drop is given.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from sqlalchemy import create_engine, func, insert, select, text
+from sqlalchemy.engine import make_url
+from models import Base, User, Expense, UserStats
+
+CATEGORIES = ['Food', 'Transport', 'Shopping', 'Entertainment', 'Bills', 'Health', 'Education', 'Other']
+
+INDEXED_TABLES = [Expense.__table__, UserStats.__table__]
+
+def is_bench_database(url):
+    """True if the database name marks it as a throwaway benchmark database"""
+    return 'bench' in os.path.basename(make_url(url).database or '').lower()
+
+def seed(engine, rows, users, chunk_size=50000):
+    """Create the schema without secondary indexes and insert synthetic data"""
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    drop_indexes(engine)
+
+    user_ids = [str(uuid.uuid4()) for _ in range(users)]
+    now = datetime.utcnow()
+    random.seed(42)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {'id': user_id, 'firebase_uid': f'bench-{i}', 'email': f'bench{i}@example.com'}
+            for i, user_id in enumerate(user_ids)
+        ])
+        conn.execute(insert(UserStats), [{'user_id': user_id} for user_id in user_ids])
+
+    inserted = 0
+    while inserted < rows:
+        batch = min(chunk_size, rows - inserted)
+        with engine.begin() as conn:
+            conn.execute(insert(Expense), [
+                {
+                    'user_id': random.choice(user_ids),
+                    'amount': round(random.uniform(1, 500), 2),
+                    'category': random.choice(CATEGORIES),
+                    'note': '',
+                    'date': now - timedelta(minutes=random.randint(0, 60 * 24 * 730)),
+                    'created_at': now,
+                    'updated_at': now
+                }
+                for _ in range(batch)
+            ])
+        inserted += batch
+        print(f"  seeded {inserted}/{rows} expenses", end='\r', flush=True)
+    print()
+    return user_ids
+
+def drop_indexes(engine):
+    with engine.begin() as conn:
+        for table in INDEXED_TABLES:
+            for index in table.indexes:
+                index.drop(bind=conn, checkfirst=True)
+
+def create_indexes(engine):
+    with engine.begin() as conn:
+        for table in INDEXED_TABLES:
+            for index in table.indexes:
+                index.create(bind=conn, checkfirst=True)
+        conn.execute(text('ANALYZE'))
+
+def hot_queries(user_id):
+    """The statements issued by the list, stats and stats-maintenance paths"""
+    return {
+        'list page (limit 100)': select(Expense.date, Expense.id, Expense.amount, Expense.category).where(
+            Expense.user_id == user_id
+        ).order_by(Expense.date.desc(), Expense.id.desc()).limit(100),
+        'totals': select(func.count(Expense.id), func.sum(Expense.amount)).where(
+            Expense.user_id == user_id
+        ),
+        'category totals': select(Expense.category, func.sum(Expense.amount)).where(
+            Expense.user_id == user_id
+        ).group_by(Expense.category),
+        'last 30 days': select(func.sum(Expense.amount)).where(
+            Expense.user_id == user_id,
+            Expense.date >= datetime.utcnow() - timedelta(days=30)
+        ),
+        'user stats lookup': select(UserStats.id).where(UserStats.user_id == user_id),
+    }
+
+def explain(conn, statement):
+    sql = str(statement.compile(conn, compile_kwargs={'literal_binds': True}))
+    if conn.dialect.name == 'postgresql':
+        rows = conn.execute(text('EXPLAIN ANALYZE ' + sql)).fetchall()
+        return [row[0] for row in rows]
+    rows = conn.execute(text('EXPLAIN QUERY PLAN ' + sql)).fetchall()
+    return [row[-1] for row in rows]
+
+def measure(engine, user_ids, repeat):
+    results = {}
+    with engine.connect() as conn:
+        for name in hot_queries(user_ids[0]):
+            timings = []
+            for i in range(repeat):
+                statement = hot_queries(user_ids[i % len(user_ids)])[name]
+                start = time.perf_counter()
+                conn.execute(statement).fetchall()
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            results[name] = {
+                'p50': statistics.median(timings),
+                'p95': timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+                'plan': explain(conn, hot_queries(user_ids[0])[name])
+            }
+    return results
+
+def report(label, results):
+    print(f"\n== {label} ==")
+    for name, result in results.items():
+        print(f"{name:<22} p50 {result['p50']:9.3f} ms   p95 {result['p95']:9.3f} ms")
+        for line in result['plan']:
+            print(f"    {line}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url', default='sqlite:///bench_indexes.db')
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--drop', action='store_true',
+                        help='allow dropping the tables of a database not named *bench*')
+    args = parser.parse_args()
+
+    if not args.drop and not is_bench_database(args.database_url):
+        parser.error('refusing to drop the tables of a non-benchmark database; '
+                     'use a database named *bench* or pass --drop')
+
+    engine = create_engine(args.database_url)
+    print(f"Seeding {args.rows} expenses for {args.users} users...")
+    user_ids = seed(engine, args.rows, args.users)
+
+    before = measure(engine, user_ids, args.repeat)
+    report('before: primary keys only', before)
+
+    create_indexes(engine)
+    after = measure(engine, user_ids, args.repeat)
+    report('after: migration indexes', after)
+
+    print("\n== speedup (p50) ==")
+    for name in before:
+        speedup = before[name]['p50'] / after[name]['p50'] if after[name]['p50'] else float('inf')
+        print(f"{name:<22} {speedup:8.1f}x")
+
+if __name__ == '__main__':
+    main()
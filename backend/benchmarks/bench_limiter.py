@@ -0,0 +1,71 @@
+"""Per-request overhead of the rate limiter.
+
+Times a trivial route through Flask's test client with no limiter, then
+with flask-limiter for each strategy in rate_limits.py, keyed by client
+address and by verified user (through a TokenCache hit, as in app.py). The
+route carries the app's default limits plus one of its own, so each request
+checks three limits. Pass --storage-uri redis://... to time a shared Redis
+store instead of the in-process memory:// one.
+
+    python benchmarks/bench_limiter.py --requests 5000
+    python benchmarks/bench_limiter.py --storage-uri redis://localhost:6379/0
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from flask import Flask
+from flask_limiter import Limiter
+from cache import LRUCache
+from rate_limits import RATE_LIMIT_STRATEGIES, request_limit_key
+from token_cache import TokenCache
+
+# High enough that no request is rejected
+LIMITS = ["1000000 per day", "1000000 per hour"]
+ROUTE_LIMIT = "1000000 per minute"
+
+def make_app(strategy=None, storage_uri='memory://', key='ip'):
+    app = Flask(__name__)
+    if strategy is None:
+        app.add_url_rule('/bench', 'bench', lambda: 'ok')
+        return app
+    tokens = TokenCache(LRUCache(max_entries=100))
+    tokens.put('bench-token', {'uid': 'bench-user', 'exp': time.time() + 3600})
+    verify = lambda token: tokens.verify(token, lambda token: None)
+    app.config.update(RATELIMIT_STORAGE_URI=storage_uri, RATELIMIT_STRATEGY=strategy)
+    limiter = Limiter(key_func=lambda: request_limit_key(verify), default_limits=LIMITS, app=app)
+    app.add_url_rule('/bench', 'bench', limiter.limit(ROUTE_LIMIT)(lambda: 'ok'))
+    limiter.reset()
+    return app
+
+def time_requests(app, requests, key):
+    client = app.test_client()
+    headers = {'Authorization': 'Bearer bench-token'} if key == 'user' else {}
+    for _ in range(100):
+        client.get('/bench', headers=headers)
+    start = time.perf_counter()
+    for _ in range(requests):
+        response = client.get('/bench', headers=headers)
+    assert response.status_code == 200
+    return (time.perf_counter() - start) / requests * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--storage-uri', default='memory://')
+    args = parser.parse_args()
+
+    baseline = time_requests(make_app(), args.requests, 'ip')
+    print(f"storage: {args.storage_uri}")
+    print(f"{'strategy':<24} {'key':<5} {'us/request':>11} {'overhead us':>12}")
+    print(f"{'(no limiter)':<24} {'-':<5} {baseline:>11.1f} {0:>12.1f}")
+    for strategy in RATE_LIMIT_STRATEGIES:
+        for key in ('ip', 'user'):
+            per_request = time_requests(make_app(strategy, args.storage_uri, key), args.requests, key)
+            print(f"{strategy:<24} {key:<5} {per_request:>11.1f} {per_request - baseline:>12.1f}")
+
+if __name__ == '__main__':
+    main()
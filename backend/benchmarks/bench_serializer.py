@@ -0,0 +1,102 @@
+"""Cost of encoding expense lists: to_dict + jsonify versus rows_to_json.
+
+Seeds an in-memory SQLite database and, for each list size, times:
+
+- to_dict: query(Expense).all(), Expense.to_dict() per row and jsonify with
+  Flask's stdlib encoder (the path the list endpoint used to take)
+- rows/<backend>: select of the columns only, encoded by rows_to_json with
+  orjson (when installed) or the stdlib fallback
+
+Encoding is reported alone and together with the query.
+
+    python benchmarks/bench_serializer.py --sizes 1000 10000 100000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from flask import Flask, jsonify
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+import serializer
+from models import Base, User, Expense
+from serializer import rows_to_json
+
+FIELDS = ('id', 'user_id', 'amount', 'category', 'note', 'date', 'created_at', 'updated_at')
+
+def seed(session, user_id, rows):
+    now = datetime.utcnow()
+    random.seed(15)
+    session.execute(insert(Expense), [
+        {
+            'user_id': user_id,
+            'amount': round(random.uniform(1, 500), 2),
+            'category': random.choice(['Food', 'Transport', 'Shopping', 'Bills']),
+            'note': random.choice(['', 'lunch', 'bus pass']),
+            'date': now - timedelta(minutes=i),
+            'created_at': now,
+            'updated_at': now
+        }
+        for i in range(rows)
+    ])
+    session.commit()
+
+def best_of(function, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    app = Flask(__name__)
+
+    backends = ['stdlib'] + (['orjson'] if serializer.orjson is not None else [])
+    print(f"{'rows':>7} {'path':<14} {'encode ms':>10} {'query+encode ms':>16} {'speedup':>8}")
+    for size in args.sizes:
+        user = User(firebase_uid=f'bench-serializer-{size}', email='bench@example.com')
+        session.add(user)
+        session.commit()
+        user_id = user.id
+        seed(session, user_id, size)
+
+        def orm_query():
+            session.expunge_all()
+            return session.query(Expense).filter(Expense.user_id == user_id).all()
+
+        def column_query():
+            return session.query(*[getattr(Expense, field) for field in FIELDS]).filter(
+                Expense.user_id == user_id
+            ).all()
+
+        with app.app_context():
+            expenses = orm_query()
+            encode = best_of(lambda: jsonify([e.to_dict() for e in expenses]).get_data(), args.repeat)
+            total = best_of(lambda: jsonify([e.to_dict() for e in orm_query()]).get_data(), args.repeat)
+        print(f"{size:>7} {'to_dict':<14} {encode:>10.2f} {total:>16.2f} {'1.0x':>8}")
+        baseline = total
+
+        rows = column_query()
+        for backend in backends:
+            serializer.JSON_SERIALIZER = backend
+            encode = best_of(lambda: rows_to_json(FIELDS, rows), args.repeat)
+            total = best_of(lambda: rows_to_json(FIELDS, column_query()), args.repeat)
+            print(f"{size:>7} {'rows/' + backend:<14} {encode:>10.2f} {total:>16.2f} {baseline / total:>7.1f}x")
+        serializer.JSON_SERIALIZER = 'auto'
+
+if __name__ == '__main__':
+    main()
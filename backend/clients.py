@@ -0,0 +1,72 @@
+import atexit
+import os
+import threading
+from ai_tips import TipGenerator
+
+# Lazily initialized external clients.
+#
+# google.generativeai and firebase_admin are slow to import and set up, so
+# they are loaded by the first request that needs them rather than when the
+# app module is imported. Worker cold starts and CLI commands that never
+# generate tips or verify tokens do not pay for them at all.
+
+GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'gemini-pro')
+
+class LazyClient:
+    """Build a client once, on first use, from a factory function
+
+    A factory that raises is logged and treated as returning None, so a
+    misconfigured client degrades to the fallback paths instead of failing
+    every request.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._lock = threading.Lock()
+        self._client = None
+        self._initialized = False
+
+    @property
+    def initialized(self):
+        return self._initialized
+
+    def get(self):
+        if not self._initialized:
+            with self._lock:
+                if not self._initialized:
+                    try:
+                        self._client = self._factory()
+                    except Exception as e:
+                        print(f"Warning: Could not initialize {self._factory.__name__}: {e}")
+                        self._client = None
+                    self._initialized = True
+        return self._client
+
+def gemini_configured():
+    return bool(os.getenv('GEMINI_API_KEY'))
+
+def firebase_configured():
+    return bool(os.getenv('FIREBASE_CREDENTIALS'))
+
+def create_tip_generator():
+    """Configure Gemini and wrap the model in a TipGenerator"""
+    if not gemini_configured():
+        print("Warning: GEMINI_API_KEY not found in environment variables")
+        return None
+    import google.generativeai as genai
+    genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
+    generator = TipGenerator(genai.GenerativeModel(GEMINI_MODEL))
+    atexit.register(generator.shutdown, wait=False)
+    return generator
+
+def create_firebase_auth():
+    """Initialize the Firebase Admin SDK and return its auth module"""
+    if not firebase_configured():
+        return None
+    import firebase_admin
+    from firebase_admin import auth, credentials
+    firebase_admin.initialize_app(credentials.Certificate(os.getenv('FIREBASE_CREDENTIALS')))
+    return auth
+
+tip_generator = LazyClient(create_tip_generator)
+firebase_auth = LazyClient(create_firebase_auth)
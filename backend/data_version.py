@@ -0,0 +1,60 @@
+import hashlib
+import os
+from cache import LRUCache
+from models import User
+
+# Per-user data versions for conditional GETs and response caching.
+#
+# users.data_version is bumped in the same transaction as every expense
+# write. Read endpoints derive a strong ETag from (user, version, request),
+# so a matching If-None-Match is answered with 304 after a single primary
+# key lookup, and serialized bodies are cached per version: a write moves
+# the user to a new version and old entries simply age out of the LRU.
+
+RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', '1000'))
+# Larger bodies (long unpaginated lists) are not cached
+RESPONSE_CACHE_MAX_BODY = int(os.getenv('RESPONSE_CACHE_MAX_BODY', str(256 * 1024)))
+
+def get_data_version(db, user_id):
+    """Return the user's current data version"""
+    version = db.query(User.data_version).filter(User.id == user_id).scalar()
+    return version or 0
+
+def bump_data_version(db, user_id):
+    """Move the user to a new data version; the caller commits"""
+    db.query(User).filter(User.id == user_id).update(
+        {User.data_version: User.data_version + 1},
+        synchronize_session=False
+    )
+
+def next_data_version(db, user_id):
+    """Bump the user's data version and return it, to stamp the rows
+    written in the same transaction (see sync.py); the caller commits"""
+    bump_data_version(db, user_id)
+    return get_data_version(db, user_id)
+
+def make_etag(user_id, version, key):
+    """Strong ETag value (unquoted) for a request key at a data version"""
+    raw = f"{user_id}|{version}|{key}".encode('utf-8')
+    return hashlib.sha256(raw).hexdigest()[:32]
+
+class ResponseCache:
+    """Bounded cache of serialized response bodies per (user, version, key)"""
+
+    def __init__(self, max_entries=RESPONSE_CACHE_SIZE, max_body=RESPONSE_CACHE_MAX_BODY):
+        self.max_body = max_body
+        self._entries = LRUCache(max_entries=max_entries)
+
+    def get(self, user_id, version, key):
+        """Return (body, headers) or None"""
+        return self._entries.get((user_id, version, key))
+
+    def set(self, user_id, version, key, body, headers=None):
+        if len(body) <= self.max_body:
+            self._entries.set((user_id, version, key), (body, dict(headers or {})))
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
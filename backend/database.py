@@ -0,0 +1,154 @@
+import os
+import threading
+import time
+from sqlalchemy import create_engine, insert
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.pool import QueuePool
+
+# Engine construction with a tunable, instrumented connection pool.
+#
+# DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT and DB_POOL_RECYCLE size the
+# pool per worker process; DB_POOL_PRE_PING checks connections on checkout
+# so ones dropped by the server while idle are replaced transparently.
+
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '30'))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))
+DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes')
+
+class PoolMetrics:
+    """Counters for connection checkouts and time spent waiting for one"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record_wait(self, seconds, timed_out=False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except Exception:
+            self.metrics.record_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        self.metrics.record_wait(time.perf_counter() - start)
+        return connection
+
+def _is_memory_sqlite(url):
+    return url.startswith('sqlite') and (':memory:' in url or url.rstrip('/') == 'sqlite:')
+
+def create_db_engine(url):
+    """Create an engine for url using the pool settings from the environment"""
+    options = {
+        'pool_pre_ping': DB_POOL_PRE_PING,
+        'pool_recycle': DB_POOL_RECYCLE
+    }
+    # In-memory SQLite needs its default single-connection pool
+    if not _is_memory_sqlite(url):
+        options.update({
+            'poolclass': InstrumentedQueuePool,
+            'pool_size': DB_POOL_SIZE,
+            'max_overflow': DB_MAX_OVERFLOW,
+            'pool_timeout': DB_POOL_TIMEOUT
+        })
+    return create_engine(url, **options)
+
+# Drivers for the async engine of the ASGI mode (see asgi.py)
+ASYNC_DRIVERS = {'sqlite': 'sqlite+aiosqlite', 'postgresql': 'postgresql+asyncpg'}
+
+def async_database_url(url):
+    """Return url with the async driver for its database"""
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None:
+        raise ValueError(f"No async driver for {parsed.get_backend_name()} databases")
+    return parsed.set(drivername=driver).render_as_string(hide_password=False)
+
+def create_async_db_engine(url):
+    """Create an AsyncEngine for url with the same pool settings as
+    create_db_engine"""
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+    options = {
+        'pool_pre_ping': DB_POOL_PRE_PING,
+        'pool_recycle': DB_POOL_RECYCLE
+    }
+    if not _is_memory_sqlite(url):
+        options.update({
+            'poolclass': AsyncAdaptedQueuePool,
+            'pool_size': DB_POOL_SIZE,
+            'max_overflow': DB_MAX_OVERFLOW,
+            'pool_timeout': DB_POOL_TIMEOUT
+        })
+    return create_async_engine(async_database_url(url), **options)
+
+def pool_status(engine):
+    """Return pool usage and checkout-wait metrics for an engine"""
+    pool = engine.pool
+    if not isinstance(pool, InstrumentedQueuePool):
+        return {"pool": type(pool).__name__}
+    metrics = pool.metrics
+    return {
+        "pool": type(pool).__name__,
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "overflow": max(pool.overflow(), 0),
+        "checked_in": pool.checkedin(),
+        "checkouts": metrics.checkouts,
+        "timeouts": metrics.timeouts,
+        "wait_seconds_total": metrics.wait_seconds_total,
+        "wait_seconds_max": metrics.wait_seconds_max
+    }
+
+def insert_ignoring_conflict(db, model, values, index_elements):
+    """INSERT a row unless one already exists for the unique index_elements,
+    returning whether it was inserted
+
+    Uses INSERT ... ON CONFLICT DO NOTHING on PostgreSQL and SQLite, and a
+    savepoint that swallows the IntegrityError elsewhere, so concurrent
+    inserts of the same row cannot fail the transaction.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        dialect_insert = None
+
+    if dialect_insert is not None:
+        return db.execute(dialect_insert(model).values(**values).on_conflict_do_nothing(
+            index_elements=index_elements
+        )).rowcount == 1
+    try:
+        with db.begin_nested():
+            db.execute(insert(model).values(**values))
+    except IntegrityError:
+        return False
+    return True
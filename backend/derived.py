@@ -0,0 +1,69 @@
+from datetime import datetime
+from achievements import update_achievements
+from data_version import bump_data_version
+from rollups import apply_rollup_deltas
+from user_stats import apply_expense_deltas
+
+# Post-write maintenance of the data derived from expenses.
+#
+# add_expense, delete_expense and the sync endpoint describe each change as
+# a small payload and queue it as a DERIVED_JOB keyed by user (see
+# jobs.py), so the request only pays for the expense write itself. The job
+# applies every change queued for the user in one transaction: stats,
+# streak, rollup and achievements, plus a data version bump so responses
+# cached in the meantime are rebuilt.
+#
+# Every expense write, and this job, takes its locks in the same order: the
+# user's row first (the version bump), then the stats rows. Two jobs for
+# one user never interleave, and a job never deadlocks with a request.
+# Writers call ensure_stats_tracked after their bump and before the write,
+# so the job never has to rebuild stats from a history that already holds
+# changes still queued. Changes lost with a crashed process are repaired by
+# reconcile-stats and rebuild-rollups.
+
+DERIVED_JOB = 'derived'
+
+def expense_change(op, expense):
+    """Payload describing an 'added' or 'deleted' expense"""
+    return {
+        "op": op,
+        "user_id": expense.user_id,
+        "amount": expense.amount,
+        "category": expense.category,
+        "date": expense.date.isoformat()
+    }
+
+def apply_expense_changes(db, user_id, changes):
+    """Apply a user's queued expense changes to stats and rollups; the
+    caller commits"""
+    bump_data_version(db, user_id)
+    day_deltas = {}
+    for change in changes:
+        sign = 1 if change["op"] == 'added' else -1
+        key = (datetime.fromisoformat(change["date"]).date(), change["category"])
+        count, amount = day_deltas.get(key, (0, 0.0))
+        day_deltas[key] = (count + sign, amount + sign * change["amount"])
+    apply_expense_deltas(db, user_id, day_deltas)
+    apply_rollup_deltas(db, user_id, day_deltas)
+    update_achievements(db, user_id)
+
+def make_derived_handler(session_factory, after=None):
+    """Job handler applying queued changes in a session of its own
+
+    after(db, user_id) runs once the changes are committed, e.g. to warm
+    caches for the user's new data version.
+    """
+    def handle(changes):
+        user_id = changes[0]["user_id"]
+        db = session_factory()
+        try:
+            apply_expense_changes(db, user_id, changes)
+            db.commit()
+            if after:
+                after(db, user_id)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+    return handle
@@ -0,0 +1,133 @@
+import csv
+import importlib.util
+import io
+import os
+from sqlalchemy import select
+from models import Expense
+from serializer import dumps
+
+# Streaming export of a user's expenses.
+#
+# Rows are read through a server-side cursor (stream_results/yield_per) and
+# encoded batch by batch into a generator, so peak memory depends on
+# EXPORT_BATCH_SIZE and not on how many expenses the user has.
+
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', '1000'))
+
+EXPORT_COLUMNS = ('id', 'amount', 'category', 'note', 'date', 'created_at', 'updated_at')
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet')
+}
+
+# pyarrow is optional and slow to import, so it is only loaded by a
+# Parquet export
+PYARROW_AVAILABLE = importlib.util.find_spec('pyarrow') is not None
+
+def available_formats():
+    """Export formats supported by the installed libraries"""
+    return [name for name in EXPORT_FORMATS if name != 'parquet' or PYARROW_AVAILABLE]
+
+def iter_expense_batches(db, user_id, batch_size=EXPORT_BATCH_SIZE):
+    """Yield lists of expense row tuples, oldest first, from a server-side cursor"""
+    statement = select(*[getattr(Expense, column) for column in EXPORT_COLUMNS]).where(
+        Expense.user_id == user_id
+    ).order_by(Expense.date, Expense.id).execution_options(
+        stream_results=True,
+        yield_per=batch_size
+    )
+    for partition in db.execute(statement).partitions():
+        yield partition
+
+def _isoformat(value):
+    return value.isoformat() if value is not None else None
+
+def _encode_csv(batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for batch in batches:
+        for row in batch:
+            writer.writerow(
+                [row[0], row[1], row[2], row[3]] + [_isoformat(value) for value in row[4:]]
+            )
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+def _encode_ndjson(batches):
+    for batch in batches:
+        yield b''.join(dumps(dict(zip(EXPORT_COLUMNS, row))) + b'\n' for row in batch)
+
+class _StreamSink:
+    """Write-only file object whose written bytes can be drained"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+def _encode_parquet(batches):
+    import pyarrow
+    import pyarrow.parquet
+    schema = pyarrow.schema([
+        ('id', pyarrow.int64()),
+        ('amount', pyarrow.float64()),
+        ('category', pyarrow.string()),
+        ('note', pyarrow.string()),
+        ('date', pyarrow.timestamp('us')),
+        ('created_at', pyarrow.timestamp('us')),
+        ('updated_at', pyarrow.timestamp('us'))
+    ])
+    sink = _StreamSink()
+    # Each batch becomes one row group
+    writer = pyarrow.parquet.ParquetWriter(sink, schema)
+    try:
+        for batch in batches:
+            columns = list(zip(*batch))
+            writer.write_table(pyarrow.Table.from_arrays(
+                [pyarrow.array(column, type=field.type) for column, field in zip(columns, schema)],
+                schema=schema
+            ))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+def stream_export(session_factory, user_id, export_format):
+    """Generate the encoded export in a session that is closed when done"""
+    encoders = {
+        'csv': _encode_csv,
+        'ndjson': _encode_ndjson,
+        'parquet': _encode_parquet
+    }
+    db = session_factory()
+    try:
+        for chunk in encoders[export_format](iter_expense_batches(db, user_id)):
+            if chunk:
+                yield chunk
+    finally:
+        db.close()
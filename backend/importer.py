@@ -0,0 +1,125 @@
+import csv
+import io
+import json
+import os
+from sqlalchemy import insert
+from achievements import update_achievements
+from models import Expense
+from user_stats import apply_expense_deltas
+from rollups import apply_rollup_deltas
+
+# Streaming bulk import of expenses.
+#
+# Request bodies are parsed row by row straight from the WSGI input stream
+# and inserted in executemany batches, so memory use is bounded by the batch
+# size rather than the size of the upload. Stats, rollups and achievements
+# are updated once at the end.
+
+IMPORT_BATCH_SIZE = int(os.getenv('IMPORT_BATCH_SIZE', '500'))
+IMPORT_MAX_ROWS = int(os.getenv('IMPORT_MAX_ROWS', '100000'))
+# Only the first errors are reported individually; the rest are counted
+IMPORT_MAX_REPORTED_ERRORS = 100
+
+CSV_MIMETYPES = ('text/csv', 'application/csv')
+JSONL_MIMETYPES = ('application/x-ndjson', 'application/jsonl', 'application/json-lines')
+
+def detect_format(mimetype, requested=None):
+    """Return 'csv' or 'jsonl' for a request, or None if unsupported"""
+    if requested:
+        return requested if requested in ('csv', 'jsonl') else None
+    if mimetype in CSV_MIMETYPES:
+        return 'csv'
+    if mimetype in JSONL_MIMETYPES:
+        return 'jsonl'
+    return None
+
+# Row iterators yield (row number, dict, None) for parsed rows and
+# (row number, None, error message) for rows that could not be parsed.
+
+def iter_csv_rows(stream):
+    """Yield rows of a CSV body with a header row"""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    reader = csv.DictReader(text)
+    row_number = 0
+    while True:
+        row_number += 1
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as e:
+            yield row_number, None, f"Invalid CSV row: {e}"
+            continue
+        yield row_number, row, None
+
+def iter_jsonl_rows(stream):
+    """Yield rows of a JSON Lines body, skipping blank lines"""
+    for line_number, line in enumerate(io.TextIOWrapper(stream, encoding='utf-8'), start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        if isinstance(row, dict):
+            yield line_number, row, None
+        else:
+            yield line_number, None, "Invalid JSON object"
+
+def import_expenses(db, user_id, rows, batch_size=IMPORT_BATCH_SIZE, max_rows=IMPORT_MAX_ROWS, sync_version=0):
+    """Validate and insert rows, returning a per-row report
+
+    The caller commits. Rows are validated with the same rules as
+    POST /api/expenses, and inserted at sync_version (see sync.py).
+    """
+    imported = 0
+    failed = 0
+    errors = []
+    day_totals = {}
+    batch = []
+
+    def report(row_number, message):
+        if len(errors) < IMPORT_MAX_REPORTED_ERRORS:
+            errors.append({"row": row_number, "error": message})
+
+    def flush():
+        if batch:
+            db.execute(insert(Expense), batch)
+            batch.clear()
+
+    for row_number, data, error in rows:
+        if imported + failed >= max_rows:
+            report(row_number, f"Import limited to {max_rows} rows")
+            failed += 1
+            break
+        if data is None:
+            report(row_number, error)
+            failed += 1
+            continue
+        error = Expense.validate(data)
+        if error:
+            report(row_number, error)
+            failed += 1
+            continue
+
+        values = Expense.values_from_dict(data, user_id)
+        values['sync_version'] = sync_version
+        batch.append(values)
+        imported += 1
+        key = (values['date'].date(), values['category'])
+        count, amount = day_totals.get(key, (0, 0.0))
+        day_totals[key] = (count + 1, amount + values['amount'])
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+
+    if imported:
+        apply_expense_deltas(db, user_id, day_totals)
+        apply_rollup_deltas(db, user_id, day_totals)
+        update_achievements(db, user_id)
+
+    return {
+        "imported": imported,
+        "failed": failed,
+        "errors": errors
+    }
@@ -0,0 +1,163 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from sqlalchemy import event
+
+# Per-request timing spans, SQL statement stats and Prometheus metrics.
+#
+# A RequestProfile is bound to the current request through a context
+# variable, so span() and the engine event hooks record into it from any
+# module without passing it around. Outside a request they only feed the
+# process-wide histograms. Metrics are per process: with several gunicorn
+# workers each one reports its own.
+
+# Histogram buckets in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_current_profile = ContextVar('finmate_request_profile', default=None)
+
+class RequestProfile:
+    """Spans and SQL stats collected while serving one request"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.spans = {}
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+
+    def add_span(self, name, seconds):
+        self.spans[name] = self.spans.get(name, 0.0) + seconds
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def server_timing(self):
+        """Render the Server-Timing header value (durations in ms)"""
+        entries = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in self.spans.items()]
+        entries.append(f'sql;dur={self.sql_seconds * 1000:.2f};desc="{self.sql_count} queries"')
+        entries.append(f"total;dur={self.elapsed() * 1000:.2f}")
+        return ', '.join(entries)
+
+def start_profile():
+    """Bind a new RequestProfile to the current context, returning it"""
+    profile = RequestProfile()
+    _current_profile.set(profile)
+    return profile
+
+def current_profile():
+    return _current_profile.get()
+
+def end_profile():
+    _current_profile.set(None)
+
+class Histogram:
+    """Cumulative Prometheus histogram with one series per label tuple"""
+
+    def __init__(self, name, documentation, label_names=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # Per-bucket counts (plus +Inf), sum, count
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    def _labels(self, labels, extra=None):
+        pairs = list(zip(self.label_names, labels))
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in pairs) + '}'
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((labels, [list(s[0]), s[1], s[2]]) for labels, s in self._series.items())
+        for labels, (counts, total, count) in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f"{self.name}_bucket{self._labels(labels, ('le', le))} {cumulative}")
+            lines.append(f"{self.name}_sum{self._labels(labels)} {total}")
+            lines.append(f"{self.name}_count{self._labels(labels)} {count}")
+        return lines
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+request_seconds = Histogram(
+    'finmate_request_duration_seconds', 'Time spent serving requests',
+    ('endpoint', 'method', 'status')
+)
+span_seconds = Histogram('finmate_span_duration_seconds', 'Time spent in request phases', ('span',))
+sql_seconds = Histogram('finmate_sql_duration_seconds', 'SQL statement execution time')
+
+@contextmanager
+def span(name):
+    """Time a request phase into the current profile and span_seconds"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        span_seconds.observe(seconds, name)
+        profile = _current_profile.get()
+        if profile is not None:
+            profile.add_span(name, seconds)
+
+def timed(name):
+    """Decorator form of span()"""
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('finmate_query_start', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - conn.info['finmate_query_start'].pop()
+    sql_seconds.observe(seconds)
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.sql_count += 1
+        profile.sql_seconds += seconds
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute
+    starts = exception_context.connection.info.get('finmate_query_start') if exception_context.connection else None
+    if starts:
+        starts.pop()
+
+def instrument_engine(engine):
+    """Count and time every statement executed through engine"""
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(engine, 'handle_error', _handle_error)
+
+def render_metrics(samples=None):
+    """Render the histograms plus {name: (type, documentation, value)}
+    counter/gauge samples in the Prometheus text exposition format"""
+    lines = []
+    for histogram in (request_seconds, span_seconds, sql_seconds):
+        lines.extend(histogram.render())
+    for name, (metric_type, documentation, value) in sorted((samples or {}).items()):
+        lines.extend([f"# HELP {name} {documentation}", f"# TYPE {name} {metric_type}", f"{name} {value}"])
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,244 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from kvstore import get_kv_client
+
+# Background job queue for work that can run after a response is sent.
+#
+# A job is a handler name, a key and a JSON-serializable payload. While a job
+# is still queued, later submissions with the same name and key are
+# coalesced into it, and its handler receives all of their payloads in one
+# call. A pool of JOB_WORKERS threads, started on first use, runs the
+# handlers. JOB_QUEUE_BACKEND selects where queued jobs wait:
+#
+# - memory: in this process (the default)
+# - shared: lists and sets in the Redis-compatible store from kvstore.py
+# - inline: nowhere; submit() runs the handler on the calling thread
+#
+# Jobs with the same name and key never run at the same time in one
+# process: a worker that pops a job while another still runs it waits for
+# that run to finish.
+#
+# shutdown() stops the workers once the queue is drained; jobs submitted
+# after that run inline, so nothing is dropped while a worker exits.
+
+JOB_QUEUE_BACKEND = os.getenv('JOB_QUEUE_BACKEND', 'memory')
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+# How long shutdown waits for queued jobs to finish
+JOB_DRAIN_TIMEOUT = float(os.getenv('JOB_DRAIN_TIMEOUT', '10'))
+# How often idle workers check for shutdown
+JOB_POLL_SECONDS = 1.0
+
+class MemoryJobBackend:
+    """Queued jobs in this process, in submission order"""
+
+    def __init__(self):
+        self._jobs = OrderedDict()
+        self._condition = threading.Condition()
+
+    def push(self, job_id, payload):
+        """Queue a payload, returning False if it joined a queued job"""
+        with self._condition:
+            payloads = self._jobs.get(job_id)
+            if payloads is not None:
+                payloads.append(payload)
+                return False
+            self._jobs[job_id] = [payload]
+            self._condition.notify()
+            return True
+
+    def pop(self, timeout):
+        """Take the oldest job as (job id, payloads), or None after timeout"""
+        with self._condition:
+            if not self._jobs:
+                self._condition.wait(timeout)
+            if not self._jobs:
+                return None
+            return self._jobs.popitem(last=False)
+
+    def __len__(self):
+        return len(self._jobs)
+
+class KeyValueJobBackend:
+    """Queued jobs in a shared Redis-compatible key-value client
+
+    Job ids wait in a list, with a set of the queued ids for coalescing and
+    one payload list per job.
+    """
+
+    def __init__(self, client, prefix='finmate:jobs:'):
+        self.client = client
+        self.queue_key = prefix + 'queue'
+        self.queued_key = prefix + 'queued'
+        self.payload_prefix = prefix + 'payloads:'
+
+    def push(self, job_id, payload):
+        # The payload goes in first, so a job popped right after the
+        # queued check still finds it
+        self.client.rpush(self.payload_prefix + job_id, json.dumps(payload))
+        if not self.client.sadd(self.queued_key, job_id):
+            return False
+        self.client.rpush(self.queue_key, job_id)
+        return True
+
+    def pop(self, timeout):
+        item = self.client.blpop([self.queue_key], timeout=max(1, int(timeout)))
+        if item is None:
+            return None
+        job_id = _text(item[1])
+        # Submissions from here on start a new job; payloads they push
+        # before we finish reading are handled now and that job gets none
+        self.client.srem(self.queued_key, job_id)
+        payloads = []
+        while True:
+            payload = self.client.lpop(self.payload_prefix + job_id)
+            if payload is None:
+                return job_id, payloads
+            payloads.append(json.loads(_text(payload)))
+
+    def __len__(self):
+        return self.client.llen(self.queue_key)
+
+def _text(value):
+    return value.decode('utf-8') if isinstance(value, bytes) else value
+
+class JobQueue:
+    """Run registered handlers on a worker pool, coalescing queued jobs"""
+
+    def __init__(self, backend, workers=JOB_WORKERS):
+        # A None backend runs every job inline
+        self.backend = backend
+        self.workers = workers
+        self._handlers = {}
+        self._threads = []
+        self._lock = threading.Lock()
+        # Locks of the jobs currently running, by job id
+        self._running = {}
+        self._closed = False
+        # Jobs queued by this process and not finished yet
+        self._unfinished = 0
+        self.submitted = 0
+        self.coalesced = 0
+        self.completed = 0
+        self.failed = 0
+
+    def register(self, name, handler):
+        """Register handler(payloads) for jobs named name"""
+        self._handlers[name] = handler
+
+    def submit(self, name, key, payload):
+        """Queue payload for the (name, key) job, returning False if it was
+        coalesced into one already waiting"""
+        if name not in self._handlers:
+            raise KeyError(f"No handler registered for job {name!r}")
+        with self._lock:
+            self.submitted += 1
+            inline = self.backend is None or self._closed
+        if inline:
+            self._run(name, [payload])
+            return True
+        with self._lock:
+            self._unfinished += 1
+        if not self.backend.push(f"{name}:{key}", payload):
+            with self._lock:
+                self._unfinished -= 1
+                self.coalesced += 1
+            return False
+        self._ensure_started()
+        return True
+
+    def _ensure_started(self):
+        if len(self._threads) < self.workers:
+            with self._lock:
+                while len(self._threads) < self.workers and not self._closed:
+                    thread = threading.Thread(target=self._work, name=f'job-worker-{len(self._threads)}', daemon=True)
+                    thread.start()
+                    self._threads.append(thread)
+
+    def _run(self, name, payloads):
+        try:
+            self._handlers[name](payloads)
+            failed = False
+        except Exception as e:
+            print(f"Job {name} failed: {e}")
+            failed = True
+        with self._lock:
+            self.completed += 1
+            self.failed += failed
+
+    def _work(self):
+        # Workers only exit once the queue is empty, which drains it
+        while True:
+            job = self.backend.pop(JOB_POLL_SECONDS)
+            if job is None:
+                if self._closed:
+                    return
+                continue
+            job_id, payloads = job
+            # Empty when every payload was picked up by an earlier run
+            if payloads:
+                with self._job_lock(job_id):
+                    self._run(job_id.split(':', 1)[0], payloads)
+            with self._lock:
+                self._unfinished -= 1
+
+    @contextmanager
+    def _job_lock(self, job_id):
+        with self._lock:
+            lock, users = self._running.get(job_id, (None, 0))
+            lock = lock or threading.Lock()
+            self._running[job_id] = (lock, users + 1)
+        try:
+            with lock:
+                yield
+        finally:
+            with self._lock:
+                lock, users = self._running[job_id]
+                if users == 1:
+                    del self._running[job_id]
+                else:
+                    self._running[job_id] = (lock, users - 1)
+
+    def wait_idle(self, timeout=None):
+        """Wait until the jobs submitted through this queue have run;
+        returns False on timeout. Jobs queued by other processes sharing
+        the backend are not tracked."""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while self._unfinished > 0:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.005)
+        return True
+
+    def shutdown(self, timeout=JOB_DRAIN_TIMEOUT):
+        """Stop accepting queued jobs, let the workers drain the queue and
+        exit; returns True if they did within timeout"""
+        with self._lock:
+            self._closed = True
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(max(0, deadline - time.monotonic()))
+        return not any(thread.is_alive() for thread in self._threads)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": type(self.backend).__name__ if self.backend is not None else 'inline',
+                "queued": len(self.backend) if self.backend is not None else 0,
+                "workers": len(self._threads),
+                "submitted": self.submitted,
+                "coalesced": self.coalesced,
+                "completed": self.completed,
+                "failed": self.failed
+            }
+
+def create_job_queue(backend=JOB_QUEUE_BACKEND):
+    """Build a JobQueue for the configured backend"""
+    if backend == 'inline':
+        return JobQueue(None)
+    if backend == 'shared':
+        return JobQueue(KeyValueJobBackend(get_kv_client()))
+    return JobQueue(MemoryJobBackend())
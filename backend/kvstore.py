@@ -0,0 +1,136 @@
+import os
+import threading
+import time
+
+# Key-value store clients for state shared between workers.
+#
+# SHARED_CACHE_URL selects the store: redis:// and rediss:// URLs use the
+# optional redis package, while local:// (the default) uses
+# LocalKeyValueStore, an in-process stand-in implementing the subset of the
+# Redis client API that FinMate needs. The local store is only shared between
+# threads of one process, which is enough for development and tests.
+
+SHARED_CACHE_URL = os.getenv('SHARED_CACHE_URL', 'local://')
+
+class LocalKeyValueStore:
+    """Thread-safe in-process stand-in for a Redis client"""
+
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._data = {}
+        self._expires = {}
+        self._lock = threading.RLock()
+        # Wakes blpop callers when a list gets an item
+        self._pushed = threading.Condition(self._lock)
+
+    def _purge(self, key):
+        expires = self._expires.get(key)
+        if expires is not None and expires <= self._clock():
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+
+    def get(self, key):
+        with self._lock:
+            self._purge(key)
+            return self._data.get(key)
+
+    def set(self, key, value, ex=None):
+        with self._lock:
+            self._data[key] = value
+            if ex is not None:
+                self._expires[key] = self._clock() + ex
+            else:
+                self._expires.pop(key, None)
+            return True
+
+    def setex(self, key, seconds, value):
+        return self.set(key, value, ex=seconds)
+
+    def delete(self, *keys):
+        with self._lock:
+            removed = 0
+            for key in keys:
+                self._purge(key)
+                if key in self._data:
+                    del self._data[key]
+                    self._expires.pop(key, None)
+                    removed += 1
+            return removed
+
+    # Lists and sets (used by the shared job queue)
+
+    def rpush(self, key, *values):
+        with self._lock:
+            self._purge(key)
+            items = self._data.setdefault(key, [])
+            items.extend(values)
+            self._pushed.notify_all()
+            return len(items)
+
+    def lpop(self, key):
+        with self._lock:
+            self._purge(key)
+            items = self._data.get(key)
+            if not items:
+                return None
+            value = items.pop(0)
+            if not items:
+                del self._data[key]
+            return value
+
+    def blpop(self, keys, timeout=0):
+        """Pop from the first non-empty list, waiting up to timeout seconds
+        (forever for 0); returns (key, value) or None"""
+        deadline = self._clock() + timeout if timeout else None
+        with self._lock:
+            while True:
+                for key in keys:
+                    value = self.lpop(key)
+                    if value is not None:
+                        return key, value
+                remaining = deadline - self._clock() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._pushed.wait(remaining)
+
+    def llen(self, key):
+        with self._lock:
+            self._purge(key)
+            return len(self._data.get(key, ()))
+
+    def sadd(self, key, *members):
+        with self._lock:
+            self._purge(key)
+            existing = self._data.setdefault(key, set())
+            added = len(set(members) - existing)
+            existing.update(members)
+            return added
+
+    def srem(self, key, *members):
+        with self._lock:
+            existing = self._data.get(key, set())
+            removed = len(existing & set(members))
+            existing.difference_update(members)
+            if not existing:
+                self._data.pop(key, None)
+            return removed
+
+    def flushall(self):
+        with self._lock:
+            self._data.clear()
+            self._expires.clear()
+            return True
+
+_local_store = LocalKeyValueStore()
+
+def get_kv_client(url=None):
+    """Return a key-value client for url (defaults to SHARED_CACHE_URL)"""
+    url = url or SHARED_CACHE_URL
+    if url.startswith(('redis://', 'rediss://')):
+        try:
+            import redis
+        except ImportError:
+            print("Warning: redis package not installed. Using local key-value store.")
+            return _local_store
+        return redis.Redis.from_url(url)
+    return _local_store
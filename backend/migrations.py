@@ -0,0 +1,112 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime, MetaData, Table, inspect, select, text
+from models import User, Expense, ExpenseRollup, ExpenseTombstone, UserStats
+from rollups import backfill_rollups
+
+# Versioned schema migrations.
+#
+# Base.metadata.create_all only creates missing tables, so changes to
+# existing tables are applied here. Each migration runs once per database
+# and is recorded in schema_migrations. Migrations are written to be safe on
+# databases created by create_all with the current models, where the change
+# is already present.
+#
+# On PostgreSQL each migration transaction holds an advisory lock, so
+# concurrent runs (several deploys or workers) apply every migration once.
+
+# Key for pg_advisory_xact_lock, shared by every FinMate migration run
+MIGRATION_LOCK_ID = 7305521
+
+migration_metadata = MetaData()
+
+schema_migrations = Table(
+    'schema_migrations', migration_metadata,
+    Column('version', Integer, primary_key=True),
+    Column('name', String(255), nullable=False),
+    Column('applied_at', DateTime, default=datetime.utcnow)
+)
+
+def _add_column_if_missing(conn, table, column):
+    existing = {c['name'] for c in inspect(conn).get_columns(table.name)}
+    if column.name not in existing:
+        definition = f'{column.name} {column.type.compile(dialect=conn.dialect)}'
+        if column.server_default is not None:
+            definition += f' NOT NULL DEFAULT {column.server_default.arg}'
+        conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {definition}'))
+
+def _create_indexes(conn, table, names=None):
+    for index in table.indexes:
+        if names is None or index.name in names:
+            index.create(bind=conn, checkfirst=True)
+
+def add_user_stats_last_expense_date(conn):
+    _add_column_if_missing(conn, UserStats.__table__, UserStats.__table__.c.last_expense_date)
+
+def add_expense_indexes(conn):
+    # Indexes on later columns are created by the migrations adding them
+    _create_indexes(conn, Expense.__table__, ('ix_expenses_user_id_date_id', 'ix_expenses_user_id_category'))
+
+def add_user_stats_user_id_unique_index(conn):
+    # Older versions could create several stats rows per user; keep the
+    # first one. Stats are derived data and reconcile-stats rebuilds them.
+    conn.execute(text(
+        'DELETE FROM user_stats WHERE id NOT IN '
+        '(SELECT min_id FROM (SELECT MIN(id) AS min_id FROM user_stats GROUP BY user_id) AS keep)'
+    ))
+    _create_indexes(conn, UserStats.__table__)
+
+def add_users_data_version(conn):
+    _add_column_if_missing(conn, User.__table__, User.__table__.c.data_version)
+
+def add_expense_rollups(conn):
+    ExpenseRollup.__table__.create(bind=conn, checkfirst=True)
+    backfill_rollups(conn)
+
+def add_expense_sync(conn):
+    table = Expense.__table__
+    _add_column_if_missing(conn, table, table.c.client_id)
+    _add_column_if_missing(conn, table, table.c.sync_version)
+    _create_indexes(conn, table, ('ix_expenses_user_id_sync_version', 'ux_expenses_user_id_client_id'))
+    ExpenseTombstone.__table__.create(bind=conn, checkfirst=True)
+
+MIGRATIONS = [
+    (1, 'add user_stats.last_expense_date', add_user_stats_last_expense_date),
+    (2, 'add expense (user_id, date, id) and (user_id, category) indexes', add_expense_indexes),
+    (3, 'add unique index on user_stats.user_id', add_user_stats_user_id_unique_index),
+    (4, 'add users.data_version', add_users_data_version),
+    (5, 'add expense_rollups and backfill from expenses', add_expense_rollups),
+    (6, 'add expenses.client_id, expenses.sync_version and expense_tombstones', add_expense_sync),
+]
+
+def applied_versions(engine):
+    migration_metadata.create_all(bind=engine)
+    with engine.connect() as conn:
+        return {version for (version,) in conn.execute(select(schema_migrations.c.version))}
+
+def _lock_migrations(conn):
+    if conn.dialect.name == 'postgresql':
+        conn.execute(text('SELECT pg_advisory_xact_lock(:lock_id)'), {'lock_id': MIGRATION_LOCK_ID})
+
+def run_migrations(engine):
+    """Apply pending migrations in order, each in its own transaction
+
+    Returns the names of the migrations that were applied.
+    """
+    done = applied_versions(engine)
+    applied = []
+    for version, name, migrate in MIGRATIONS:
+        if version in done:
+            continue
+        with engine.begin() as conn:
+            _lock_migrations(conn)
+            # Another run may have applied it while we waited for the lock
+            already_applied = conn.execute(
+                select(schema_migrations.c.version).where(schema_migrations.c.version == version)
+            ).first()
+            if already_applied:
+                continue
+            migrate(conn)
+            conn.execute(schema_migrations.insert().values(version=version, name=name))
+        applied.append(name)
+        print(f"Applied migration {version}: {name}")
+    return applied
@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, Text, ForeignKey, Index, UniqueConstraint, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
+import math
 import uuid
 
 Base = declarative_base()
@@ -13,6 +14,8 @@ class User(Base):
     firebase_uid = Column(String(128), unique=True, nullable=False)
     email = Column(String(255), nullable=False)
     display_name = Column(String(255))
+    # Bumped on every expense write; drives ETags and response caching
+    data_version = Column(Integer, nullable=False, default=0, server_default='0')
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -31,6 +34,14 @@ class User(Base):
 
 class Expense(Base):
     __tablename__ = 'expenses'
+    __table_args__ = (
+        # Every query filters on user_id; lists page newest first on (date, id)
+        Index('ix_expenses_user_id_date_id', 'user_id', text('date DESC'), text('id DESC')),
+        Index('ix_expenses_user_id_category', 'user_id', 'category'),
+        # /api/sync reads the rows changed after a version
+        Index('ix_expenses_user_id_sync_version', 'user_id', 'sync_version'),
+        Index('ux_expenses_user_id_client_id', 'user_id', 'client_id', unique=True),
+    )
     
     id = Column(Integer, primary_key=True)
     user_id = Column(String(36), ForeignKey('users.id'), nullable=False)
@@ -38,6 +49,10 @@ class Expense(Base):
     category = Column(String(100), nullable=False)
     note = Column(Text)
     date = Column(DateTime, nullable=False, default=datetime.utcnow)
+    # Id generated by an offline client, for expenses created through /api/sync
+    client_id = Column(String(36))
+    # users.data_version of the write that last changed the row
+    sync_version = Column(Integer, nullable=False, default=0, server_default='0')
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -56,24 +71,87 @@ class Expense(Base):
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
     
+    @staticmethod
+    def validate(data):
+        """Return an error message if data is not a valid expense, else None"""
+        # Validate required fields
+        amount = data.get('amount')
+        category = data.get('category')
+        
+        if not amount or not category:
+            return "Amount and category are required"
+            
+        # Validate amount is a positive, finite number
+        if isinstance(amount, bool) or not isinstance(amount, (int, float, str)):
+            return "Amount must be a valid number"
+        try:
+            amount_float = float(amount)
+        except (ValueError, TypeError):
+            return "Amount must be a valid number"
+        if not math.isfinite(amount_float):
+            return "Amount must be a valid number"
+        if amount_float <= 0:
+            return "Amount must be a positive number"
+        
+        # Validate category length
+        if not isinstance(category, str):
+            return "Category must be text"
+        if len(category.strip()) == 0 or len(category) > 100:
+            return "Category must be between 1 and 100 characters"
+        
+        # Validate note type
+        if data.get('note') is not None and not isinstance(data['note'], str):
+            return "Note must be text"
+        
+        # Validate date format
+        if data.get('date'):
+            try:
+                datetime.fromisoformat(data['date'])
+            except (ValueError, TypeError):
+                return "Date must be an ISO date"
+        return None
+    
+    @classmethod
+    def values_from_dict(cls, data, user_id):
+        """Column values for a new expense, suitable for bulk inserts"""
+        return {
+            'user_id': user_id,
+            'amount': float(data.get('amount', 0)),
+            'category': data.get('category', ''),
+            'note': data.get('note', ''),
+            'date': datetime.fromisoformat(data.get('date') or datetime.now().isoformat())
+        }
+    
     @classmethod
     def from_dict(cls, data, user_id):
-        return cls(
-            user_id=user_id,
-            amount=float(data.get('amount', 0)),
-            category=data.get('category', ''),
-            note=data.get('note', ''),
-            date=datetime.fromisoformat(data.get('date', datetime.now().isoformat()))
-        )
+        return cls(**cls.values_from_dict(data, user_id))
+
+class ExpenseTombstone(Base):
+    """Record of a deleted expense, so /api/sync can report the delete"""
+    __tablename__ = 'expense_tombstones'
+    __table_args__ = (
+        Index('ix_expense_tombstones_user_id_version', 'user_id', 'version'),
+        Index('ix_expense_tombstones_user_id_client_id', 'user_id', 'client_id'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(String(36), ForeignKey('users.id'), nullable=False)
+    expense_id = Column(Integer, nullable=False)
+    client_id = Column(String(36))
+    # users.data_version of the delete
+    version = Column(Integer, nullable=False)
+    deleted_at = Column(DateTime, default=datetime.utcnow)
 
 class UserStats(Base):
     __tablename__ = 'user_stats'
     
     id = Column(Integer, primary_key=True)
-    user_id = Column(String(36), ForeignKey('users.id'), nullable=False)
+    user_id = Column(String(36), ForeignKey('users.id'), nullable=False, unique=True, index=True)
     total_expenses = Column(Integer, default=0)
     total_amount = Column(Float, default=0.0)
     streak_days = Column(Integer, default=0)
+    # Day of the newest expense; the streak ends on this day
+    last_expense_date = Column(Date)
     last_activity = Column(DateTime, default=datetime.utcnow)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -85,7 +163,50 @@ class UserStats(Base):
             'total_expenses': self.total_expenses,
             'total_amount': self.total_amount,
             'streak_days': self.streak_days,
+            'last_expense_date': self.last_expense_date.isoformat() if self.last_expense_date else None,
             'last_activity': self.last_activity.isoformat() if self.last_activity else None,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
+
+class UserAchievements(Base):
+    """Achievements a user has unlocked (see achievements.py)"""
+    __tablename__ = 'user_achievements'
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(String(36), ForeignKey('users.id'), nullable=False, unique=True, index=True)
+    # JSON object of achievement id -> ISO unlock time
+    unlocked = Column(Text, nullable=False, default='{}')
+    # Longest streak seen; UserStats only holds the latest one
+    best_streak = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class CategoryStats(Base):
+    __tablename__ = 'user_category_stats'
+    __table_args__ = (UniqueConstraint('user_id', 'category'),)
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(String(36), ForeignKey('users.id'), nullable=False)
+    category = Column(String(100), nullable=False)
+    total_expenses = Column(Integer, default=0)
+    total_amount = Column(Float, default=0.0)
+    
+    def to_dict(self):
+        return {
+            'category': self.category,
+            'total_expenses': self.total_expenses,
+            'total_amount': self.total_amount
+        }
+
+class ExpenseRollup(Base):
+    """Count and sum of a user's expenses per day and category"""
+    __tablename__ = 'expense_rollups'
+    # Also serves (user_id, day) range scans for time series
+    __table_args__ = (UniqueConstraint('user_id', 'day', 'category'),)
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(String(36), ForeignKey('users.id'), nullable=False)
+    day = Column(Date, nullable=False)
+    category = Column(String(100), nullable=False)
+    total_expenses = Column(Integer, nullable=False, default=0)
+    total_amount = Column(Float, nullable=False, default=0.0)
@@ -0,0 +1,81 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+# Opt-in sampling profiler for slow requests.
+#
+# When PROFILE_SLOW_REQUESTS_MS is set, one background thread samples the
+# stacks of the threads currently serving requests every
+# PROFILE_SAMPLE_INTERVAL_MS. Requests slower than the threshold have their
+# samples written to PROFILE_DIR in the folded format ("frame;frame;frame
+# count" per line) read by flamegraph.pl, speedscope and inferno.
+
+PROFILE_SLOW_REQUESTS_MS = os.getenv('PROFILE_SLOW_REQUESTS_MS')
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv('PROFILE_SAMPLE_INTERVAL_MS', '5'))
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+
+def fold_stack(frame):
+    """Return a frame's stack as 'file:function;...' from the outermost call"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+class SamplingProfiler:
+    """Sample registered threads and dump the stacks of slow requests"""
+
+    def __init__(self, threshold_ms, interval_ms=PROFILE_SAMPLE_INTERVAL_MS, output_dir=PROFILE_DIR):
+        self.threshold = threshold_ms / 1000
+        self.interval = interval_ms / 1000
+        self.output_dir = output_dir
+        self._samples = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                for ident, samples in self._samples.items():
+                    frame = frames.get(ident)
+                    if frame is not None:
+                        samples[fold_stack(frame)] += 1
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+                    self._thread.start()
+
+    def start(self):
+        """Start sampling the calling thread"""
+        self._ensure_started()
+        with self._lock:
+            self._samples[threading.get_ident()] = Counter()
+
+    def stop(self, seconds, label):
+        """Stop sampling the calling thread; if the request took longer than
+        the threshold, write its stacks and return the file path"""
+        with self._lock:
+            samples = self._samples.pop(threading.get_ident(), None)
+        if not samples or seconds < self.threshold:
+            return None
+        os.makedirs(self.output_dir, exist_ok=True)
+        safe_label = ''.join(c if c.isalnum() or c in '-_.' else '_' for c in label)
+        path = os.path.join(self.output_dir, f"{time.strftime('%Y%m%dT%H%M%S')}-{int(seconds * 1000)}ms-{safe_label}.folded")
+        with open(path, 'w') as f:
+            for stack, count in samples.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
+
+def create_profiler():
+    """SamplingProfiler configured from the environment, or None when off"""
+    if not PROFILE_SLOW_REQUESTS_MS:
+        return None
+    return SamplingProfiler(float(PROFILE_SLOW_REQUESTS_MS))
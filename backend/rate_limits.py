@@ -0,0 +1,73 @@
+import importlib.util
+import os
+from flask import g, request
+from flask_limiter.util import get_remote_address
+from kvstore import SHARED_CACHE_URL
+
+# Rate limit storage, strategy and keys for flask-limiter.
+#
+# With RATE_LIMIT_BACKEND=shared (the default) and a redis:// SHARED_CACHE_URL
+# the limiter keeps its counters in Redis, so every gunicorn worker counts
+# against the same budget. Otherwise, including the default local://
+# SHARED_CACHE_URL, counters live in the limiter's in-process memory://
+# storage, which is only right for a single worker, development and tests.
+#
+# RATE_LIMIT_STRATEGY picks how requests are counted:
+#
+# - moving-window: exact; stores a timestamp per request in the window
+# - sliding-window-counter: two counters per limit, the previous window
+#   weighted by how much of it still overlaps; smooths bursts like a token
+#   bucket at a constant cost per check
+# - fixed-window: one counter; allows up to twice the limit across a window
+#   boundary
+#
+# Requests with a valid bearer token are counted per Firebase uid, so users
+# behind one address do not share a budget and one user cannot reset theirs
+# by switching networks. Anything else is counted per client address.
+
+RATE_LIMIT_BACKEND = os.getenv('RATE_LIMIT_BACKEND', 'shared')
+RATE_LIMIT_STRATEGY = os.getenv('RATE_LIMIT_STRATEGY', 'moving-window')
+RATE_LIMIT_STRATEGIES = ('moving-window', 'sliding-window-counter', 'fixed-window')
+
+def rate_limit_storage_uri(backend=RATE_LIMIT_BACKEND, url=None):
+    """Return the flask-limiter storage URI for the configured backend"""
+    url = url or SHARED_CACHE_URL
+    if backend != 'shared' or not url.startswith(('redis://', 'rediss://')):
+        return 'memory://'
+    if importlib.util.find_spec('redis') is None:
+        print("Warning: redis package not installed. Rate limits are counted per process.")
+        return 'memory://'
+    return url
+
+def rate_limit_config(backend=RATE_LIMIT_BACKEND, strategy=RATE_LIMIT_STRATEGY):
+    """flask-limiter settings for app.config"""
+    if strategy not in RATE_LIMIT_STRATEGIES:
+        print(f"Warning: Unknown RATE_LIMIT_STRATEGY {strategy!r}. Using moving-window.")
+        strategy = 'moving-window'
+    storage_uri = rate_limit_storage_uri(backend)
+    return {
+        'RATELIMIT_STORAGE_URI': storage_uri,
+        'RATELIMIT_STRATEGY': strategy,
+        # Count per process while a shared store is unreachable rather than
+        # failing every request
+        'RATELIMIT_IN_MEMORY_FALLBACK_ENABLED': storage_uri != 'memory://'
+    }
+
+def limit_key(claims, address):
+    """Limiter key for a request's verified token claims (or None) and
+    client address"""
+    return f"user:{claims['uid']}" if claims else f"ip:{address}"
+
+def request_limit_key(verify):
+    """Limiter key of the current request, 'user:<uid>' or 'ip:<address>'
+
+    verify(token) returns the token's claims or None. The key is computed
+    once per request, however many limits apply to the route.
+    """
+    key = g.get('rate_limit_key')
+    if key is None:
+        token = request.headers.get('Authorization', '').replace('Bearer ', '')
+        claims = verify(token) if token else None
+        key = limit_key(claims, get_remote_address())
+        g.rate_limit_key = key
+    return key
@@ -0,0 +1,154 @@
+import itertools
+import os
+import threading
+import time
+from sqlalchemy import event, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+from database import create_db_engine
+from instrumentation import instrument_engine
+from kvstore import get_kv_client
+
+# Routing of read-only handlers to read replicas.
+#
+# READ_REPLICA_URLS lists replica databases, comma separated. Handlers that
+# only read take their session from get_read_db, which the router serves
+# from the healthy replicas in turn. The list, export, stats and other
+# analytical reads then stop competing with writes on the primary. Writes,
+# and the lookup that may create a user, always use the primary.
+#
+# Read-your-writes: a successful expense write marks its user in the
+# shared key-value store (see kvstore.py) for REPLICA_STICKY_SECONDS. The
+# user's reads stay on the primary until then, which should outlast
+# replication lag. With a redis:// SHARED_CACHE_URL every worker sees the
+# mark.
+#
+# Failover: every REPLICA_CHECK_INTERVAL seconds a read probes its replica
+# before using it. A replica that fails the probe, or loses a connection
+# during a query, leaves the rotation until a later probe succeeds. With
+# no healthy replica, reads go to the primary.
+
+READ_REPLICA_URLS = os.getenv('READ_REPLICA_URLS', '')
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', '10'))
+REPLICA_CHECK_INTERVAL = float(os.getenv('REPLICA_CHECK_INTERVAL', '5'))
+
+def parse_replica_urls(value):
+    """Split a comma separated READ_REPLICA_URLS value"""
+    return [url.strip() for url in (value or '').split(',') if url.strip()]
+
+class Replica:
+    """A read replica's engine, session factory and health"""
+
+    def __init__(self, url, check_interval=REPLICA_CHECK_INTERVAL, clock=time.monotonic):
+        self.url = url
+        self.engine = create_db_engine(url)
+        instrument_engine(self.engine)
+        self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self.check_interval = check_interval
+        self.healthy = True
+        self.reads = 0
+        self._clock = clock
+        # Probe before the first read
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        self.watch(self.engine)
+
+    def watch(self, engine):
+        """Take the replica out of rotation on connection errors of engine,
+        another engine for the same database"""
+        event.listen(engine, 'handle_error', self._on_error)
+
+    def _on_error(self, context):
+        # Covers refused and lost connections, and a replica missing the
+        # schema; other SQL errors leave it in rotation
+        if isinstance(context.sqlalchemy_exception, OperationalError):
+            self._set_healthy(False, context.original_exception)
+
+    def _set_healthy(self, healthy, error=None):
+        if self.healthy and not healthy:
+            print(f"Read replica {self.engine.url!r} unavailable, reading from the primary: {error}")
+        elif healthy and not self.healthy:
+            print(f"Read replica {self.engine.url!r} is back in rotation")
+        self.healthy = healthy
+        self._next_check = self._clock() + self.check_interval
+
+    def probe(self):
+        """Check that the replica answers a query on the schema"""
+        try:
+            with self.engine.connect() as conn:
+                conn.execute(text('SELECT 1 FROM users LIMIT 1'))
+        except Exception as e:
+            self._set_healthy(False, e)
+            return False
+        self._set_healthy(True)
+        return True
+
+    def available(self):
+        """Whether reads may use the replica, probing it when a check is due"""
+        if self._clock() >= self._next_check and self._lock.acquire(blocking=False):
+            # One thread probes; the others go by the last result
+            try:
+                self.probe()
+            finally:
+                self._lock.release()
+        return self.healthy
+
+class SessionRouter:
+    """Pick the session factory for reads: a replica, or the primary"""
+
+    def __init__(self, primary_sessions, replicas, sticky_seconds=REPLICA_STICKY_SECONDS,
+                 client=None, prefix='finmate:wrote:'):
+        self.primary_sessions = primary_sessions
+        self.replicas = replicas
+        self.sticky_seconds = sticky_seconds
+        self.client = client or get_kv_client()
+        self.prefix = prefix
+        self.primary_reads = 0
+        self._cycle = itertools.cycle(replicas)
+        self._lock = threading.Lock()
+
+    def mark_written(self, firebase_uid):
+        """Keep the user's reads on the primary for sticky_seconds"""
+        try:
+            self.client.setex(self.prefix + firebase_uid, self.sticky_seconds, '1')
+        except Exception as e:
+            print(f"Warning: could not record write for replica routing: {e}")
+
+    def _recently_wrote(self, firebase_uid):
+        try:
+            return self.client.get(self.prefix + firebase_uid) is not None
+        except Exception:
+            # Without the mark, the primary is the safe choice
+            return True
+
+    def read_sessions(self, firebase_uid):
+        """Session factory for a read-only handler of the user"""
+        if not self._recently_wrote(firebase_uid):
+            for _ in range(len(self.replicas)):
+                with self._lock:
+                    replica = next(self._cycle)
+                if replica.available():
+                    replica.reads += 1
+                    return replica.SessionLocal
+        self.primary_reads += 1
+        return self.primary_sessions
+
+    def status(self):
+        return {
+            "primary_reads": self.primary_reads,
+            "replicas": [
+                {"url": replica.engine.url.render_as_string(), "healthy": replica.healthy, "reads": replica.reads}
+                for replica in self.replicas
+            ]
+        }
+
+    def dispose(self):
+        for replica in self.replicas:
+            replica.engine.dispose()
+
+def create_session_router(primary_sessions, urls=READ_REPLICA_URLS):
+    """Return a SessionRouter over the replica URLs, or None without any"""
+    urls = parse_replica_urls(urls) if isinstance(urls, str) else list(urls or [])
+    if not urls:
+        return None
+    return SessionRouter(primary_sessions, [Replica(url) for url in urls])
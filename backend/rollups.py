@@ -0,0 +1,167 @@
+from sqlalchemy import delete, func, insert, select
+from datetime import date, datetime, timedelta
+from models import User, Expense, ExpenseRollup
+from database import insert_ignoring_conflict
+
+# Materialized per-day spending rollups.
+#
+# ExpenseRollup holds one row per (user, day, category) with the count and
+# sum of the user's expenses on that day. apply_rollup_deltas keeps it in
+# step with expense writes, like the stats in user_stats.py.
+# Time-series reads only touch the rollup, so their cost depends on the
+# length of the requested range rather than on how much history the user
+# has.
+
+BUCKETS = ('day', 'week', 'month')
+# Default range per bucket when the request has no start date
+DEFAULT_BUCKET_COUNTS = {'day': 30, 'week': 12, 'month': 12}
+# Upper bound on the buckets in one time series, empty ones included
+MAX_BUCKETS = 1000
+
+def _to_day(value):
+    if isinstance(value, str):
+        return datetime.fromisoformat(value).date()
+    return value.date() if isinstance(value, datetime) else value
+
+def _apply_delta(db, user_id, day, category, count, amount):
+    insert_ignoring_conflict(db, ExpenseRollup, {
+        'user_id': user_id,
+        'day': day,
+        'category': category,
+        'total_expenses': 0,
+        'total_amount': 0.0
+    }, ['user_id', 'day', 'category'])
+    key = (
+        ExpenseRollup.user_id == user_id,
+        ExpenseRollup.day == day,
+        ExpenseRollup.category == category
+    )
+    db.query(ExpenseRollup).filter(*key).update({
+        ExpenseRollup.total_expenses: ExpenseRollup.total_expenses + count,
+        ExpenseRollup.total_amount: ExpenseRollup.total_amount + amount
+    }, synchronize_session=False)
+    # Drop emptied rows rather than keep float residue around. Counts can
+    # dip below zero while a delete is applied before the insert it undoes
+    # (derived jobs may apply a user's changes out of order), so only exactly empty rows go.
+    db.query(ExpenseRollup).filter(*key, ExpenseRollup.total_expenses == 0).delete(
+        synchronize_session=False
+    )
+
+def apply_rollup_deltas(db, user_id, day_deltas):
+    """Apply {(day, category): (count delta, amount delta)} from any mix of
+    added, deleted and updated expenses to the user's rollup"""
+    for (day, category), (count, amount) in sorted(day_deltas.items()):
+        if count or amount:
+            _apply_delta(db, user_id, day, category, count, amount)
+
+def _rebuild_statement(*criteria):
+    day = func.date(Expense.date)
+    query = select(
+        Expense.user_id, day, Expense.category,
+        func.count(Expense.id), func.sum(Expense.amount)
+    ).where(*criteria).group_by(Expense.user_id, day, Expense.category)
+    return insert(ExpenseRollup).from_select(
+        ['user_id', 'day', 'category', 'total_expenses', 'total_amount'], query
+    )
+
+def rebuild_user_rollups(db, user_id):
+    """Recompute a user's rollup rows from their expenses
+
+    Returns the number of rows written. The caller is responsible for
+    committing.
+    """
+    db.execute(delete(ExpenseRollup).where(ExpenseRollup.user_id == user_id))
+    return db.execute(_rebuild_statement(Expense.user_id == user_id)).rowcount
+
+def rebuild_all_rollups(db):
+    """Rebuild every user's rollup, committing per user
+
+    Returns (users rebuilt, rows written).
+    """
+    users = rows = 0
+    user_ids = [user_id for (user_id,) in db.query(User.id).all()]
+    for user_id in user_ids:
+        try:
+            rows += rebuild_user_rollups(db, user_id)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"Error rebuilding rollups for user {user_id}: {e}")
+        users += 1
+    return users, rows
+
+def backfill_rollups(conn):
+    """Rebuild every rollup row on a connection (used by the migration)"""
+    conn.execute(delete(ExpenseRollup))
+    conn.execute(_rebuild_statement())
+
+def get_rollup_totals(db, user_id):
+    """Return (expense count, total amount) for a user from the rollup"""
+    count, total = db.query(
+        func.coalesce(func.sum(ExpenseRollup.total_expenses), 0),
+        func.coalesce(func.sum(ExpenseRollup.total_amount), 0.0)
+    ).filter(ExpenseRollup.user_id == user_id).one()
+    return count, total
+
+def bucket_start(day, bucket):
+    """First day of the day/week/month bucket containing day; weeks start
+    on Monday"""
+    if bucket == 'week':
+        return day - timedelta(days=day.weekday())
+    if bucket == 'month':
+        return day.replace(day=1)
+    return day
+
+def next_bucket(start, bucket):
+    if bucket == 'week':
+        return start + timedelta(days=7)
+    if bucket == 'month':
+        return date(start.year + start.month // 12, start.month % 12 + 1, 1)
+    return start + timedelta(days=1)
+
+def default_range_start(end, bucket):
+    """Start of the default range: DEFAULT_BUCKET_COUNTS buckets up to end"""
+    start = bucket_start(end, bucket)
+    for _ in range(DEFAULT_BUCKET_COUNTS[bucket] - 1):
+        if bucket == 'month':
+            start = (start - timedelta(days=1)).replace(day=1)
+        else:
+            start -= timedelta(days=7 if bucket == 'week' else 1)
+    return start
+
+def get_time_series(db, user_id, bucket, start, end, category=None):
+    """Spending per bucket between the start and end days (inclusive)
+
+    Every bucket in the range is returned, oldest first, with its expense
+    count, total and per-category totals; buckets without expenses are
+    zero. Only rollup rows are read.
+    """
+    if bucket not in BUCKETS:
+        raise ValueError(f"bucket must be one of: {', '.join(BUCKETS)}")
+    if start > end:
+        raise ValueError("start must not be after end")
+
+    series = {}
+    period = bucket_start(start, bucket)
+    while period <= end:
+        if len(series) >= MAX_BUCKETS:
+            raise ValueError(f"Range is limited to {MAX_BUCKETS} {bucket} buckets")
+        series[period] = {"period": period.isoformat(), "count": 0, "total": 0.0, "categories": {}}
+        period = next_bucket(period, bucket)
+
+    query = db.query(
+        ExpenseRollup.day, ExpenseRollup.category,
+        ExpenseRollup.total_expenses, ExpenseRollup.total_amount
+    ).filter(
+        ExpenseRollup.user_id == user_id,
+        ExpenseRollup.day >= start,
+        ExpenseRollup.day <= end
+    )
+    if category:
+        query = query.filter(ExpenseRollup.category == category)
+    for day, row_category, count, amount in query.all():
+        entry = series[bucket_start(day, bucket)]
+        entry["count"] += count
+        entry["total"] += amount
+        entry["categories"][row_category] = entry["categories"].get(row_category, 0.0) + amount
+    return list(series.values())
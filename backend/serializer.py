@@ -0,0 +1,76 @@
+import json
+import os
+from datetime import date, datetime
+from json.encoder import encode_basestring
+from flask.json.provider import DefaultJSONProvider
+
+# Fast JSON encoding for API responses.
+#
+# orjson is used when it is installed (JSON_SERIALIZER=auto) and the stdlib
+# encoder otherwise. rows_to_json encodes selected column tuples straight to
+# a JSON array of objects, without loading ORM objects or calling to_dict.
+# Datetimes are written in ISO 8601, like Expense.to_dict.
+
+JSON_SERIALIZER = os.getenv('JSON_SERIALIZER', 'auto')
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def use_orjson():
+    return orjson is not None and JSON_SERIALIZER in ('auto', 'orjson')
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(obj):
+    """Encode obj as compact JSON bytes"""
+    if use_orjson():
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=_default, separators=(',', ':')).encode('utf-8')
+
+def _encode_value(value):
+    if value is None:
+        return 'null'
+    if isinstance(value, str):
+        return encode_basestring(value)
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, float):
+        return repr(value)
+    if isinstance(value, (datetime, date)):
+        return '"' + value.isoformat() + '"'
+    return json.dumps(value, default=_default)
+
+def rows_to_json(fields, rows):
+    """Encode row tuples as a JSON array of {field: value} objects
+
+    Each row's values must line up with fields.
+    """
+    if use_orjson():
+        return orjson.dumps([dict(zip(fields, row)) for row in rows], option=orjson.OPT_NON_STR_KEYS)
+    keys = [encode_basestring(field) + ':' for field in fields]
+    return ('[' + ','.join(
+        '{' + ','.join([key + _encode_value(value) for key, value in zip(keys, row)]) + '}'
+        for row in rows
+    ) + ']').encode('utf-8')
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that encodes jsonify() responses with dumps()"""
+
+    def dumps(self, obj, **kwargs):
+        if kwargs or not use_orjson():
+            return super().dumps(obj, **kwargs)
+        return dumps(obj).decode('utf-8')
+
+    def response(self, *args, **kwargs):
+        if self._app.debug or self.compact is False:
+            return super().response(*args, **kwargs)
+        return self._app.response_class(
+            dumps(self._prepare_response_obj(args, kwargs)), mimetype=self.mimetype
+        )
@@ -0,0 +1,194 @@
+import os
+from datetime import datetime
+from sqlalchemy import insert, literal, select
+from data_version import get_data_version
+from derived import expense_change
+from models import Expense, ExpenseTombstone
+
+# Delta sync for offline clients.
+#
+# Every expense write stamps the rows it changes with the user's new data
+# version (expenses.sync_version), and deletes leave a tombstone at theirs.
+# GET /api/sync?since=<version> reads only what changed after that version
+# through the (user_id, version) indexes, so a reconnect costs the size of
+# the change rather than the size of the history. The version bump takes the
+# user's row lock before anything is stamped, and readers take the version
+# before the changes, so a response holds every change up to its version
+# and any later change gets a higher one.
+#
+# Clients queue their offline mutations and replay them with POST /api/sync.
+# Creates carry an id generated by the client (a UUID), so replaying a batch
+# whose response was lost creates nothing twice, and a create replayed after
+# its expense was deleted does not bring it back. Updates overwrite the
+# fields they carry; the last write wins.
+
+SYNC_MAX_MUTATIONS = int(os.getenv('SYNC_MAX_MUTATIONS', '500'))
+SYNC_OPS = ('create', 'update', 'delete')
+# Columns of the expenses in a sync response
+SYNC_FIELDS = ('id', 'client_id', 'amount', 'category', 'note', 'date', 'created_at', 'updated_at')
+CLIENT_ID_MAX_LENGTH = 36
+
+def get_changes(db, user_id, since):
+    """Return the user's expense changes after version since
+
+    The result has the version to pass as since next time, the created or
+    updated expenses and the {id, client_id} of deleted ones. Clients apply
+    deletes first: SQLite may give a new expense the id of a deleted one.
+    With since 0, or a version this server never reached, every expense is
+    returned with reset set, and the client replaces its copy.
+    """
+    version = get_data_version(db, user_id)
+    reset = not since or since > version
+    columns = [getattr(Expense, field) for field in SYNC_FIELDS]
+    query = db.query(*columns).filter(Expense.user_id == user_id, Expense.sync_version <= version)
+    deleted = []
+    if not reset:
+        query = query.filter(Expense.sync_version > since)
+        deleted = [
+            {"id": expense_id, "client_id": client_id}
+            for expense_id, client_id in db.query(ExpenseTombstone.expense_id, ExpenseTombstone.client_id).filter(
+                ExpenseTombstone.user_id == user_id,
+                ExpenseTombstone.version > since,
+                ExpenseTombstone.version <= version
+            ).order_by(ExpenseTombstone.version, ExpenseTombstone.id)
+        ]
+    upserted = [dict(zip(SYNC_FIELDS, row)) for row in query.order_by(Expense.sync_version, Expense.id)]
+    return {"version": version, "reset": reset, "upserted": upserted, "deleted": deleted}
+
+def add_tombstone(db, expense, version):
+    """Record the delete of expense at version; the caller deletes it"""
+    db.add(ExpenseTombstone(
+        user_id=expense.user_id, expense_id=expense.id, client_id=expense.client_id, version=version
+    ))
+
+def remove_expense(db, expense, version):
+    """Delete a loaded expense and record its tombstone at version
+
+    Returns False, recording nothing, when a concurrent request deleted the
+    row first, so a delete is only reported once. The caller commits.
+    """
+    deleted = db.query(Expense).filter(Expense.id == expense.id).delete(synchronize_session=False)
+    if deleted != 1:
+        return False
+    add_tombstone(db, expense, version)
+    return True
+
+def add_tombstones(db, criteria, version):
+    """Record the delete of every expense matching criteria at version,
+    before a batch delete"""
+    db.execute(insert(ExpenseTombstone).from_select(
+        ['user_id', 'expense_id', 'client_id', 'version', 'deleted_at'],
+        select(
+            Expense.user_id, Expense.id, Expense.client_id, literal(version), literal(datetime.utcnow())
+        ).where(*criteria)
+    ))
+
+def _valid_client_id(value):
+    return isinstance(value, str) and 0 < len(value) <= CLIENT_ID_MAX_LENGTH
+
+def validate_mutation(mutation):
+    """Return an error message if mutation is not a valid offline mutation,
+    else None"""
+    if not isinstance(mutation, dict):
+        return "Mutation must be an object"
+    op = mutation.get('op')
+    if op not in SYNC_OPS:
+        return f"op must be one of: {', '.join(SYNC_OPS)}"
+    client_id = mutation.get('client_id')
+    expense_id = mutation.get('id')
+    if client_id is not None and not _valid_client_id(client_id):
+        return f"client_id must be text of at most {CLIENT_ID_MAX_LENGTH} characters"
+    if expense_id is not None and (not isinstance(expense_id, int) or isinstance(expense_id, bool)):
+        return "id must be an expense id"
+    if op == 'create' and client_id is None:
+        return "client_id is required"
+    if client_id is None and expense_id is None:
+        return "client_id or id is required"
+
+    data = mutation.get('expense')
+    if op == 'create':
+        if not isinstance(data, dict):
+            return "expense is required"
+        return Expense.validate(data)
+    if op == 'update':
+        if not isinstance(data, dict) or not data or set(data) - {'amount', 'category', 'note', 'date'}:
+            return "expense must contain amount, category, note and/or date"
+        # Unchanged fields get placeholders so only the new values are checked
+        return Expense.validate({'amount': 1, 'category': 'unchanged', **data})
+    return None
+
+def _find_expense(db, user_id, mutation):
+    query = db.query(Expense).filter(Expense.user_id == user_id)
+    if mutation.get('client_id') is not None:
+        return query.filter(Expense.client_id == mutation['client_id']).first()
+    return query.filter(Expense.id == mutation['id']).first()
+
+def _was_deleted(db, user_id, client_id):
+    return db.query(ExpenseTombstone.id).filter(
+        ExpenseTombstone.user_id == user_id, ExpenseTombstone.client_id == client_id
+    ).first() is not None
+
+def _apply(db, user_id, version, mutation, changes):
+    op = mutation['op']
+    expense = _find_expense(db, user_id, mutation)
+    if op == 'create':
+        if expense:
+            return "duplicate", expense.id
+        if _was_deleted(db, user_id, mutation['client_id']):
+            return "deleted", None
+        expense = Expense.from_dict(mutation['expense'], user_id)
+        expense.client_id = mutation['client_id']
+        expense.sync_version = version
+        db.add(expense)
+        db.flush()
+        changes.append(expense_change('added', expense))
+        return "created", expense.id
+
+    if not expense:
+        return "not_found", None
+    if op == 'delete':
+        if not remove_expense(db, expense, version):
+            return "not_found", None
+        db.expunge(expense)
+        changes.append(expense_change('deleted', expense))
+        return "deleted", expense.id
+
+    changes.append(expense_change('deleted', expense))
+    data = mutation['expense']
+    if 'amount' in data:
+        expense.amount = float(data['amount'])
+    if 'category' in data:
+        expense.category = data['category']
+    if 'note' in data:
+        expense.note = data['note']
+    if data.get('date'):
+        expense.date = datetime.fromisoformat(data['date'])
+    expense.sync_version = version
+    db.flush()
+    changes.append(expense_change('added', expense))
+    return "updated", expense.id
+
+def apply_mutations(db, user_id, version, mutations):
+    """Apply offline mutations in order at data version, returning
+    (results, changes)
+
+    results has a {client_id, id, status} entry per mutation, with an error
+    for invalid ones, which are skipped. changes are the expense_change
+    payloads for the derived job. The caller bumps the version first,
+    commits when there are changes and submits them.
+    """
+    results = []
+    changes = []
+    for mutation in mutations:
+        error = validate_mutation(mutation)
+        if error:
+            results.append({
+                "client_id": mutation.get('client_id') if isinstance(mutation, dict) else None,
+                "id": mutation.get('id') if isinstance(mutation, dict) else None,
+                "status": "invalid",
+                "error": error
+            })
+            continue
+        status, expense_id = _apply(db, user_id, version, mutation, changes)
+        results.append({"client_id": mutation.get('client_id'), "id": expense_id, "status": status})
+    return results, changes
@@ -0,0 +1,47 @@
+import itertools
+import os
+import sys
+
+# The backend modules import each other as top-level modules
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app import create_app, get_database
+from models import Base
+from users import user_id_cache
+
+@pytest.fixture
+def engine():
+    """In-memory SQLite database with the schema"""
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+@pytest.fixture
+def db(engine):
+    session = sessionmaker(bind=engine, autoflush=False)()
+    yield session
+    session.close()
+
+@pytest.fixture
+def make_app(tmp_path):
+    """Build apps with factory(database_url, config) on SQLite files in
+    tmp_path, schema created, jobs inline and rate limits off by default"""
+    count = itertools.count()
+
+    def make(factory=create_app, path=None, **config):
+        # The dev user gets a new id in every test database
+        user_id_cache.clear()
+        app = factory(f"sqlite:///{path or tmp_path / f'app{next(count)}.db'}", {
+            'RATELIMIT_ENABLED': False, 'JOB_QUEUE_BACKEND': 'inline', **config
+        })
+        with getattr(app, 'flask_app', app).app_context():
+            get_database().create_all()
+        return app
+    return make
+
+@pytest.fixture
+def client(make_app):
+    return make_app().test_client()
@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+from achievements import ACHIEVEMENTS, get_achievements
+from models import Expense, User
+from user_stats import reconcile_user_stats
+
+AUTH = {'Authorization': 'Bearer test'}
+
+def add(client, day, category='Food', amount=10):
+    response = client.post('/api/expenses', json={
+        'amount': amount, 'category': category, 'date': day.isoformat()
+    }, headers=AUTH)
+    assert response.status_code == 201
+    return response.get_json()['id']
+
+def by_id(body):
+    return {achievement['id']: achievement for achievement in body['achievements']}
+
+def test_streak_achievement_unlocks_and_is_kept(client):
+    today = datetime.utcnow().date()
+    ids = [add(client, today - timedelta(days=offset)) for offset in range(7)]
+
+    body = client.get('/api/achievements', headers=AUTH).get_json()
+    achievements = by_id(body)
+    assert achievements['week_streak']['unlocked'] and achievements['week_streak']['unlocked_at']
+    assert achievements['month_streak']['current'] == 7 and achievements['month_streak']['progress'] == 23
+    assert body['streak_days'] == 7 and body['best_streak'] == 7
+    assert body['points'] == 10 + 25 and body['unlocked'] == 2
+
+    # Breaking the streak ends the current one, but not what was unlocked
+    client.delete(f'/api/expenses/{ids[3]}', headers=AUTH)
+    body = client.get('/api/achievements', headers=AUTH).get_json()
+    assert by_id(body)['week_streak']['unlocked'] and body['best_streak'] == 7
+    assert body['streak_days'] == 3
+
+def test_import_and_batch_update_unlock_category_achievements(client):
+    rows = '\n'.join(f'{{"amount": 200, "category": "C{i % 5}"}}' for i in range(10))
+    response = client.post('/api/expenses/import?format=jsonl', data=rows, headers=AUTH)
+    assert response.status_code == 201
+    achievements = by_id(client.get('/api/achievements', headers=AUTH).get_json())
+    assert all(achievements[name]['unlocked_at'] for name in ('ten_expenses', 'category_explorer', 'tracked_1000'))
+    assert achievements['category_specialist']['current'] == 2
+
+    for _ in range(46):
+        add(client, datetime.utcnow().date(), 'C0')
+    response = client.post('/api/expenses/batch', json={
+        'action': 'update', 'filter': {'category': 'C1'}, 'set': {'category': 'C0'}
+    }, headers=AUTH)
+    assert response.status_code == 200
+    achievements = by_id(client.get('/api/achievements', headers=AUTH).get_json())
+    assert achievements['category_specialist']['unlocked_at'] and achievements['category_specialist']['current'] == 50
+
+def test_users_without_recorded_achievements_see_reached_thresholds(db):
+    user = User(firebase_uid='new', email='new@example.com')
+    db.add(user)
+    db.commit()
+    body = get_achievements(db, user.id)
+    assert body['unlocked'] == 0 and len(body['achievements']) == len(ACHIEVEMENTS)
+
+    db.add(Expense(user_id=user.id, amount=5.0, category='Food', date=datetime(2024, 1, 1)))
+    db.flush()
+    reconcile_user_stats(db, user.id)
+    db.commit()
+    first = by_id(get_achievements(db, user.id))['first_expense']
+    assert first['unlocked'] and first['unlocked_at'] is None
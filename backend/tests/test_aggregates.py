@@ -0,0 +1,68 @@
+import random
+from datetime import datetime, timedelta
+import pytest
+from models import User, Expense
+from aggregates import get_stats_summary
+
+NOW = datetime(2024, 6, 15, 12, 0, 0)
+
+def python_stats(expenses, now):
+    """The list-comprehension computation get_user_stats used before"""
+    if not expenses:
+        return {
+            "total_expenses": 0,
+            "total_amount": 0,
+            "categories": {},
+            "recent_expenses": [],
+            "daily_average": 0
+        }
+    categories = {}
+    for exp in expenses:
+        categories[exp.category] = categories.get(exp.category, 0) + exp.amount
+    thirty_days_ago = now - timedelta(days=30)
+    recent_30 = [exp for exp in expenses if exp.date >= thirty_days_ago]
+    newest = sorted(expenses, key=lambda exp: (exp.date, exp.id), reverse=True)
+    return {
+        "total_expenses": len(expenses),
+        "total_amount": sum(exp.amount for exp in expenses),
+        "categories": categories,
+        "recent_expenses": [exp.to_dict() for exp in newest[:10]],
+        "daily_average": sum(exp.amount for exp in recent_30) / 30 if recent_30 else 0
+    }
+
+def seed_user(db, rng, index, count):
+    user = User(firebase_uid=f'user-{index}', email=f'user{index}@example.com')
+    db.add(user)
+    db.flush()
+    for _ in range(count):
+        db.add(Expense(
+            user_id=user.id,
+            amount=round(rng.uniform(0.5, 500), 2),
+            category=rng.choice(['Food', 'Transport', 'Fun', 'Bills', 'Other']),
+            note='',
+            date=NOW - timedelta(minutes=rng.randint(0, 60 * 24 * 120))
+        ))
+    db.flush()
+    return user
+
+@pytest.mark.parametrize('seed', range(10))
+def test_sql_stats_match_python_path(db, seed):
+    rng = random.Random(seed)
+    users = [seed_user(db, rng, i, rng.randint(0, 300)) for i in range(3)]
+
+    for user in users:
+        expenses = db.query(Expense).filter(Expense.user_id == user.id).all()
+        expected = python_stats(expenses, NOW)
+        actual = get_stats_summary(db, user.id, now=NOW)
+
+        assert actual["total_expenses"] == expected["total_expenses"]
+        assert actual["total_amount"] == pytest.approx(expected["total_amount"])
+        assert actual["categories"].keys() == expected["categories"].keys()
+        for category, total in expected["categories"].items():
+            assert actual["categories"][category] == pytest.approx(total)
+        assert actual["daily_average"] == pytest.approx(expected["daily_average"])
+        assert actual["recent_expenses"] == expected["recent_expenses"]
+
+def test_empty_user(db):
+    user = seed_user(db, random.Random(0), 0, 0)
+    assert get_stats_summary(db, user.id, now=NOW) == python_stats([], NOW)
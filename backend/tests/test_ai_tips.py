@@ -0,0 +1,102 @@
+import asyncio
+import time
+import pytest
+from ai_tips import TipGenerator, FALLBACK_TIPS, spending_fingerprint
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+class FakeModel:
+    """Local stand-in for the Gemini model with a configurable delay"""
+
+    def __init__(self, delay=0.0, text="Tip: Cook at home twice a week 💡\nCategory: saving"):
+        self.delay = delay
+        self.text = text
+        self.calls = 0
+
+    def generate_content(self, prompt, request_options=None):
+        self.calls += 1
+        time.sleep(self.delay)
+        return FakeResponse(self.text)
+
+@pytest.fixture
+def generator_factory():
+    generators = []
+
+    def factory(model, **kwargs):
+        generator = TipGenerator(model, **kwargs)
+        generators.append(generator)
+        return generator
+
+    yield factory
+    for generator in generators:
+        generator.shutdown(wait=True)
+
+def test_returns_parsed_model_tip(generator_factory):
+    generator = generator_factory(FakeModel(), timeout=1)
+    tip = generator.get_tip(120.0, {'Food': 100.0, 'Fun': 20.0}, 7, [])
+    assert tip == {"tip": "Cook at home twice a week 💡", "category": "saving"}
+
+def test_similar_spending_reuses_cached_tip(generator_factory):
+    model = FakeModel()
+    generator = generator_factory(model, timeout=1)
+    first = generator.get_tip(120.0, {'Food': 100.0}, 7, [])
+    second = generator.get_tip(140.0, {'food': 130.0}, 8, [])
+    assert first == second
+    assert model.calls == 1
+
+def test_different_fingerprint_calls_model_again(generator_factory):
+    model = FakeModel()
+    generator = generator_factory(model, timeout=1)
+    generator.get_tip(120.0, {'Food': 100.0}, 7, [])
+    generator.get_tip(120.0, {'Rent': 100.0}, 7, [])
+    assert model.calls == 2
+
+def test_deadline_falls_back_and_late_result_fills_cache(generator_factory):
+    model = FakeModel(delay=0.3)
+    generator = generator_factory(model, timeout=0.05)
+    tip = generator.get_tip(120.0, {'Food': 100.0}, 7, [])
+    assert tip["tip"] in FALLBACK_TIPS
+
+    time.sleep(0.5)
+    tip = generator.get_tip(120.0, {'Food': 100.0}, 7, [])
+    assert tip["category"] == "saving"
+    assert model.calls == 1
+
+def test_async_deadline_does_not_cancel_the_call(generator_factory):
+    model = FakeModel(delay=0.3)
+    generator = generator_factory(model, timeout=0.05)
+
+    async def get_tips():
+        first = await generator.get_tip_async(120.0, {'Food': 100.0}, 7, [])
+        await asyncio.sleep(0.5)
+        return first, await generator.get_tip_async(120.0, {'Food': 100.0}, 7, [])
+
+    first, second = asyncio.run(get_tips())
+    assert first["tip"] in FALLBACK_TIPS
+    assert second["category"] == "saving"
+    assert model.calls == 1
+
+def test_model_error_falls_back(generator_factory):
+    class FailingModel:
+        def generate_content(self, prompt, request_options=None):
+            raise RuntimeError("upstream unavailable")
+
+    generator = generator_factory(FailingModel(), timeout=1)
+    assert generator.get_tip(10.0, {'Food': 10.0}, 1, [])["tip"] in FALLBACK_TIPS
+
+def test_cancelled_calls_release_their_slot(generator_factory):
+    model = FakeModel(delay=0.2)
+    generator = generator_factory(model, timeout=0.01, workers=1)
+    # One running call plus one queued call fill both slots
+    generator.get_tip(10.0, {'a': 10.0}, 1, [])
+    generator.get_tip(10.0, {'b': 10.0}, 1, [])
+    generator.shutdown(wait=True)
+    # The queued call was cancelled; both slots are free again
+    assert generator._slots.acquire(blocking=False)
+    assert generator._slots.acquire(blocking=False)
+
+def test_fingerprint_buckets():
+    assert spending_fingerprint(120.0, ' Food ', 7) == spending_fingerprint(180.0, 'food', 9)
+    assert spending_fingerprint(120.0, 'food', 7) != spending_fingerprint(300.0, 'food', 7)
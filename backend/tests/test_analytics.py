@@ -0,0 +1,94 @@
+import random
+import statistics
+from datetime import date, datetime, timedelta
+import numpy as np
+import pytest
+from models import User, Expense
+from analytics import (
+    SpendingMatrix, category_anomalies, compute_insights, forecast_month,
+    month_over_month, monthly_totals, moving_average
+)
+from rollups import rebuild_user_rollups
+
+TODAY = date(2024, 6, 15)
+
+def test_moving_average_matches_python():
+    values = np.array([random.Random(1).uniform(0, 50) for _ in range(40)])
+    for window in (1, 7, 30, 60):
+        expected = [statistics.fmean(values[max(0, i + 1 - window):i + 1]) for i in range(len(values))]
+        assert moving_average(values, window) == pytest.approx(expected)
+
+def test_monthly_totals_and_month_over_month():
+    start = date(2024, 1, 1)
+    amounts = np.zeros((date(2024, 4, 30) - start).days + 1)[:, None]
+    amounts[0, 0] = 100.0                                   # January
+    amounts[(date(2024, 2, 10) - start).days, 0] = 150.0    # February
+    amounts[(date(2024, 4, 5) - start).days, 0] = 30.0      # April
+    months, totals = monthly_totals(SpendingMatrix(start, amounts, ['Food']))
+
+    assert [str(month) for month in months] == ['2024-01', '2024-02', '2024-03', '2024-04']
+    assert totals.tolist() == [100.0, 150.0, 0.0, 30.0]
+    change, ratio = month_over_month(totals)
+    assert np.isnan(change[0]) and change[1:].tolist() == [50.0, -150.0, 30.0]
+    assert ratio[1] == pytest.approx(0.5) and ratio[2] == pytest.approx(-1.0)
+    assert np.isnan(ratio[3])
+
+def test_category_anomalies_flag_outliers_per_category():
+    rng = random.Random(17)
+    amounts = np.zeros((60, 2))
+    for day in range(0, 60, 2):
+        amounts[day, 0] = rng.uniform(9, 11)
+        amounts[day, 1] = rng.uniform(90, 110)
+    amounts[30, 0] = 40.0
+    # Bills at 110 are normal for Bills even though they dwarf Food
+    day_index, category_index, scores = category_anomalies(SpendingMatrix(date(2024, 1, 1), amounts, ['Food', 'Bills']))
+    assert day_index.tolist() == [30] and category_index.tolist() == [0]
+    assert scores[0] > 2.5
+
+def test_forecast_follows_trend():
+    start = date(2024, 5, 17)
+    days = (TODAY - start).days + 1
+    # Spending grows by 1 per day
+    amounts = np.arange(days, dtype=float)[:, None]
+    spent, projected, trend = forecast_month(SpendingMatrix(start, amounts, ['Food']), TODAY)
+
+    assert spent == sum(range(days - 15, days))
+    assert trend == pytest.approx(1.0)
+    assert projected == pytest.approx(spent + sum(range(days, days + 15)))
+
+def test_compute_insights_from_rollup(db):
+    user = User(firebase_uid='insights', email='insights@example.com')
+    db.add(user)
+    db.flush()
+    rng = random.Random(5)
+    for _ in range(500):
+        db.add(Expense(
+            user_id=user.id,
+            amount=round(rng.uniform(1, 80), 2),
+            category=rng.choice(['Food', 'Transport', 'Fun']),
+            date=datetime.combine(TODAY, datetime.min.time()) - timedelta(hours=rng.randrange(24 * 200))
+        ))
+    # Outside the window; ignored
+    db.add(Expense(user_id=user.id, amount=999.0, category='Food', date=datetime(2020, 1, 1)))
+    db.flush()
+    rebuild_user_rollups(db, user.id)
+    db.commit()
+
+    insights = compute_insights(db, user.id, today=TODAY)
+
+    expenses = db.query(Expense).filter(Expense.user_id == user.id, Expense.date >= datetime(2023, 6, 1)).all()
+    assert insights["start"] == '2023-06-01'
+    assert len(insights["daily"]) == 90 and insights["daily"][-1]["day"] == '2024-06-15'
+    assert sum(m["total"] for m in insights["monthly"]) == pytest.approx(sum(e.amount for e in expenses))
+    assert [m["month"] for m in insights["monthly"]][-1] == '2024-06'
+    shares = {c["category"]: c["share"] for c in insights["categories"]}
+    assert sum(shares.values()) == pytest.approx(1.0)
+    june = sum(e.amount for e in expenses if e.date >= datetime(2024, 6, 1))
+    assert insights["forecast"]["spent_to_date"] == pytest.approx(june)
+    assert insights["forecast"]["projected_total"] >= insights["forecast"]["spent_to_date"]
+
+def test_compute_insights_for_user_without_expenses(db):
+    insights = compute_insights(db, 'nobody', today=TODAY)
+    assert insights["categories"] == [] and insights["anomalies"] == []
+    assert all(day["total"] == 0 for day in insights["daily"])
+    assert insights["forecast"]["projected_total"] == 0
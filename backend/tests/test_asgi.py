@@ -0,0 +1,148 @@
+import asyncio
+import json
+import time
+from datetime import datetime
+import pytest
+import clients
+from ai_tips import TipGenerator
+from app import get_database
+from asgi import create_asgi_app
+from models import Expense, User
+from rollups import rebuild_user_rollups
+from user_stats import reconcile_user_stats
+
+class SlowModel:
+    def __init__(self, delay):
+        self.delay = delay
+
+    def generate_content(self, prompt, request_options=None):
+        time.sleep(self.delay)
+        return type('Response', (), {'text': 'Tip: Pack lunch on weekdays 💡\nCategory: saving'})()
+
+@pytest.fixture
+def make_asgi_app(make_app, monkeypatch):
+    monkeypatch.setattr(clients, 'tip_generator', clients.LazyClient(lambda: TipGenerator(SlowModel(0.3), timeout=5)))
+    apps = []
+
+    def make(rate_limits=False):
+        app = make_app(create_asgi_app, RATELIMIT_ENABLED=rate_limits)
+        apps.append(app)
+        with app.flask_app.app_context():
+            db = get_database().SessionLocal()
+            user = User(firebase_uid='dev-user', email='dev@example.com')
+            db.add(user)
+            db.flush()
+            db.add(Expense(user_id=user.id, amount=20.0, category='Food', date=datetime(2024, 5, 1)))
+            db.flush()
+            reconcile_user_stats(db, user.id)
+            rebuild_user_rollups(db, user.id)
+            db.commit()
+            db.close()
+        return app
+
+    yield make
+    for app in apps:
+        asyncio.run(app.dispose())
+
+@pytest.fixture
+def asgi_app(make_asgi_app):
+    return make_asgi_app()
+
+async def request(app, method, path, headers=None, body=b''):
+    """Send one request through the ASGI app, returning (status, headers, body)"""
+    headers = {'Authorization': 'Bearer test', 'Content-Length': str(len(body)), **(headers or {})}
+    scope = {
+        'type': 'http', 'method': method, 'path': path, 'raw_path': path.encode(), 'query_string': b'',
+        'root_path': '', 'scheme': 'http', 'http_version': '1.1', 'server': ('testserver', 80),
+        'client': ('10.0.0.1', 1234),
+        'headers': [(name.lower().encode(), value.encode()) for name, value in headers.items()]
+    }
+    messages = []
+    received = False
+
+    async def receive():
+        nonlocal received
+        if received:
+            await asyncio.sleep(3600)
+        received = True
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, receive, send)
+    start = messages[0]
+    response_headers = {name.decode(): value.decode() for name, value in start['headers']}
+    return start['status'], response_headers, b''.join(m.get('body', b'') for m in messages[1:])
+
+def test_stats_matches_flask_route(asgi_app):
+    status, headers, body = asyncio.run(request(asgi_app, 'GET', '/api/stats'))
+    assert status == 200 and json.loads(body)["total_expenses"] == 1
+
+    flask_response = asgi_app.flask_app.test_client().get('/api/stats', headers={'Authorization': 'Bearer test'})
+    # Same ETag and cached body as the synchronous route
+    assert flask_response.headers['ETag'] == headers['etag']
+    assert flask_response.get_data() == body
+
+    status, _, body = asyncio.run(request(asgi_app, 'GET', '/api/stats', {'If-None-Match': headers['etag']}))
+    assert status == 304 and body == b''
+
+def test_other_routes_are_served_by_flask(asgi_app):
+    payload = json.dumps({'amount': 5.0, 'category': 'Fun'}).encode()
+    status, _, body = asyncio.run(request(
+        asgi_app, 'POST', '/api/expenses', {'Content-Type': 'application/json'}, payload
+    ))
+    assert status == 201 and json.loads(body)['category'] == 'Fun'
+
+    status, _, body = asyncio.run(request(asgi_app, 'GET', '/api/stats'))
+    assert json.loads(body)["total_expenses"] == 2
+
+def test_stats_requests_are_not_held_up_by_a_slow_tip(asgi_app):
+    async def run():
+        tip = asyncio.create_task(request(asgi_app, 'POST', '/api/tips'))
+        await asyncio.sleep(0.05)
+        started = time.perf_counter()
+        statuses = [status for status, _, _ in await asyncio.gather(
+            *[request(asgi_app, 'GET', '/api/stats') for _ in range(5)]
+        )]
+        stats_seconds = time.perf_counter() - started
+        assert not tip.done()
+        return statuses, stats_seconds, await tip
+
+    statuses, stats_seconds, (status, _, body) = asyncio.run(run())
+    assert statuses == [200] * 5 and stats_seconds < 0.25
+    assert status == 200 and json.loads(body) == {"tip": "Pack lunch on weekdays 💡", "category": "saving"}
+
+def test_tips_rate_limit_and_auth(make_asgi_app):
+    asgi_app = make_asgi_app(rate_limits=True)
+    statuses = [asyncio.run(request(asgi_app, 'POST', '/api/tips'))[0] for _ in range(6)]
+    assert statuses == [200] * 5 + [429]
+
+    status, _, body = asyncio.run(request(asgi_app, 'POST', '/api/tips', {'Authorization': ''}))
+    assert status == 401 and json.loads(body) == {"error": "Authorization header required"}
+
+def test_cors_headers_for_allowed_origins(asgi_app):
+    _, headers, _ = asyncio.run(request(asgi_app, 'GET', '/api/stats', {'Origin': 'http://localhost:5173'}))
+    assert headers['access-control-allow-origin'] == 'http://localhost:5173'
+    _, headers, _ = asyncio.run(request(asgi_app, 'GET', '/api/stats', {'Origin': 'https://evil.example'}))
+    assert 'access-control-allow-origin' not in headers
+
+def test_async_handlers_add_the_flask_security_headers(asgi_app):
+    _, flask_headers, _ = asyncio.run(request(asgi_app, 'GET', '/api/expenses'))
+    _, headers, _ = asyncio.run(request(asgi_app, 'GET', '/api/stats'))
+    for name in ('x-content-type-options', 'x-frame-options', 'x-xss-protection', 'strict-transport-security'):
+        assert headers[name] == flask_headers[name]
+
+def test_flask_routes_run_concurrently(asgi_app):
+    def slow():
+        time.sleep(0.3)
+        return 'done'
+    asgi_app.flask_app.add_url_rule('/slow', 'slow', slow)
+
+    async def run():
+        return await asyncio.gather(*[request(asgi_app, 'GET', '/slow') for _ in range(4)])
+
+    start = time.perf_counter()
+    responses = asyncio.run(run())
+    assert [status for status, _, _ in responses] == [200] * 4
+    assert time.perf_counter() - start < 0.9
@@ -0,0 +1,103 @@
+import random
+from datetime import datetime, timedelta
+import pytest
+from models import User, Expense, ExpenseRollup, UserStats, CategoryStats
+from batch import batch_criteria, run_batch
+from derived import apply_expense_changes, expense_change
+from rollups import rebuild_user_rollups
+from user_stats import reconcile_user_stats
+
+START = datetime(2024, 1, 1, 9)
+
+@pytest.fixture
+def user_id(db):
+    user = User(firebase_uid='batch', email='batch@example.com')
+    db.add(user)
+    db.commit()
+    rng = random.Random(19)
+    changes = []
+    for _ in range(120):
+        date = START + timedelta(days=rng.randrange(30), hours=rng.randrange(10))
+        expense = Expense(
+            user_id=user.id, amount=round(rng.uniform(1, 100), 2),
+            category=rng.choice(['Food', 'Bills', 'Fun']), date=date
+        )
+        db.add(expense)
+        changes.append(expense_change('added', expense))
+    db.flush()
+    apply_expense_changes(db, user.id, changes)
+    db.commit()
+    return user.id
+
+def derived_state(db, user_id):
+    db.expire_all()
+    stats = db.query(UserStats).filter(UserStats.user_id == user_id).one()
+    categories = {
+        row.category: (row.total_expenses, round(row.total_amount, 6))
+        for row in db.query(CategoryStats).filter(CategoryStats.user_id == user_id)
+        if row.total_expenses
+    }
+    rollup = {
+        (row.day, row.category): (row.total_expenses, round(row.total_amount, 6))
+        for row in db.query(ExpenseRollup).filter(ExpenseRollup.user_id == user_id)
+    }
+    return (stats.total_expenses, round(stats.total_amount, 6), stats.last_expense_date,
+            stats.streak_days, categories, rollup)
+
+def assert_derived_state_consistent(db, user_id):
+    incremental = derived_state(db, user_id)
+    reconcile_user_stats(db, user_id)
+    rebuild_user_rollups(db, user_id)
+    db.commit()
+    assert incremental == derived_state(db, user_id)
+
+def count_expenses(db, *criteria):
+    return db.query(Expense).filter(*criteria).count()
+
+def test_delete_by_filter(db, user_id):
+    criteria = batch_criteria(user_id, start=START + timedelta(days=10), end=START + timedelta(days=20), category='Food')
+    expected = count_expenses(db, *criteria)
+
+    assert run_batch(db, user_id, 'delete', criteria) == expected > 0
+    db.commit()
+    assert count_expenses(db, *criteria) == 0
+    assert_derived_state_consistent(db, user_id)
+
+def test_delete_newest_days_moves_streak(db, user_id):
+    criteria = batch_criteria(user_id, start=START + timedelta(days=25))
+    run_batch(db, user_id, 'delete', criteria)
+    db.commit()
+    assert derived_state(db, user_id)[2] < (START + timedelta(days=25)).date()
+    assert_derived_state_consistent(db, user_id)
+
+def test_end_date_includes_the_whole_day(db, user_id):
+    day = (START + timedelta(days=5)).date()
+    criteria = batch_criteria(user_id, start=day, end=day)
+    same_day = [date for (date,) in db.query(Expense.date).filter(*criteria)]
+    assert same_day and all(date.date() == day for date in same_day)
+    assert len(same_day) == sum(1 for (date,) in db.query(Expense.date) if date.date() == day)
+
+def test_update_by_ids(db, user_id):
+    ids = [expense_id for (expense_id,) in db.query(Expense.id).filter(Expense.category == 'Fun').limit(15)]
+    ids += [10**9]  # Unknown ids are ignored
+
+    affected = run_batch(db, user_id, 'update', batch_criteria(user_id, ids), {'category': 'Leisure', 'amount': 5.0})
+    db.commit()
+    assert affected == 15
+    assert count_expenses(db, Expense.category == 'Leisure', Expense.amount == 5.0) == 15
+    assert_derived_state_consistent(db, user_id)
+
+def test_update_amount_only(db, user_id):
+    criteria = batch_criteria(user_id, category='Bills')
+    run_batch(db, user_id, 'update', criteria, {'amount': 12.5})
+    db.commit()
+    assert_derived_state_consistent(db, user_id)
+
+def test_batch_is_scoped_to_the_user(db, user_id):
+    other = User(firebase_uid='other', email='other@example.com')
+    db.add(other)
+    db.commit()
+    ids = [expense_id for (expense_id,) in db.query(Expense.id).limit(5)]
+
+    assert run_batch(db, other.id, 'delete', batch_criteria(other.id, ids)) == 0
+    assert count_expenses(db, Expense.id.in_(ids)) == 5
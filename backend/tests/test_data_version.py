@@ -0,0 +1,25 @@
+from models import User
+from data_version import ResponseCache, bump_data_version, get_data_version, make_etag
+
+def test_bump_moves_to_new_version_and_etag(db):
+    user = User(firebase_uid='version', email='version@example.com')
+    db.add(user)
+    db.commit()
+
+    before = get_data_version(db, user.id)
+    bump_data_version(db, user.id)
+    db.commit()
+    after = get_data_version(db, user.id)
+
+    assert after == before + 1
+    assert make_etag(user.id, before, '/api/stats?') != make_etag(user.id, after, '/api/stats?')
+    assert make_etag(user.id, after, '/api/stats?') == make_etag(user.id, after, '/api/stats?')
+
+def test_response_cache_is_keyed_by_version_and_skips_large_bodies():
+    cache = ResponseCache(max_entries=10, max_body=10)
+    cache.set('u', 1, '/api/expenses?', b'[]', {'X-Next-Cursor': 'abc'})
+    cache.set('u', 1, '/api/stats?', b'x' * 11)
+
+    assert cache.get('u', 1, '/api/expenses?') == (b'[]', {'X-Next-Cursor': 'abc'})
+    assert cache.get('u', 2, '/api/expenses?') is None
+    assert cache.get('u', 1, '/api/stats?') is None
@@ -0,0 +1,89 @@
+import io
+from datetime import datetime
+import pytest
+from sqlalchemy.orm import sessionmaker
+from exporter import EXPORT_COLUMNS, stream_export
+from models import User, Expense, UserStats
+from importer import import_expenses, iter_csv_rows, iter_jsonl_rows
+
+@pytest.fixture
+def user_id(db):
+    user = User(firebase_uid='importer', email='importer@example.com')
+    db.add(user)
+    db.commit()
+    return user.id
+
+def jsonl(*lines):
+    return io.BytesIO('\n'.join(lines).encode('utf-8'))
+
+def test_bad_jsonl_rows_are_reported_per_row(db, user_id):
+    body = jsonl(
+        '{"amount": 5, "category": "X", "note": {"a": 1}}',
+        '{"amount": 5, "category": ["a"]}',
+        '{"amount": true, "category": "a"}',
+        '{"amount": "nan", "category": "a"}',
+        '{"amount": 1e999, "category": "a"}',
+        'not json',
+        '',
+        '{"amount": "2.5", "category": "Food", "date": "2024-01-02"}',
+    )
+    result = import_expenses(db, user_id, iter_jsonl_rows(body))
+    db.commit()
+
+    assert result["imported"] == 1
+    assert result["failed"] == 6
+    assert [error["row"] for error in result["errors"]] == [1, 2, 3, 4, 5, 6]
+    assert db.query(Expense).count() == 1
+    assert db.query(UserStats).one().total_amount == pytest.approx(2.5)
+
+def test_csv_parse_errors_do_not_abort_import(db, user_id):
+    huge = 'x' * 200000
+    body = io.BytesIO(f'amount,category,note\n1,Food,\n2,Fun,"{huge}"\n3,Food,ok\n'.encode('utf-8'))
+    result = import_expenses(db, user_id, iter_csv_rows(body))
+    db.commit()
+
+    assert result["imported"] == 2
+    assert result["failed"] == 1
+    assert result["errors"][0]["row"] == 2
+    assert db.query(UserStats).one().total_expenses == 2
+
+def test_row_limit(db, user_id):
+    body = jsonl(*['{"amount": 1, "category": "a"}'] * 5)
+    result = import_expenses(db, user_id, iter_jsonl_rows(body), batch_size=2, max_rows=3)
+    assert result["imported"] == 3
+    assert result["failed"] == 1
+
+@pytest.mark.parametrize('export_format, rows', [('csv', iter_csv_rows), ('ndjson', iter_jsonl_rows)])
+def test_export_round_trips_through_import(engine, db, user_id, export_format, rows):
+    for day in range(1, 6):
+        db.add(Expense(user_id=user_id, amount=day * 1.5, category='Café ☕', note=f'n{day}',
+                       date=datetime(2024, 3, day, 12)))
+    db.commit()
+
+    body = b''.join(
+        chunk if isinstance(chunk, bytes) else chunk.encode('utf-8')
+        for chunk in stream_export(sessionmaker(bind=engine), user_id, export_format)
+    )
+    if export_format == 'csv':
+        assert body.decode('utf-8').splitlines()[0] == ','.join(EXPORT_COLUMNS)
+
+    other = User(firebase_uid='other', email='other@example.com')
+    db.add(other)
+    db.commit()
+    result = import_expenses(db, other.id, rows(io.BytesIO(body)))
+    db.commit()
+    assert result["imported"] == 5 and result["failed"] == 0
+    def expenses(owner):
+        return sorted(db.query(Expense.amount, Expense.category, Expense.note, Expense.date).filter(
+            Expense.user_id == owner
+        ).all())
+    assert expenses(other.id) == expenses(user_id)
+
+def test_export_endpoint_streams_an_attachment(client):
+    auth = {'Authorization': 'Bearer test'}
+    client.post('/api/expenses', json={'amount': 4, 'category': 'Food'}, headers=auth)
+    response = client.get('/api/expenses/export?format=ndjson', headers=auth)
+    assert response.status_code == 200 and response.is_streamed
+    assert response.headers['Content-Disposition'] == 'attachment; filename="finmate-expenses.ndjson"'
+    assert response.get_data().count(b'\n') == 1
+    assert client.get('/api/expenses/export?format=xml', headers=auth).status_code == 400
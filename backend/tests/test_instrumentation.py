@@ -0,0 +1,109 @@
+import threading
+import time
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+import database
+from app import get_database
+from database import create_db_engine, pool_status
+from instrumentation import (
+    Histogram, current_profile, end_profile, instrument_engine, render_metrics, span,
+    sql_seconds, start_profile
+)
+from profiler import SamplingProfiler
+
+def test_spans_and_sql_are_recorded_in_the_current_profile():
+    engine = create_engine('sqlite://')
+    instrument_engine(engine)
+
+    profile = start_profile()
+    try:
+        with span('db'):
+            with engine.connect() as conn:
+                conn.execute(text('SELECT 1'))
+                conn.execute(text('SELECT 2'))
+    finally:
+        end_profile()
+
+    assert profile.sql_count == 2
+    assert 0 < profile.sql_seconds <= profile.spans['db']
+    header = profile.server_timing()
+    assert header.startswith('db;dur=')
+    assert 'desc="2 queries"' in header
+
+def test_statements_outside_a_request_only_feed_the_histogram():
+    engine = create_engine('sqlite://')
+    instrument_engine(engine)
+    before = sql_seconds.render()[-1]
+    with engine.connect() as conn:
+        conn.execute(text('SELECT 1'))
+
+    assert current_profile() is None
+    assert sql_seconds.render()[-1] != before
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram('test_seconds', 'Test histogram', ('route',), buckets=(0.1, 1.0))
+    histogram.observe(0.05, '/a')
+    histogram.observe(0.5, '/a')
+    histogram.observe(5.0, '/a')
+
+    lines = histogram.render()
+    assert 'test_seconds_bucket{route="/a",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{route="/a",le="1.0"} 2' in lines
+    assert 'test_seconds_bucket{route="/a",le="+Inf"} 3' in lines
+    assert 'test_seconds_count{route="/a"} 3' in lines
+    assert '# TYPE finmate_up gauge' in render_metrics({'finmate_up': ('gauge', 'Up', 1)})
+
+def busy_wait(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+def test_profiler_dumps_folded_stacks_of_slow_requests(tmp_path):
+    profiler = SamplingProfiler(threshold_ms=50, interval_ms=1, output_dir=str(tmp_path))
+    paths = []
+
+    def request(seconds):
+        profiler.start()
+        busy_wait(seconds)
+        paths.append(profiler.stop(seconds, 'api.get_user_stats'))
+
+    for seconds in (0.01, 0.2):
+        thread = threading.Thread(target=request, args=(seconds,))
+        thread.start()
+        thread.join()
+
+    fast, slow = paths
+    assert fast is None
+    with open(slow) as f:
+        lines = f.read().splitlines()
+    assert lines and all(line.rsplit(' ', 1)[1].isdigit() for line in lines)
+    assert any('busy_wait' in line for line in lines)
+
+def test_pool_is_sized_from_settings_and_counts_checkout_waits(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, 'DB_POOL_SIZE', 1)
+    monkeypatch.setattr(database, 'DB_MAX_OVERFLOW', 0)
+    monkeypatch.setattr(database, 'DB_POOL_TIMEOUT', 0.05)
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'pool.db'}")
+
+    with engine.connect():
+        status = pool_status(engine)
+        assert status['pool'] == 'InstrumentedQueuePool'
+        assert status['size'] == 1 and status['checked_out'] == 1
+        with pytest.raises(PoolTimeoutError):
+            engine.connect()
+
+    status = pool_status(engine)
+    assert status['checkouts'] == 1 and status['timeouts'] == 1 and status['checked_out'] == 0
+    assert status['wait_seconds_max'] >= 0.05
+    engine.dispose()
+
+def test_request_sessions_are_returned_to_the_pool(client):
+    auth = {'Authorization': 'Bearer test'}
+    assert client.post('/api/expenses', json={'amount': 3, 'category': 'Food'}, headers=auth).status_code == 201
+    assert client.get('/api/expenses', headers=auth).status_code == 200
+    assert client.post('/api/expenses', json={'amount': 'x'}, headers=auth).status_code == 400
+
+    with client.application.app_context():
+        status = pool_status(get_database().engine)
+    assert status['checkouts'] > 0 and status['checked_out'] == 0
@@ -0,0 +1,143 @@
+import random
+import threading
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from models import Base, User, Expense, ExpenseRollup, UserStats
+from jobs import JobQueue, KeyValueJobBackend, MemoryJobBackend
+from kvstore import LocalKeyValueStore
+from derived import DERIVED_JOB, expense_change, make_derived_handler
+from rollups import rebuild_user_rollups
+from user_stats import ensure_stats_tracked, reconcile_user_stats
+
+@pytest.fixture(params=['memory', 'shared'])
+def queue(request):
+    if request.param == 'memory':
+        backend = MemoryJobBackend()
+    else:
+        backend = KeyValueJobBackend(LocalKeyValueStore())
+    queue = JobQueue(backend, workers=1)
+    yield queue
+    queue.shutdown(timeout=5)
+
+def test_jobs_for_a_queued_key_are_coalesced(queue):
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def handler(payloads):
+        calls.append(payloads)
+        started.set()
+        release.wait(5)
+
+    queue.register('work', handler)
+    queue.submit('work', 'user-a', 0)
+    # The only worker is now busy, so the rest wait in the queue
+    assert started.wait(5)
+    assert queue.submit('work', 'user-a', 1)
+    assert not queue.submit('work', 'user-a', 2)
+    assert queue.submit('work', 'user-b', 3)
+    release.set()
+
+    assert queue.wait_idle(5)
+    assert calls == [[0], [1, 2], [3]]
+    assert queue.stats()["coalesced"] == 1 and queue.stats()["completed"] == 3
+
+def test_failed_job_does_not_stop_the_worker(queue):
+    seen = []
+
+    def handler(payloads):
+        if payloads == ['boom']:
+            raise RuntimeError('boom')
+        seen.extend(payloads)
+
+    queue.register('work', handler)
+    queue.submit('work', 'a', 'boom')
+    queue.wait_idle(5)
+    queue.submit('work', 'a', 'ok')
+    assert queue.wait_idle(5)
+    assert seen == ['ok'] and queue.stats()["failed"] == 1
+
+def test_shutdown_drains_queue_then_runs_inline(queue):
+    seen = []
+    release = threading.Event()
+
+    def handler(payloads):
+        release.wait(5)
+        seen.extend(payloads)
+
+    queue.register('work', handler)
+    for key in range(5):
+        queue.submit('work', key, key)
+    release.set()
+    assert queue.shutdown(timeout=5)
+    assert sorted(seen) == [0, 1, 2, 3, 4]
+
+    queue.submit('work', 'late', 'late')
+    assert seen[-1] == 'late'
+
+def test_inline_queue_runs_on_submit():
+    queue = JobQueue(None)
+    seen = []
+    queue.register('work', seen.extend)
+    assert queue.submit('work', 'a', 1)
+    assert seen == [1]
+    with pytest.raises(KeyError):
+        queue.submit('unknown', 'a', 1)
+
+def test_derived_job_matches_rebuild(tmp_path):
+    # Workers use sessions of their own, so the database must be a file
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}")
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine, autoflush=False)
+    db = Session()
+    user = User(firebase_uid='jobs', email='jobs@example.com')
+    db.add(user)
+    db.commit()
+    user_id = user.id
+
+    warmed = []
+    queue = JobQueue(MemoryJobBackend(), workers=2)
+    queue.register(DERIVED_JOB, make_derived_handler(Session, after=lambda db, user_id: warmed.append(user_id)))
+    rng = random.Random(20)
+    expenses = []
+    for _ in range(200):
+        ensure_stats_tracked(db, user_id)
+        if expenses and rng.random() < 0.3:
+            expense = expenses.pop(rng.randrange(len(expenses)))
+            change = expense_change('deleted', expense)
+            db.delete(expense)
+        else:
+            expense = Expense(
+                user_id=user_id, amount=round(rng.uniform(1, 50), 2),
+                category=rng.choice(['Food', 'Fun']),
+                date=datetime(2024, 2, 1) + timedelta(days=rng.randrange(20), hours=rng.randrange(12))
+            )
+            db.add(expense)
+            db.flush()
+            expenses.append(expense)
+            change = expense_change('added', expense)
+        db.commit()
+        queue.submit(DERIVED_JOB, user_id, change)
+    assert queue.wait_idle(10)
+    queue.shutdown()
+    assert warmed and set(warmed) == {user_id}
+
+    def derived_state():
+        db.expire_all()
+        stats = db.query(UserStats).filter(UserStats.user_id == user_id).one()
+        rollup = sorted(
+            (row.day, row.category, row.total_expenses, round(row.total_amount, 6))
+            for row in db.query(ExpenseRollup).filter(ExpenseRollup.user_id == user_id)
+        )
+        return (stats.total_expenses, round(stats.total_amount, 6), stats.last_expense_date,
+                stats.streak_days, rollup)
+
+    incremental = derived_state()
+    reconcile_user_stats(db, user_id)
+    rebuild_user_rollups(db, user_id)
+    db.commit()
+    assert incremental == derived_state()
+    assert incremental[0] == len(expenses)
+    db.close()
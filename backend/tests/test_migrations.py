@@ -0,0 +1,48 @@
+from sqlalchemy import create_engine, inspect, text
+from models import Base
+from migrations import MIGRATIONS, run_migrations
+
+def test_migrations_apply_once(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'migrations.db'}")
+    Base.metadata.create_all(bind=engine)
+
+    assert run_migrations(engine) == [name for _, name, _ in MIGRATIONS]
+    assert run_migrations(engine) == []
+
+def test_migrations_upgrade_old_user_stats(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        conn.execute(text(
+            'CREATE TABLE user_stats (id INTEGER PRIMARY KEY, user_id VARCHAR, '
+            'total_expenses INTEGER, total_amount FLOAT, streak_days INTEGER, '
+            'last_activity DATETIME, created_at DATETIME, updated_at DATETIME)'
+        ))
+        conn.execute(text("INSERT INTO user_stats (id, user_id) VALUES (1, 'a'), (2, 'a'), (3, 'b')"))
+    Base.metadata.create_all(bind=engine)
+
+    run_migrations(engine)
+
+    columns = {column['name'] for column in inspect(engine).get_columns('user_stats')}
+    assert 'last_expense_date' in columns
+    with engine.connect() as conn:
+        assert conn.execute(text('SELECT id FROM user_stats ORDER BY id')).scalars().all() == [1, 3]
+
+def test_migrations_add_sync_columns_to_old_expenses(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old_expenses.db'}")
+    with engine.begin() as conn:
+        conn.execute(text(
+            'CREATE TABLE expenses (id INTEGER PRIMARY KEY, user_id VARCHAR(36) NOT NULL, '
+            'amount FLOAT NOT NULL, category VARCHAR(100) NOT NULL, note TEXT, date DATETIME NOT NULL, '
+            'created_at DATETIME, updated_at DATETIME)'
+        ))
+        conn.execute(text("INSERT INTO expenses (user_id, amount, category, date) VALUES ('a', 1.5, 'Food', '2024-01-01')"))
+    Base.metadata.create_all(bind=engine)
+
+    run_migrations(engine)
+
+    columns = {column['name'] for column in inspect(engine).get_columns('expenses')}
+    assert {'client_id', 'sync_version'} <= columns
+    indexes = {index['name'] for index in inspect(engine).get_indexes('expenses')}
+    assert {'ix_expenses_user_id_sync_version', 'ux_expenses_user_id_client_id'} <= indexes
+    with engine.connect() as conn:
+        assert conn.execute(text('SELECT sync_version FROM expenses')).scalar() == 0
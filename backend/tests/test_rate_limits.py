@@ -0,0 +1,62 @@
+import pytest
+from flask import Flask
+from flask_limiter import Limiter
+import rate_limits
+from rate_limits import RATE_LIMIT_STRATEGIES, rate_limit_config, rate_limit_storage_uri, request_limit_key
+
+USERS = {'token-a': {'uid': 'a'}, 'token-b': {'uid': 'b'}}
+
+def make_app(strategy, verify):
+    app = Flask(__name__)
+    app.config.update(rate_limit_config('memory', strategy))
+    limiter = Limiter(key_func=lambda: request_limit_key(verify), app=app)
+
+    @app.route('/limited')
+    @limiter.limit("3 per minute")
+    @limiter.limit("100 per hour")
+    def limited():
+        return 'ok'
+    return app
+
+def get(client, token=None, address='10.0.0.1'):
+    headers = {'Authorization': f'Bearer {token}'} if token else {}
+    return client.get('/limited', headers=headers, environ_base={'REMOTE_ADDR': address}).status_code
+
+@pytest.mark.parametrize('strategy', RATE_LIMIT_STRATEGIES)
+def test_users_have_their_own_budget(strategy):
+    client = make_app(strategy, USERS.get).test_client()
+    # Same address, different users
+    assert [get(client, 'token-a') for _ in range(4)] == [200, 200, 200, 429]
+    assert get(client, 'token-b') == 200
+    # Switching address does not reset a user's budget
+    assert get(client, 'token-a', address='10.0.0.2') == 429
+
+def test_requests_without_valid_token_are_limited_per_address():
+    client = make_app('moving-window', USERS.get).test_client()
+    assert [get(client, 'forged') for _ in range(3)] == [200, 200, 200]
+    assert get(client) == 429
+    assert get(client, address='10.0.0.2') == 200
+
+def test_token_is_verified_once_per_request():
+    calls = []
+
+    def verify(token):
+        calls.append(token)
+        return USERS.get(token)
+
+    client = make_app('fixed-window', verify).test_client()
+    get(client, 'token-a')
+    assert calls == ['token-a']
+
+def test_storage_uri(monkeypatch):
+    assert rate_limit_storage_uri('shared', 'local://') == 'memory://'
+    assert rate_limit_storage_uri('memory', 'redis://cache:6379/0') == 'memory://'
+    monkeypatch.setattr(rate_limits.importlib.util, 'find_spec', lambda name: object())
+    assert rate_limit_storage_uri('shared', 'redis://cache:6379/0') == 'redis://cache:6379/0'
+    monkeypatch.setattr(rate_limits.importlib.util, 'find_spec', lambda name: None)
+    assert rate_limit_storage_uri('shared', 'redis://cache:6379/0') == 'memory://'
+
+def test_unknown_strategy_falls_back():
+    config = rate_limit_config('memory', 'token-bucket')
+    assert config['RATELIMIT_STRATEGY'] == 'moving-window'
+    assert not config['RATELIMIT_IN_MEMORY_FALLBACK_ENABLED']
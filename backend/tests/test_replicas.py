@@ -0,0 +1,136 @@
+import asyncio
+import json
+import shutil
+from datetime import datetime
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app import get_database
+from asgi import FinMateASGI
+from kvstore import LocalKeyValueStore, get_kv_client
+from models import Base, Expense, User
+from replicas import Replica, SessionRouter, parse_replica_urls
+from test_asgi import request
+
+AUTH = {'Authorization': 'Bearer test'}
+
+def replicate(primary_path, replica_path):
+    """Stand-in for replication: the replica catches up with the primary"""
+    shutil.copyfile(primary_path, replica_path)
+
+def add_directly(app, amount):
+    """Insert an expense on the primary without going through a request"""
+    with app.app_context():
+        db = get_database().SessionLocal()
+        user = db.query(User).filter(User.firebase_uid == 'dev-user').first()
+        if not user:
+            user = User(firebase_uid='dev-user', email='dev@example.com')
+            db.add(user)
+            db.flush()
+        db.add(Expense(user_id=user.id, amount=amount, category='Food', date=datetime(2024, 1, 1)))
+        db.commit()
+        db.close()
+
+@pytest.fixture
+def paths(tmp_path):
+    get_kv_client().delete('finmate:wrote:dev-user')
+    return tmp_path / 'primary.db', tmp_path / 'replica.db'
+
+@pytest.fixture
+def make_replicated_app(make_app):
+    def make(primary, replica):
+        return make_app(path=primary, READ_REPLICA_URLS=f"sqlite:///{replica}")
+    return make
+
+def amounts(client):
+    response = client.get('/api/expenses', headers=AUTH)
+    assert response.status_code == 200
+    return sorted(expense['amount'] for expense in response.get_json())
+
+def test_reads_use_replica_until_the_user_writes(paths, make_replicated_app):
+    primary, replica = paths
+    app = make_replicated_app(primary, replica)
+    client = app.test_client()
+    add_directly(app, 1.0)
+    replicate(primary, replica)
+    add_directly(app, 2.0)
+
+    # The replica has not seen the second expense yet
+    assert amounts(client) == [1.0]
+    # The user's own write moves their reads to the primary
+    assert client.post('/api/expenses', json={'amount': 3, 'category': 'Fun'}, headers=AUTH).status_code == 201
+    assert amounts(client) == [1.0, 2.0, 3.0]
+
+    router = app.extensions['finmate_db'].router
+    assert router.replicas[0].reads == 1 and router.primary_reads == 1
+
+def test_unhealthy_replica_fails_over_to_primary(paths):
+    primary, replica = paths
+    engine = create_engine(f"sqlite:///{primary}")
+    Base.metadata.create_all(bind=engine)
+    primary_sessions = sessionmaker(bind=engine)
+    # No schema on the replica yet
+    replica_db = Replica(f"sqlite:///{replica}", check_interval=0)
+    router = SessionRouter(primary_sessions, [replica_db], client=LocalKeyValueStore())
+
+    assert router.read_sessions('uid') is primary_sessions
+    assert not replica_db.healthy
+
+    replicate(primary, replica)
+    assert router.read_sessions('uid') is replica_db.SessionLocal
+
+    router.mark_written('uid')
+    assert router.read_sessions('uid') is primary_sessions
+    assert router.read_sessions('other') is replica_db.SessionLocal
+    router.dispose()
+
+def test_parse_replica_urls():
+    assert parse_replica_urls(' sqlite:///a.db, ,postgresql://r2/db ') == ['sqlite:///a.db', 'postgresql://r2/db']
+    assert parse_replica_urls('') == []
+
+def test_sync_ahead_of_a_lagging_replica_reads_the_primary(paths, make_replicated_app):
+    primary, replica = paths
+    app = make_replicated_app(primary, replica)
+    client = app.test_client()
+    add_directly(app, 1.0)
+    replicate(primary, replica)
+    client.post('/api/expenses', json={'amount': 3, 'category': 'Fun'}, headers=AUTH)
+    version = client.get('/api/sync?since=0', headers=AUTH).get_json()['version']
+
+    # Once the user is no longer sticky, the replica is still behind
+    get_kv_client().delete('finmate:wrote:dev-user')
+    changes = client.get(f'/api/sync?since={version}', headers=AUTH).get_json()
+    assert not changes['reset'] and changes['upserted'] == []
+
+def test_only_expense_writes_pin_reads_to_the_primary(paths, make_replicated_app):
+    primary, replica = paths
+    app = make_replicated_app(primary, replica)
+    client = app.test_client()
+    add_directly(app, 1.0)
+    replicate(primary, replica)
+
+    assert client.post('/api/auth/verify', json={'token': 'test'}).status_code == 200
+    assert client.post('/api/tips', headers=AUTH).status_code == 200
+    assert get_kv_client().get('finmate:wrote:dev-user') is None
+    assert client.delete('/api/expenses/1', headers=AUTH).status_code == 200
+    assert get_kv_client().get('finmate:wrote:dev-user') is not None
+
+def test_asgi_handlers_read_from_the_replica(paths, make_replicated_app):
+    primary, replica = paths
+    asgi_app = FinMateASGI(make_replicated_app(primary, replica))
+    add_directly(asgi_app.flask_app, 1.0)
+    replicate(primary, replica)
+    add_directly(asgi_app.flask_app, 2.0)
+
+    status, _, body = asyncio.run(request(asgi_app, 'GET', '/api/stats'))
+    assert status == 200 and json.loads(body)['total_expenses'] == 1
+    assert asyncio.run(request(asgi_app, 'POST', '/api/tips'))[0] == 200
+    router = asgi_app.router
+    assert router.replicas[0].reads == 2 and router.primary_reads == 0
+
+    # After the user's own write, the async handlers read the primary too
+    payload = json.dumps({'amount': 3, 'category': 'Fun'}).encode()
+    asyncio.run(request(asgi_app, 'POST', '/api/expenses', {'Content-Type': 'application/json'}, payload))
+    status, _, body = asyncio.run(request(asgi_app, 'GET', '/api/stats'))
+    assert json.loads(body)['total_expenses'] == 3
+    asyncio.run(asgi_app.dispose())
@@ -0,0 +1,119 @@
+import io
+import random
+from datetime import date, datetime, timedelta
+import pytest
+from sqlalchemy import create_engine, insert, text
+from sqlalchemy.orm import sessionmaker
+from models import Base, User, Expense, ExpenseRollup
+from importer import import_expenses, iter_jsonl_rows
+from migrations import run_migrations
+from rollups import (
+    apply_rollup_deltas, default_range_start, get_rollup_totals, get_time_series, rebuild_user_rollups
+)
+
+@pytest.fixture
+def user_id(db):
+    user = User(firebase_uid='rollups', email='rollups@example.com')
+    db.add(user)
+    db.commit()
+    return user.id
+
+def add_expense(db, user_id, amount, category, date):
+    expense = Expense(user_id=user_id, amount=amount, category=category, date=date)
+    db.add(expense)
+    db.flush()
+    apply_rollup_deltas(db, user_id, {(date.date(), category): (1, amount)})
+    db.commit()
+    return expense
+
+def snapshot(db, user_id):
+    return {
+        (row.day, row.category): (row.total_expenses, round(row.total_amount, 6))
+        for row in db.query(ExpenseRollup).filter(ExpenseRollup.user_id == user_id)
+    }
+
+def test_incremental_rollup_matches_rebuild(db, user_id):
+    rng = random.Random(16)
+    start = datetime(2024, 1, 1, 8)
+    expenses = []
+    for _ in range(300):
+        if expenses and rng.random() < 0.3:
+            expense = expenses.pop(rng.randrange(len(expenses)))
+            db.delete(expense)
+            db.flush()
+            apply_rollup_deltas(db, user_id, {(expense.date.date(), expense.category): (-1, -expense.amount)})
+            db.commit()
+        else:
+            date = start + timedelta(days=rng.randrange(40), hours=rng.randrange(14))
+            expenses.append(add_expense(
+                db, user_id, round(rng.uniform(1, 100), 2), rng.choice(['Food', 'Bills', 'Fun']), date
+            ))
+
+    incremental = snapshot(db, user_id)
+    rebuild_user_rollups(db, user_id)
+    db.commit()
+    assert incremental == snapshot(db, user_id)
+    assert all(count > 0 for count, _ in incremental.values())
+    assert get_rollup_totals(db, user_id) == (len(expenses), pytest.approx(sum(e.amount for e in expenses)))
+
+def test_time_series_buckets(db, user_id):
+    add_expense(db, user_id, 10.0, 'Food', datetime(2024, 3, 4, 9))    # Monday
+    add_expense(db, user_id, 5.0, 'Bills', datetime(2024, 3, 4, 18))
+    add_expense(db, user_id, 7.5, 'Food', datetime(2024, 3, 10, 12))   # Sunday
+    add_expense(db, user_id, 20.0, 'Food', datetime(2024, 4, 1, 12))
+
+    daily = get_time_series(db, user_id, 'day', date(2024, 3, 3), date(2024, 3, 5))
+    assert [(b["period"], b["count"], b["total"]) for b in daily] == [
+        ('2024-03-03', 0, 0.0), ('2024-03-04', 2, 15.0), ('2024-03-05', 0, 0.0)
+    ]
+    assert daily[1]["categories"] == {'Food': 10.0, 'Bills': 5.0}
+
+    weekly = get_time_series(db, user_id, 'week', date(2024, 3, 4), date(2024, 3, 17))
+    assert [(b["period"], b["total"]) for b in weekly] == [('2024-03-04', 22.5), ('2024-03-11', 0.0)]
+
+    monthly = get_time_series(db, user_id, 'month', date(2024, 2, 15), date(2024, 4, 30), category='Food')
+    assert [(b["period"], b["count"], b["total"]) for b in monthly] == [
+        ('2024-02-01', 0, 0.0), ('2024-03-01', 2, 17.5), ('2024-04-01', 1, 20.0)
+    ]
+
+def test_time_series_rejects_bad_ranges(db, user_id):
+    with pytest.raises(ValueError):
+        get_time_series(db, user_id, 'year', date(2024, 1, 1), date(2024, 2, 1))
+    with pytest.raises(ValueError):
+        get_time_series(db, user_id, 'day', date(2024, 2, 1), date(2024, 1, 1))
+    with pytest.raises(ValueError):
+        get_time_series(db, user_id, 'day', date(2000, 1, 1), date(2024, 1, 1))
+
+def test_default_range_start():
+    assert default_range_start(date(2024, 3, 31), 'day') == date(2024, 3, 2)
+    assert default_range_start(date(2024, 3, 31), 'week') == date(2024, 1, 8)
+    assert default_range_start(date(2024, 3, 31), 'month') == date(2023, 4, 1)
+
+def test_import_updates_rollup(db, user_id):
+    body = b'\n'.join([
+        b'{"amount": 4, "category": "Food", "date": "2024-05-01T08:00:00"}',
+        b'{"amount": 6, "category": "Food", "date": "2024-05-01T20:00:00"}',
+        b'{"amount": 3, "category": "Fun", "date": "2024-05-02T10:00:00"}',
+    ])
+    import_expenses(db, user_id, iter_jsonl_rows(io.BytesIO(body)))
+    db.commit()
+    assert snapshot(db, user_id) == {
+        (date(2024, 5, 1), 'Food'): (2, 10.0),
+        (date(2024, 5, 2), 'Fun'): (1, 3.0)
+    }
+
+def test_migration_backfills_rollup(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'rollups.db'}")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO users (id, firebase_uid, email) VALUES ('u', 'u', 'u@example.com')"))
+        conn.execute(insert(Expense), [
+            {'user_id': 'u', 'amount': 2.0, 'category': 'Food', 'date': datetime(2024, 1, 1, 9)},
+            {'user_id': 'u', 'amount': 3.0, 'category': 'Food', 'date': datetime(2024, 1, 1, 21)},
+        ])
+
+    run_migrations(engine)
+
+    session = sessionmaker(bind=engine)()
+    assert snapshot(session, 'u') == {(date(2024, 1, 1), 'Food'): (2, 5.0)}
+    session.close()
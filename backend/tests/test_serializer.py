@@ -0,0 +1,67 @@
+import json
+import random
+from datetime import datetime, timedelta
+import pytest
+import serializer
+from models import Expense
+from serializer import dumps, rows_to_json
+
+AUTH = {'Authorization': 'Bearer test'}
+
+FIELDS = ('id', 'user_id', 'amount', 'category', 'note', 'date', 'created_at', 'updated_at')
+
+def expense_rows(count):
+    rng = random.Random(15)
+    now = datetime(2024, 5, 1, 12, 30, 15, 123456)
+    return [
+        (i, 'user-1', round(rng.uniform(1, 500), 2), rng.choice(['Food', 'Café ☕', 'A "quoted" one']),
+         rng.choice([None, '', 'line\nbreak', 'emoji 💸']), now - timedelta(minutes=i),
+         now, now.replace(microsecond=0))
+        for i in range(count)
+    ]
+
+@pytest.fixture(params=['orjson', 'stdlib'])
+def backend(request, monkeypatch):
+    if request.param == 'orjson' and serializer.orjson is None:
+        pytest.skip('orjson is not installed')
+    monkeypatch.setattr(serializer, 'JSON_SERIALIZER', request.param)
+    return request.param
+
+def test_rows_to_json_matches_to_dict(backend):
+    rows = expense_rows(200)
+    expected = [Expense(**dict(zip(FIELDS, row))).to_dict() for row in rows]
+
+    assert json.loads(rows_to_json(FIELDS, rows)) == expected
+    assert json.loads(dumps(expected)) == expected
+
+def test_rows_to_json_ignores_trailing_columns(backend):
+    rows = [(1, 'Food', datetime(2024, 1, 2), 99)]
+    assert json.loads(rows_to_json(('id', 'category'), rows)) == [{'id': 1, 'category': 'Food'}]
+    assert json.loads(rows_to_json(('id',), [])) == []
+
+def test_expense_list_pages_by_cursor_with_field_projection(client):
+    # Three expenses share a date, so pages split on the id tie-breaker
+    days = ['2024-01-03', '2024-01-02', '2024-01-02', '2024-01-02', '2024-01-01']
+    for amount, day in enumerate(days):
+        client.post('/api/expenses', json={'amount': amount + 1, 'category': 'Food', 'date': day}, headers=AUTH)
+
+    pages, cursor = [], None
+    while True:
+        query = '/api/expenses?limit=2&fields=amount,category' + (f'&cursor={cursor}' if cursor else '')
+        response = client.get(query, headers=AUTH)
+        assert response.status_code == 200
+        pages.append(response.get_json())
+        cursor = response.headers.get('X-Next-Cursor')
+        if not cursor:
+            break
+
+    assert [len(page) for page in pages] == [2, 2, 1]
+    rows = [row for page in pages for row in page]
+    assert all(set(row) == {'amount', 'category'} for row in rows)
+    # Newest first, and later ids first within a day
+    assert [row['amount'] for row in rows] == [1, 4, 3, 2, 5]
+
+def test_expense_list_rejects_bad_parameters(client):
+    for query in ('limit=0', 'limit=abc', 'cursor=not-a-cursor', 'fields=amount,password'):
+        response = client.get(f'/api/expenses?{query}', headers=AUTH)
+        assert response.status_code == 400 and 'error' in response.get_json()
@@ -0,0 +1,62 @@
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# Budget for the cumulative import time of the app module; the Gemini and
+# Firebase SDKs alone used to take longer than this
+IMPORT_TIME_BUDGET_MS = float(os.getenv('IMPORT_TIME_BUDGET_MS', '1000'))
+
+# Modules that must only be loaded on first use
+LAZY_MODULES = ('google.generativeai', 'firebase_admin.auth', 'pyarrow', 'numpy')
+
+def import_times(module):
+    """Run `python -X importtime -c 'import module'` and parse its report
+
+    Returns {module name: cumulative microseconds}.
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+def test_app_import_is_lazy_and_fast():
+    times = import_times('app')
+
+    assert not [name for name in LAZY_MODULES if name in times]
+    slowest = sorted(times.items(), key=lambda item: item[1], reverse=True)[:10]
+    assert times['app'] / 1000 < IMPORT_TIME_BUDGET_MS, f"slowest imports: {slowest}"
+
+def test_create_app_does_not_touch_the_database(tmp_path):
+    from app import create_app, get_database
+
+    database_file = tmp_path / 'startup.db'
+    app = create_app(f'sqlite:///{database_file}')
+    assert not database_file.exists()
+    with app.app_context():
+        get_database().create_all()
+    assert database_file.exists()
+
+def test_lazy_client_builds_once_and_degrades_to_none():
+    from clients import LazyClient
+
+    calls = []
+    def create_client():
+        calls.append(1)
+        return object()
+    client = LazyClient(create_client)
+    assert not client.initialized
+    assert client.get() is client.get()
+    assert len(calls) == 1
+
+    def broken_client():
+        raise RuntimeError('bad credentials')
+    assert LazyClient(broken_client).get() is None
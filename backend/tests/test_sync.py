@@ -0,0 +1,113 @@
+from app import get_database
+from models import Expense, ExpenseTombstone, UserStats
+from sync import remove_expense
+
+AUTH = {'Authorization': 'Bearer test'}
+
+def add(client, amount, category='Food'):
+    response = client.post('/api/expenses', json={'amount': amount, 'category': category}, headers=AUTH)
+    assert response.status_code == 201
+    return response.get_json()['id']
+
+def sync(client, since):
+    response = client.get(f'/api/sync?since={since}', headers=AUTH)
+    assert response.status_code == 200
+    return response.get_json()
+
+def push(client, *mutations):
+    response = client.post('/api/sync', json={'mutations': list(mutations)}, headers=AUTH)
+    assert response.status_code == 200
+    return [(result['status'], result['id']) for result in response.get_json()['results']]
+
+def stats_total(client):
+    with client.application.app_context():
+        db = get_database().SessionLocal()
+        try:
+            return db.query(UserStats.total_expenses).scalar(), db.query(Expense).count()
+        finally:
+            db.close()
+
+def test_sync_returns_only_changes_since_version(client):
+    first, second = add(client, 10), add(client, 20)
+    full = sync(client, 0)
+    assert full['reset'] and sorted(e['id'] for e in full['upserted']) == [first, second]
+
+    third = add(client, 30)
+    client.delete(f'/api/expenses/{first}', headers=AUTH)
+    delta = sync(client, full['version'])
+    assert not delta['reset'] and delta['version'] > full['version']
+    assert [e['id'] for e in delta['upserted']] == [third]
+    assert delta['deleted'] == [{'id': first, 'client_id': None}]
+    assert sync(client, delta['version'])['upserted'] == []
+
+    # Nothing changed, so the same request is answered with 304
+    etag = client.get(f"/api/sync?since={delta['version']}", headers=AUTH).headers['ETag']
+    response = client.get(f"/api/sync?since={delta['version']}", headers={**AUTH, 'If-None-Match': etag})
+    assert response.status_code == 304
+
+def test_batch_writes_are_synced(client):
+    ids = [add(client, amount) for amount in (1, 2, 3)]
+    version = sync(client, 0)['version']
+    response = client.post('/api/expenses/batch', json={'action': 'update', 'ids': ids[:1], 'set': {'amount': 9}},
+                           headers=AUTH)
+    assert response.status_code == 200
+    client.post('/api/expenses/batch', json={'action': 'delete', 'ids': ids[1:]}, headers=AUTH)
+
+    delta = sync(client, version)
+    assert [(e['id'], e['amount']) for e in delta['upserted']] == [(ids[0], 9.0)]
+    assert sorted(e['id'] for e in delta['deleted']) == ids[1:]
+
+def test_replayed_mutations_are_applied_once(client):
+    mutations = [
+        {'op': 'create', 'client_id': 'c-1', 'expense': {'amount': 5, 'category': 'Fun'}},
+        {'op': 'create', 'client_id': 'c-2', 'expense': {'amount': 7, 'category': 'Food'}},
+        {'op': 'update', 'client_id': 'c-1', 'expense': {'amount': 6}},
+        {'op': 'delete', 'client_id': 'c-2'},
+    ]
+    results = push(client, *mutations)
+    assert [status for status, _ in results] == ['created', 'created', 'updated', 'deleted']
+
+    # A retry after a lost response changes nothing; the deleted create
+    # does not come back
+    assert [status for status, _ in push(client, *mutations)] == ['duplicate', 'deleted', 'updated', 'not_found']
+    upserted = sync(client, 0)['upserted']
+    assert [(e['client_id'], e['amount']) for e in upserted] == [('c-1', 6.0)]
+    assert stats_total(client) == (1, 1)
+
+def test_invalid_mutations_are_reported_and_skipped(client):
+    expense_id = add(client, 10)
+    results = push(
+        client,
+        {'op': 'create', 'client_id': 'c-1', 'expense': {'amount': -1, 'category': 'Fun'}},
+        {'op': 'update', 'id': expense_id, 'expense': {'category': 'Bills'}},
+        {'op': 'create', 'expense': {'amount': 1, 'category': 'Fun'}},
+    )
+    assert results == [('invalid', None), ('updated', expense_id), ('invalid', None)]
+    assert sync(client, 0)['upserted'][0]['category'] == 'Bills'
+
+    response = client.post('/api/sync', json={'mutations': []}, headers=AUTH)
+    assert response.status_code == 400
+    assert client.get('/api/sync?since=abc', headers=AUTH).status_code == 400
+
+def test_since_ahead_of_server_resets(client):
+    add(client, 10)
+    changes = sync(client, 10 ** 6)
+    assert changes['reset'] and len(changes['upserted']) == 1
+
+def test_concurrent_deletes_record_one_tombstone(client):
+    expense_id = add(client, 10)
+    with client.application.app_context():
+        sessions = get_database().SessionLocal
+        first, second = sessions(), sessions()
+        try:
+            # Both requests loaded the expense before either deleted it
+            expenses = [db.query(Expense).filter(Expense.id == expense_id).one() for db in (first, second)]
+            assert remove_expense(first, expenses[0], 5)
+            first.commit()
+            assert not remove_expense(second, expenses[1], 6)
+            second.commit()
+            assert first.query(ExpenseTombstone).count() == 1
+        finally:
+            first.close()
+            second.close()
+    assert client.delete(f'/api/expenses/{expense_id}', headers=AUTH).status_code == 404
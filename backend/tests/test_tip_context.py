@@ -0,0 +1,85 @@
+import random
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import event
+from models import User, Expense
+from ai_tips import build_prompt
+from data_version import bump_data_version
+from rollups import apply_rollup_deltas, rebuild_user_rollups
+from tip_context import TIP_CATEGORY_CHARS, TipContextCache, load_tip_context
+
+@pytest.fixture
+def user_id(db):
+    user = User(firebase_uid='tips', email='tips@example.com')
+    db.add(user)
+    db.commit()
+    return user.id
+
+def seed(db, user_id, count, categories=('Food', 'Transport', 'Fun', 'Bills', 'Rent')):
+    rng = random.Random(18)
+    start = datetime(2024, 1, 1)
+    for i in range(count):
+        db.add(Expense(
+            user_id=user_id,
+            amount=round(rng.uniform(1, 300), 2),
+            category=rng.choice(categories),
+            date=start + timedelta(hours=i * 7)
+        ))
+    db.flush()
+    rebuild_user_rollups(db, user_id)
+    db.commit()
+
+def test_context_matches_expenses(db, user_id):
+    seed(db, user_id, 200)
+    context = load_tip_context(db, user_id)
+
+    expenses = db.query(Expense).filter(Expense.user_id == user_id).all()
+    totals = {}
+    for expense in expenses:
+        totals[expense.category] = totals.get(expense.category, 0) + expense.amount
+    top = sorted(totals.items(), key=lambda item: item[1], reverse=True)[:3]
+    newest = sorted(expenses, key=lambda e: e.date, reverse=True)[:5]
+
+    assert context["expense_count"] == 200
+    assert context["total_spent"] == pytest.approx(sum(e.amount for e in expenses))
+    assert list(context["categories"]) == [category for category, _ in top]
+    assert list(context["categories"].values()) == pytest.approx([amount for _, amount in top])
+    assert context["recent_expenses"] == [{"category": e.category, "amount": e.amount} for e in newest]
+
+def test_context_for_user_without_expenses(db, user_id):
+    assert load_tip_context(db, user_id) == {
+        "total_spent": 0, "expense_count": 0, "categories": {}, "recent_expenses": []
+    }
+
+def test_cache_reloads_only_on_new_data_version(engine, db, user_id):
+    seed(db, user_id, 10)
+    cache = TipContextCache()
+    statements = []
+    event.listen(engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+
+    first = cache.get(db, user_id)
+    loaded = len(statements)
+    assert cache.get(db, user_id) is first
+    # A cache hit only reads the data version
+    assert len(statements) == loaded + 1
+
+    expense = Expense(user_id=user_id, amount=50.0, category='Food', date=datetime(2025, 1, 1))
+    db.add(expense)
+    db.flush()
+    apply_rollup_deltas(db, user_id, {(expense.date.date(), expense.category): (1, expense.amount)})
+    bump_data_version(db, user_id)
+    db.commit()
+    second = cache.get(db, user_id)
+    assert second["expense_count"] == 11
+    assert second["recent_expenses"][0] == {"category": 'Food', "amount": 50.0}
+
+def test_prompt_size_does_not_grow_with_history(db, user_id):
+    long_names = tuple(f"{i}-{'x' * 90}" for i in range(50))
+    seed(db, user_id, 2000, categories=long_names)
+    context = load_tip_context(db, user_id)
+
+    assert len(context["categories"]) == 3 and len(context["recent_expenses"]) == 5
+    assert all(len(category) <= TIP_CATEGORY_CHARS for category in context["categories"])
+    top = max(context["categories"].items(), key=lambda item: item[1])
+    prompt = build_prompt(context["total_spent"], top, context["expense_count"], context["recent_expenses"])
+    assert len(prompt) < 1500
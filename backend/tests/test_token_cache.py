@@ -0,0 +1,64 @@
+import threading
+from sqlalchemy import event
+import users
+from cache import LRUCache
+from models import User
+from token_cache import TokenCache
+from users import get_or_create_user, resolve_user_id, user_id_cache
+
+def test_counters_are_exact_under_concurrent_lookups():
+    cache = TokenCache(LRUCache(max_entries=10), clock=lambda: 1000.0)
+    cache.put('good', {'uid': 'u', 'exp': 2000})
+
+    def lookups():
+        for _ in range(2000):
+            cache.get('good')
+            cache.get('bad')
+
+    threads = [threading.Thread(target=lookups) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = cache.stats()
+    assert stats['hits'] == 16000
+    assert stats['misses'] == 16000
+    assert stats['hit_ratio'] == 0.5
+
+def test_expired_claims_are_a_miss():
+    now = [1000.0]
+    cache = TokenCache(LRUCache(max_entries=10), clock=lambda: now[0])
+    cache.put('token', {'uid': 'u', 'exp': 1100})
+    assert cache.get('token') == {'uid': 'u', 'exp': 1100}
+    now[0] = 1100.0
+    assert cache.get('token') is None
+
+def test_user_resolution_is_cached_and_creates_the_user_once(engine, db):
+    user_id_cache.clear()
+    statements = []
+    event.listen(engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+
+    user_id = resolve_user_id(db, 'new-uid', 'new@example.com')
+    assert db.query(User).filter(User.firebase_uid == 'new-uid').one().id == user_id
+    # Cached: no more round-trips for the uid
+    statements.clear()
+    assert resolve_user_id(db, 'new-uid', 'new@example.com') == user_id
+    assert statements == []
+
+    # Another process resolving the uid finds the existing row
+    user_id_cache.clear()
+    assert resolve_user_id(db, 'new-uid', 'other@example.com') == user_id
+    assert get_or_create_user(db, 'new-uid', 'new@example.com').email == 'new@example.com'
+    assert db.query(User).count() == 1
+
+def test_concurrently_created_user_is_not_inserted_twice(db, monkeypatch):
+    user_id_cache.clear()
+    db.add(User(id='existing', firebase_uid='racing-uid', email='racing@example.com'))
+    db.commit()
+    # The SELECT misses the row another request inserted in the meantime
+    lookups = iter([None, 'existing'])
+    monkeypatch.setattr(users, '_select_user_id', lambda db, firebase_uid: next(lookups))
+
+    assert resolve_user_id(db, 'racing-uid', 'racing@example.com') == 'existing'
+    assert db.query(User).count() == 1
@@ -0,0 +1,99 @@
+import random
+import threading
+from datetime import datetime, timedelta
+import pytest
+from app import get_database
+from models import User, Expense, UserStats, CategoryStats
+from derived import apply_expense_changes, expense_change
+from user_stats import compute_streak, get_or_create_stats, reconcile_user_stats
+
+@pytest.fixture
+def user_id(db):
+    user = User(firebase_uid='stats', email='stats@example.com')
+    db.add(user)
+    db.commit()
+    return user.id
+
+def snapshot(db, user_id):
+    db.expire_all()
+    stats = db.query(UserStats).filter(UserStats.user_id == user_id).one()
+    categories = {
+        row.category: (row.total_expenses, round(row.total_amount, 6))
+        for row in db.query(CategoryStats).filter(CategoryStats.user_id == user_id)
+        if row.total_expenses
+    }
+    return (stats.total_expenses, round(stats.total_amount, 6),
+            stats.last_expense_date, stats.streak_days, categories)
+
+def test_incremental_stats_match_reconcile(db, user_id):
+    rng = random.Random(3)
+    start = datetime(2024, 1, 1, 12)
+    expenses = []
+    for _ in range(300):
+        # Derived jobs apply one or several coalesced changes
+        changes = []
+        for _ in range(rng.choice((1, 1, 1, 2, 4))):
+            if expenses and rng.random() < 0.3:
+                expense = expenses.pop(rng.randrange(len(expenses)))
+                changes.append(expense_change('deleted', expense))
+                db.delete(expense)
+            else:
+                expense = Expense(
+                    user_id=user_id, amount=round(rng.uniform(1, 100), 2), category=rng.choice('ABC'),
+                    date=start + timedelta(days=rng.randrange(60), hours=rng.randrange(10))
+                )
+                db.add(expense)
+                expenses.append(expense)
+                changes.append(expense_change('added', expense))
+            db.flush()
+        apply_expense_changes(db, user_id, changes)
+        db.commit()
+
+        incremental = snapshot(db, user_id)
+        reconcile_user_stats(db, user_id)
+        db.commit()
+        assert snapshot(db, user_id) == incremental
+
+def test_get_or_create_stats_is_idempotent(db, user_id):
+    first = get_or_create_stats(db, user_id)
+    db.expunge(first)
+    # A concurrent writer's insert must not make the second one fail
+    second = get_or_create_stats(db, user_id)
+    db.commit()
+
+    assert second.id == first.id
+    assert db.query(UserStats).filter(UserStats.user_id == user_id).count() == 1
+
+def test_compute_streak_spans_several_windows(db, user_id):
+    last_day = datetime(2024, 6, 30, 9)
+    for offset in range(100):
+        db.add(Expense(user_id=user_id, amount=1.0, category='A', date=last_day - timedelta(days=offset)))
+    db.add(Expense(user_id=user_id, amount=1.0, category='A', date=last_day - timedelta(days=101)))
+    db.commit()
+
+    assert compute_streak(db, user_id, last_day.date()) == 100
+    assert compute_streak(db, user_id, (last_day - timedelta(days=101)).date()) == 1
+
+def test_concurrent_first_writes_are_counted_once(make_app):
+    app = make_app()
+
+    def add_expenses():
+        client = app.test_client()
+        for _ in range(10):
+            response = client.post('/api/expenses', json={'amount': 1, 'category': 'Food'},
+                                   headers={'Authorization': 'Bearer test'})
+            assert response.status_code == 201
+
+    # The user has no stats row yet, so every thread may try to build it
+    threads = [threading.Thread(target=add_expenses) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with app.app_context():
+        db = get_database().SessionLocal()
+        try:
+            assert db.query(UserStats.total_expenses).scalar() == db.query(Expense).count() == 60
+        finally:
+            db.close()
@@ -0,0 +1,88 @@
+import os
+from sqlalchemy import func, literal, null, select, union_all
+from cache import LRUCache
+from data_version import get_data_version
+from models import Expense, ExpenseRollup
+
+# Spending summary behind the /api/tips prompt.
+#
+# The summary (totals, top categories, latest expenses) is built from the
+# database in a single statement and cached per (user, data version), so a
+# tips request costs one primary key lookup until the user's expenses
+# change. Its size is fixed by the limits below, whatever the history size.
+
+TIP_CONTEXT_CACHE_SIZE = int(os.getenv('TIP_CONTEXT_CACHE_SIZE', '1000'))
+TIP_TOP_CATEGORIES = 3
+TIP_RECENT_EXPENSES = 5
+# Category names are cut to this length in the prompt
+TIP_CATEGORY_CHARS = 40
+
+def _category_label(category):
+    return category[:TIP_CATEGORY_CHARS]
+
+def load_tip_context(db, user_id):
+    """Build a user's tip summary with one query
+
+    Returns {"total_spent", "expense_count", "categories": {category:
+    amount} for the top categories, "recent_expenses": [{"category",
+    "amount"}] newest first}.
+    """
+    # Per-category totals from the rollup and the newest expenses, stacked
+    # as (kind, category, count, amount, date) rows
+    totals = select(
+        literal('category').label('kind'),
+        ExpenseRollup.category,
+        func.sum(ExpenseRollup.total_expenses).label('count'),
+        func.sum(ExpenseRollup.total_amount).label('amount'),
+        null().label('date')
+    ).where(ExpenseRollup.user_id == user_id).group_by(ExpenseRollup.category)
+    recent = select(
+        Expense.category, Expense.amount, Expense.date
+    ).where(Expense.user_id == user_id).order_by(
+        Expense.date.desc(), Expense.id.desc()
+    ).limit(TIP_RECENT_EXPENSES).subquery()
+    latest = select(
+        literal('recent').label('kind'),
+        recent.c.category,
+        literal(1).label('count'),
+        recent.c.amount,
+        recent.c.date
+    )
+    rows = db.execute(union_all(totals, latest)).all()
+
+    categories = [(category, count, amount) for kind, category, count, amount, _ in rows if kind == 'category']
+    top = sorted(categories, key=lambda row: row[2], reverse=True)[:TIP_TOP_CATEGORIES]
+    recent_rows = sorted(
+        (row for row in rows if row[0] == 'recent'),
+        key=lambda row: str(row[4]), reverse=True
+    )
+    return {
+        "total_spent": sum(amount for _, _, amount in categories),
+        "expense_count": sum(count for _, count, _ in categories),
+        "categories": {_category_label(category): amount for category, _, amount in top},
+        "recent_expenses": [
+            {"category": _category_label(category), "amount": amount}
+            for _, category, _, amount, _ in recent_rows
+        ]
+    }
+
+class TipContextCache:
+    """Tip summaries per (user, data version)"""
+
+    def __init__(self, max_entries=TIP_CONTEXT_CACHE_SIZE):
+        self._entries = LRUCache(max_entries=max_entries)
+
+    def get(self, db, user_id):
+        """Return the user's tip summary, loading it on a version change"""
+        key = (user_id, get_data_version(db, user_id))
+        context = self._entries.get(key)
+        if context is None:
+            context = load_tip_context(db, user_id)
+            self._entries.set(key, context)
+        return context
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,94 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from cache import LRUCache
+from kvstore import get_kv_client
+
+# Cache of verified Firebase ID tokens.
+#
+# Verifying a token checks its signature on every request, so decoded claims
+# are cached under a SHA-256 hash of the token. An entry never outlives the
+# token's own `exp` claim. Only successful verifications are cached.
+
+TOKEN_CACHE_BACKEND = os.getenv('TOKEN_CACHE_BACKEND', 'memory')
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', '10000'))
+TOKEN_CACHE_TTL = int(os.getenv('TOKEN_CACHE_TTL', '300'))
+
+# Tokens this close to expiry are not cached
+EXPIRY_LEEWAY_SECONDS = 5
+
+class KeyValueBackend:
+    """Store entries in a shared Redis-compatible key-value client"""
+
+    def __init__(self, client, prefix='finmate:token:'):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return json.loads(value) if value is not None else None
+
+    def set(self, key, value, ttl):
+        self.client.setex(self.prefix + key, max(1, int(ttl)), json.dumps(value))
+
+class TokenCache:
+    """Cache decoded token claims in front of a verification function"""
+
+    def __init__(self, backend, max_ttl=TOKEN_CACHE_TTL, clock=time.time):
+        self.backend = backend
+        self.max_ttl = max_ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key_for(token):
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+    def get(self, token):
+        claims = self.backend.get(self.key_for(token))
+        # Re-check exp in case the backend keeps entries slightly longer
+        hit = claims is not None and claims.get('exp', 0) > self._clock()
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return claims if hit else None
+
+    def put(self, token, claims):
+        exp = claims.get('exp')
+        if not exp:
+            return
+        ttl = min(self.max_ttl, exp - self._clock() - EXPIRY_LEEWAY_SECONDS)
+        if ttl > 0:
+            self.backend.set(self.key_for(token), claims, ttl)
+
+    def verify(self, token, verifier):
+        """Return cached claims for token, calling verifier on a miss"""
+        claims = self.get(token)
+        if claims is None:
+            claims = verifier(token)
+            if claims:
+                self.put(token, claims)
+        return claims
+
+    def stats(self):
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": hits / lookups if lookups else 0.0
+        }
+
+def create_token_cache(backend=TOKEN_CACHE_BACKEND):
+    """Build a TokenCache for the configured backend ('memory' or 'shared')"""
+    if backend == 'shared':
+        return TokenCache(KeyValueBackend(get_kv_client()))
+    return TokenCache(LRUCache(max_entries=TOKEN_CACHE_SIZE))
@@ -0,0 +1,278 @@
+from sqlalchemy import func
+from datetime import datetime, timedelta
+from models import User, Expense, UserStats, CategoryStats
+from database import insert_ignoring_conflict
+
+# Incremental maintenance of UserStats and CategoryStats.
+#
+# apply_expense_deltas runs after the expense writes have been flushed, in
+# the same transaction or in the derived job that follows it (see
+# derived.py). It only touches the user's stats rows, and walks the history
+# only when a change can join or end the streak, so its cost does not depend
+# on how many expenses the user already has. It does not commit.
+#
+# The stats rows are read with SELECT ... FOR UPDATE, so concurrent writes
+# for the same user serialize on them instead of losing streak updates.
+#
+# The streak is the number of consecutive days with at least one expense,
+# ending on UserStats.last_expense_date.
+
+# First date window scanned by compute_streak; it doubles while the streak
+# runs past the window's start
+STREAK_WINDOW_DAYS = 32
+
+def _create_stats(db, user_id):
+    """Insert an empty stats row, returning False if the user has one"""
+    # Concurrent first writes race safely on the unique user_id
+    return insert_ignoring_conflict(db, UserStats, {
+        'user_id': user_id,
+        'total_expenses': 0,
+        'total_amount': 0.0,
+        'streak_days': 0
+    }, ['user_id'])
+
+def _stats_query(db, user_id):
+    return db.query(UserStats).filter(UserStats.user_id == user_id).with_for_update()
+
+def get_or_create_stats(db, user_id):
+    """Get the user's UserStats row locked for update, creating it if missing"""
+    stats = _stats_query(db, user_id).first()
+    if not stats:
+        _create_stats(db, user_id)
+        stats = _stats_query(db, user_id).first()
+    return stats
+
+def _get_or_create_category_stats(db, user_id, category):
+    query = db.query(CategoryStats).filter(
+        CategoryStats.user_id == user_id,
+        CategoryStats.category == category
+    ).with_for_update()
+    category_stats = query.first()
+    if not category_stats:
+        insert_ignoring_conflict(db, CategoryStats, {
+            'user_id': user_id,
+            'category': category,
+            'total_expenses': 0,
+            'total_amount': 0.0
+        }, ['user_id', 'category'])
+        category_stats = query.first()
+    return category_stats
+
+def _add_delta(db, obj, column, delta):
+    """Add delta to a column, as a SQL expression for persisted rows"""
+    if obj in db.new:
+        setattr(obj, column.key, (getattr(obj, column.key) or 0) + delta)
+    else:
+        setattr(obj, column.key, column + delta)
+
+def _to_day(value):
+    if isinstance(value, str):
+        return datetime.fromisoformat(value).date()
+    return value.date() if isinstance(value, datetime) else value
+
+def _has_expense_on(db, user_id, day):
+    start = datetime.combine(day, datetime.min.time())
+    return db.query(Expense.id).filter(
+        Expense.user_id == user_id,
+        Expense.date >= start,
+        Expense.date < start + timedelta(days=1)
+    ).first() is not None
+
+def compute_streak(db, user_id, last_day):
+    """Count consecutive expense days ending on last_day
+
+    Reads the user's distinct expense days in date windows going back from
+    last_day and stops at the first gap, so the rows scanned are bounded by
+    about twice the length of the streak rather than the whole history.
+    """
+    if last_day is None:
+        return 0
+    day_column = func.date(Expense.date)
+    streak = 0
+    expected = last_day
+    window = STREAK_WINDOW_DAYS
+    while True:
+        end = datetime.combine(expected + timedelta(days=1), datetime.min.time())
+        start = end - timedelta(days=window)
+        days = db.query(day_column).filter(
+            Expense.user_id == user_id,
+            Expense.date >= start,
+            Expense.date < end
+        ).group_by(day_column).order_by(day_column.desc()).all()
+        for (day,) in days:
+            if _to_day(day) != expected:
+                return streak
+            streak += 1
+            expected -= timedelta(days=1)
+        if len(days) < window:
+            return streak
+        window *= 2
+
+def current_streak(stats, today=None):
+    """Streak as seen today: it lapses once a full day passes without expenses"""
+    if not stats or not stats.last_expense_date:
+        return 0
+    today = today or datetime.utcnow().date()
+    if (today - stats.last_expense_date).days > 1:
+        return 0
+    return stats.streak_days or 0
+
+def _get_tracked_stats(db, user_id):
+    """Return the user's stats if they are maintained incrementally
+
+    Users without a stats row, or with one written before incremental
+    maintenance existed, are rebuilt from their history once and None is
+    returned; the flushed write is already included in that rebuild.
+    """
+    stats = _stats_query(db, user_id).first()
+    if stats is None and not _create_stats(db, user_id):
+        # A concurrent first write created and rebuilt the row meanwhile;
+        # the insert waited for it to commit
+        return _stats_query(db, user_id).first()
+    if stats and not (stats.last_expense_date is None and stats.total_expenses):
+        return stats
+    reconcile_user_stats(db, user_id)
+    return None
+
+def ensure_stats_tracked(db, user_id):
+    """Rebuild the user's stats from history once if they are not
+    maintained incrementally yet
+
+    Call before an expense write whose deltas are applied later by the
+    derived job; a rebuild after the write would count it twice.
+    """
+    _get_tracked_stats(db, user_id)
+
+def _newest_day(db, user_id):
+    newest = db.query(func.max(Expense.date)).filter(Expense.user_id == user_id).scalar()
+    return _to_day(newest) if newest else None
+
+def _update_streak(db, user_id, stats, day_counts):
+    """Move the streak for {day: expense count delta} of a flushed write
+
+    Most writes land inside the streak or extend it by a day and cost no
+    query. The history is only walked back when a change can join the
+    streak to older days or end it.
+    """
+    last_day = stats.last_expense_date
+    added = [day for day, count in day_counts.items() if count > 0]
+    removed = [day for day, count in day_counts.items() if count < 0]
+    if last_day is None:
+        if added:
+            stats.last_expense_date = max(added)
+            stats.streak_days = compute_streak(db, user_id, stats.last_expense_date)
+        return
+
+    first_day = last_day - timedelta(days=max(stats.streak_days or 0, 1) - 1)
+    emptied = [
+        day for day in removed
+        if first_day <= day <= last_day and not _has_expense_on(db, user_id, day)
+    ]
+    if last_day in emptied:
+        stats.last_expense_date = _newest_day(db, user_id)
+        stats.streak_days = compute_streak(db, user_id, stats.last_expense_date)
+        return
+    if emptied:
+        # The streak now starts the day after the newest gap
+        first_day = max(emptied) + timedelta(days=1)
+        stats.streak_days = (last_day - first_day).days + 1
+
+    newest_added = max(added, default=last_day)
+    if newest_added > last_day + timedelta(days=1) or first_day - timedelta(days=1) in added:
+        # A new streak, or one that may now reach older days
+        stats.last_expense_date = max(newest_added, last_day)
+        stats.streak_days = compute_streak(db, user_id, stats.last_expense_date)
+    elif newest_added == last_day + timedelta(days=1):
+        stats.last_expense_date = newest_added
+        stats.streak_days += 1
+
+def apply_expense_deltas(db, user_id, day_deltas):
+    """Apply {(day, category): (count delta, amount delta)} from any mix of
+    added, deleted and updated (and flushed) expenses to the user's stats"""
+    stats = _get_tracked_stats(db, user_id)
+    if not stats or not day_deltas:
+        return
+    category_deltas = {}
+    day_counts = {}
+    for (day, category), (count, amount) in day_deltas.items():
+        category_count, category_amount = category_deltas.get(category, (0, 0.0))
+        category_deltas[category] = (category_count + count, category_amount + amount)
+        day_counts[day] = day_counts.get(day, 0) + count
+
+    _add_delta(db, stats, UserStats.total_expenses, sum(count for count, _ in category_deltas.values()))
+    _add_delta(db, stats, UserStats.total_amount, sum(amount for _, amount in category_deltas.values()))
+    stats.last_activity = datetime.utcnow()
+    for category, (count, amount) in sorted(category_deltas.items()):
+        if count or amount:
+            category_stats = _get_or_create_category_stats(db, user_id, category)
+            _add_delta(db, category_stats, CategoryStats.total_expenses, count)
+            _add_delta(db, category_stats, CategoryStats.total_amount, amount)
+    _update_streak(db, user_id, stats, day_counts)
+
+def reconcile_user_stats(db, user_id):
+    """Recompute a user's stats from their expenses, repairing any drift
+
+    Returns True if the stored values differed from the recomputed ones.
+    The caller is responsible for committing.
+    """
+    # Hold the stats row before counting: writes committing meanwhile wait
+    # for the rebuild rather than being overwritten by a stale count
+    stats = get_or_create_stats(db, user_id)
+    count, total, newest = db.query(
+        func.count(Expense.id),
+        func.coalesce(func.sum(Expense.amount), 0.0),
+        func.max(Expense.date)
+    ).filter(Expense.user_id == user_id).one()
+    last_day = _to_day(newest) if newest else None
+    streak = compute_streak(db, user_id, last_day)
+
+    drifted = (
+        stats.total_expenses != count
+        or abs((stats.total_amount or 0.0) - total) > 1e-6
+        or stats.last_expense_date != last_day
+        or stats.streak_days != streak
+    )
+    stats.total_expenses = count
+    stats.total_amount = total
+    stats.last_expense_date = last_day
+    stats.streak_days = streak
+
+    rows = db.query(Expense.category, func.count(Expense.id), func.sum(Expense.amount)).filter(
+        Expense.user_id == user_id
+    ).group_by(Expense.category).all()
+    expected = {category: (cat_count, cat_total) for category, cat_count, cat_total in rows}
+    existing = db.query(CategoryStats).filter(CategoryStats.user_id == user_id).with_for_update().all()
+    for category_stats in existing:
+        if category_stats.category not in expected:
+            drifted = drifted or category_stats.total_expenses != 0
+            db.delete(category_stats)
+            continue
+        cat_count, cat_total = expected.pop(category_stats.category)
+        if category_stats.total_expenses != cat_count or abs((category_stats.total_amount or 0.0) - cat_total) > 1e-6:
+            drifted = True
+        category_stats.total_expenses = cat_count
+        category_stats.total_amount = cat_total
+    for category, (cat_count, cat_total) in expected.items():
+        drifted = True
+        category_stats = _get_or_create_category_stats(db, user_id, category)
+        category_stats.total_expenses = cat_count
+        category_stats.total_amount = cat_total
+    return drifted
+
+def reconcile_all_stats(db):
+    """Reconcile every user's stats, committing per user
+
+    Returns (users checked, users repaired).
+    """
+    checked = repaired = 0
+    user_ids = [user_id for (user_id,) in db.query(User.id).all()]
+    for user_id in user_ids:
+        try:
+            if reconcile_user_stats(db, user_id):
+                repaired += 1
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"Error reconciling stats for user {user_id}: {e}")
+        checked += 1
+    return checked, repaired
@@ -0,0 +1,46 @@
+import os
+import uuid
+from cache import LRUCache
+from database import insert_ignoring_conflict
+from instrumentation import timed
+from models import User
+
+# Resolution of Firebase uids to FinMate user ids.
+#
+# The uid -> id mapping never changes once a user exists, so it is cached
+# per process. A cache hit costs no database round-trip, a miss costs one
+# SELECT, and only a user's very first request inserts and commits.
+
+USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', '10000'))
+
+user_id_cache = LRUCache(max_entries=USER_CACHE_SIZE)
+
+def _select_user_id(db, firebase_uid):
+    row = db.query(User.id).filter(User.firebase_uid == firebase_uid).first()
+    return row[0] if row else None
+
+@timed('user')
+def resolve_user_id(db, firebase_uid, email, display_name=None):
+    """Return the user id for a Firebase uid, creating the user if needed"""
+    user_id = user_id_cache.get(firebase_uid)
+    if user_id:
+        return user_id
+
+    user_id = _select_user_id(db, firebase_uid)
+    if not user_id:
+        # Concurrent first requests race safely on the unique firebase_uid
+        insert_ignoring_conflict(db, User, {
+            'id': str(uuid.uuid4()),
+            'firebase_uid': firebase_uid,
+            'email': email,
+            'display_name': display_name
+        }, ['firebase_uid'])
+        db.commit()
+        user_id = _select_user_id(db, firebase_uid)
+
+    user_id_cache.set(firebase_uid, user_id)
+    return user_id
+
+def get_or_create_user(db, firebase_uid, email, display_name=None):
+    """Get existing user or create new one"""
+    return db.get(User, resolve_user_id(db, firebase_uid, email, display_name))
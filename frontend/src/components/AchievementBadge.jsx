@@ -5,11 +5,15 @@ const AchievementBadge = ({ achievement, isUnlocked = false, showConfetti = fals
   const getAchievementIcon = (type) => {
     const icons = {
       'first_expense': Target,
+      'ten_expenses': Target,
+      'hundred_expenses': Award,
+      'thousand_expenses': Crown,
       'week_streak': Zap,
       'month_streak': Star,
-      'budget_master': Trophy,
-      'savings_goal': Award,
-      'financial_guru': Crown
+      'tracked_1000': Award,
+      'tracked_10000': Trophy,
+      'category_explorer': Star,
+      'category_specialist': Trophy
     }
     return icons[type] || Award
   }
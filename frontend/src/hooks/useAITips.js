@@ -32,13 +32,13 @@ export const useAITips = (expenses) => {
 
       try {
         const token = await user.getIdToken()
+        // The backend summarizes the user's spending itself; expenses only
+        // decide when to ask for a fresh tip
         const response = await fetch(`${API_URL}/api/tips`, {
           method: 'POST',
           headers: {
-            'Content-Type': 'application/json',
             'Authorization': `Bearer ${token}`
-          },
-          body: JSON.stringify({ expenses })
+          }
         })
 
         if (!response.ok) {
@@ -1,25 +1,40 @@
-import { useState, useEffect } from 'react'
+import { useState, useEffect, useRef } from 'react'
 import { openDB } from 'idb'
 import { useAuth } from '../contexts/AuthContext'
 
 const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:5000'
+// Mutations per POST /api/sync (the server's SYNC_MAX_MUTATIONS)
+const MAX_MUTATIONS = 500
 
 // Initialize IndexedDB
+//
+// - expenses: the local copy, keyed by client id or 'server:<id>'
+// - outbox: mutations made locally, replayed in order by POST /api/sync
+// - meta: the server data version of the last sync
 const initDB = async () => {
-  return openDB('finmate', 1, {
-    upgrade(db) {
-      if (!db.objectStoreNames.contains('expenses')) {
-        db.createObjectStore('expenses', { keyPath: 'id' })
+  return openDB('finmate', 2, {
+    upgrade(db, oldVersion) {
+      if (oldVersion < 2 && db.objectStoreNames.contains('expenses')) {
+        // Version 1 stores were keyed by local id; the next sync downloads
+        // everything again
+        db.deleteObjectStore('expenses')
       }
+      db.createObjectStore('expenses', { keyPath: 'key' })
+      db.createObjectStore('outbox', { keyPath: 'seq', autoIncrement: true })
+      db.createObjectStore('meta')
     },
   })
 }
 
+const expenseKey = (expense) => expense.client_id || `server:${expense.id}`
+
 export const useExpenses = () => {
   const [expenses, setExpenses] = useState([])
   const [loading, setLoading] = useState(false)
   const [db, setDB] = useState(null)
   const { user } = useAuth()
+  // false, true while a sync runs, or 'again' when another was requested
+  const syncing = useRef(false)
 
   useEffect(() => {
     initDB().then(setDB)
@@ -35,10 +50,8 @@ export const useExpenses = () => {
     if (!db) return
 
     try {
-      const tx = db.transaction('expenses', 'readonly')
-      const store = tx.objectStore('expenses')
-      const storedExpenses = await store.getAll()
-      
+      const storedExpenses = await db.getAll('expenses')
+
       // Sort by date (newest first)
       const sortedExpenses = storedExpenses.sort((a, b) => new Date(b.date) - new Date(a.date))
       setExpenses(sortedExpenses)
@@ -47,40 +60,32 @@ export const useExpenses = () => {
     }
   }
 
+  // Apply a local change and queue its mutation for the server
+  const queueMutation = async (mutation, apply) => {
+    const tx = db.transaction(['expenses', 'outbox'], 'readwrite')
+    await apply(tx.objectStore('expenses'))
+    await tx.objectStore('outbox').add(mutation)
+    await tx.done
+  }
+
   const addExpense = async (expense) => {
     if (!db) return
 
     setLoading(true)
     try {
-      // Add to IndexedDB first (for offline support)
-      const tx = db.transaction('expenses', 'readwrite')
-      const store = tx.objectStore('expenses')
-      await store.add(expense)
+      const client_id = crypto.randomUUID()
+      const record = { ...expense, client_id, key: client_id }
+      await queueMutation({
+        op: 'create',
+        client_id,
+        expense: { amount: expense.amount, category: expense.category, note: expense.note, date: expense.date },
+      }, store => store.put(record))
 
       // Update local state
-      setExpenses(prev => [expense, ...prev])
-
-      // Try to sync with backend if online
-      if (navigator.onLine && user) {
-        try {
-          const token = await user.getIdToken()
-          const response = await fetch(`${API_URL}/api/expenses`, {
-            method: 'POST',
-            headers: {
-              'Content-Type': 'application/json',
-              'Authorization': `Bearer ${token}`,
-            },
-            body: JSON.stringify(expense),
-          })
-
-          if (!response.ok) {
-            throw new Error('Failed to sync with server')
-          }
-        } catch (error) {
-          console.warn('Failed to sync expense with server:', error)
-          // Expense is still saved locally, will sync when online
-        }
-      }
+      setExpenses(prev => [record, ...prev])
+
+      // Sent now if online, otherwise when the connection comes back
+      syncWithServer()
     } catch (error) {
       console.error('Error adding expense:', error)
     } finally {
@@ -92,79 +97,112 @@ export const useExpenses = () => {
     if (!db) return
 
     try {
-      // Remove from IndexedDB
-      const tx = db.transaction('expenses', 'readwrite')
-      const store = tx.objectStore('expenses')
-      await store.delete(expenseId)
+      const expense = expenses.find(item => item.id === expenseId)
+      if (!expense) return
+      const mutation = expense.client_id
+        ? { op: 'delete', client_id: expense.client_id }
+        : { op: 'delete', id: expense.id }
+      await queueMutation(mutation, store => store.delete(expense.key))
 
       // Update local state
-      setExpenses(prev => prev.filter(expense => expense.id !== expenseId))
-
-      // Try to sync with backend if online
-      if (navigator.onLine && user) {
-        try {
-          const token = await user.getIdToken()
-          await fetch(`${API_URL}/api/expenses/${expenseId}`, {
-            method: 'DELETE',
-            headers: {
-              'Authorization': `Bearer ${token}`,
-            },
-          })
-        } catch (error) {
-          console.warn('Failed to sync deletion with server:', error)
-        }
-      }
+      setExpenses(prev => prev.filter(item => item.key !== expense.key))
+
+      syncWithServer()
     } catch (error) {
       console.error('Error deleting expense:', error)
     }
   }
 
-  const syncWithServer = async () => {
-    if (!navigator.onLine || !db || !user) return
-
-    try {
-      // Get all local expenses
-      const tx = db.transaction('expenses', 'readonly')
-      const store = tx.objectStore('expenses')
-      const localExpenses = await store.getAll()
-
-      // Get server expenses instead of sync endpoint
-      const token = await user.getIdToken()
-      const response = await fetch(`${API_URL}/api/expenses`, {
-        method: 'GET',
+  // Send queued mutations; false if the server could not take them all
+  const pushOutbox = async (token) => {
+    const queued = await db.getAll('outbox')
+    for (let i = 0; i < queued.length; i += MAX_MUTATIONS) {
+      const batch = queued.slice(i, i + MAX_MUTATIONS)
+      const response = await fetch(`${API_URL}/api/sync`, {
+        method: 'POST',
         headers: {
+          'Content-Type': 'application/json',
           'Authorization': `Bearer ${token}`,
         },
+        body: JSON.stringify({ mutations: batch.map(({ seq, ...mutation }) => mutation) }),
       })
+      if (!response.ok) return false
 
-      if (response.ok) {
-        const serverExpenses = await response.json()
-        
-        // Update local database with server data
-        const tx2 = db.transaction('expenses', 'readwrite')
-        const store2 = tx2.objectStore('expenses')
-        await store2.clear()
-        
-        for (const expense of serverExpenses) {
-          await store2.add(expense)
-        }
-
-        setExpenses(serverExpenses.sort((a, b) => new Date(b.date) - new Date(a.date)))
+      // Every result is final, invalid mutations included, and a batch
+      // whose response is lost is safe to send again
+      const tx = db.transaction('outbox', 'readwrite')
+      for (const { seq } of batch) {
+        await tx.store.delete(seq)
       }
+      await tx.done
+    }
+    return true
+  }
+
+  // Download the changes since the last sync
+  const pullChanges = async (token) => {
+    const since = (await db.get('meta', 'version')) || 0
+    const response = await fetch(`${API_URL}/api/sync?since=${since}`, {
+      method: 'GET',
+      headers: {
+        'Authorization': `Bearer ${token}`,
+      },
+    })
+    if (!response.ok) return
+
+    const changes = await response.json()
+    const tx = db.transaction(['expenses', 'meta'], 'readwrite')
+    const store = tx.objectStore('expenses')
+    if (changes.reset) {
+      await store.clear()
+    }
+    // Deletes first: the server may give a new expense a deleted one's id
+    for (const expense of changes.deleted) {
+      await store.delete(expenseKey(expense))
+    }
+    for (const expense of changes.upserted) {
+      await store.put({ ...expense, key: expenseKey(expense) })
+    }
+    await tx.objectStore('meta').put(changes.version, 'version')
+    await tx.done
+    await loadExpenses()
+  }
+
+  const syncWithServer = async () => {
+    if (!navigator.onLine || !db || !user) return
+    if (syncing.current) {
+      syncing.current = 'again'
+      return
+    }
+
+    try {
+      const token = await user.getIdToken()
+      do {
+        syncing.current = true
+        // Local changes go first, so a reset cannot drop them
+        if (await pushOutbox(token)) {
+          await pullChanges(token)
+        }
+      } while (syncing.current === 'again')
     } catch (error) {
       console.error('Error syncing with server:', error)
+    } finally {
+      syncing.current = false
     }
   }
 
-  // Auto-sync when coming back online
+  // Sync on start and when coming back online
   useEffect(() => {
+    if (!db || !user) return
+    syncWithServer()
+
     const handleOnline = () => {
       syncWithServer()
     }
 
     window.addEventListener('online', handleOnline)
     return () => window.removeEventListener('online', handleOnline)
-  }, [db])
+  }, [db, user])
 
   return {
     expenses,
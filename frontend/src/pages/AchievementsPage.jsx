@@ -8,85 +8,19 @@ import { useAuth } from '../contexts/AuthContext'
 const AchievementsPage = () => {
   const { user } = useAuth()
   const [achievements, setAchievements] = useState([])
-  const [userStats, setUserStats] = useState(null)
+  const [points, setPoints] = useState(0)
   const [loading, setLoading] = useState(true)
 
-  // Mock achievements data (in real app, this would come from backend)
-  const mockAchievements = [
-    {
-      id: 1,
-      type: 'first_expense',
-      title: 'First Steps',
-      description: 'Add your first expense',
-      rarity: 'common',
-      target: 1,
-      current: 1,
-      progress: 100,
-      unlockedAt: new Date().toISOString()
-    },
-    {
-      id: 2,
-      type: 'week_streak',
-      title: 'Week Warrior',
-      description: 'Track expenses for 7 consecutive days',
-      rarity: 'rare',
-      target: 7,
-      current: 3,
-      progress: 43
-    },
-    {
-      id: 3,
-      type: 'month_streak',
-      title: 'Monthly Master',
-      description: 'Track expenses for 30 consecutive days',
-      rarity: 'epic',
-      target: 30,
-      current: 3,
-      progress: 10
-    },
-    {
-      id: 4,
-      type: 'budget_master',
-      title: 'Budget Boss',
-      description: 'Stay under budget for 3 months',
-      rarity: 'legendary',
-      target: 3,
-      current: 0,
-      progress: 0
-    },
-    {
-      id: 5,
-      type: 'savings_goal',
-      title: 'Savings Superstar',
-      description: 'Save $1000 in total',
-      rarity: 'epic',
-      target: 1000,
-      current: 250,
-      progress: 25
-    },
-    {
-      id: 6,
-      type: 'financial_guru',
-      title: 'Financial Guru',
-      description: 'Complete all learning modules',
-      rarity: 'legendary',
-      target: 12,
-      current: 2,
-      progress: 17
-    }
-  ]
-
   useEffect(() => {
-    fetchUserStats()
-    // In real app, fetch actual achievements from backend
-    setAchievements(mockAchievements)
-    setLoading(false)
-  }, [])
+    fetchAchievements()
+  }, [user])
 
-  const fetchUserStats = async () => {
+  // Progress is computed on the server from the user's running stats
+  const fetchAchievements = async () => {
+    if (!user) return
     try {
-      const token = await user?.getIdToken()
-      const response = await fetch(`${import.meta.env.VITE_API_URL}/api/stats`, {
+      const token = await user.getIdToken()
+      const response = await fetch(`${import.meta.env.VITE_API_URL}/api/achievements`, {
         headers: {
           'Authorization': `Bearer ${token}`,
           'Content-Type': 'application/json'
@@ -95,27 +29,22 @@ const AchievementsPage = () => {
       
       if (response.ok) {
         const data = await response.json()
-        setUserStats(data)
+        setAchievements(data.achievements.map(achievement => ({
+          ...achievement,
+          type: achievement.id,
+          unlockedAt: achievement.unlocked_at
+        })))
+        setPoints(data.points)
       }
     } catch (error) {
-      console.error('Error fetching user stats:', error)
+      console.error('Error fetching achievements:', error)
+    } finally {
+      setLoading(false)
     }
   }
 
-  const unlockedAchievements = achievements.filter(a => a.progress >= 100)
-  const lockedAchievements = achievements.filter(a => a.progress < 100)
-
-  const getTotalPoints = () => {
-    return unlockedAchievements.reduce((total, achievement) => {
-      const points = {
-        'common': 10,
-        'rare': 25,
-        'epic': 50,
-        'legendary': 100
-      }
-      return total + (points[achievement.rarity] || 0)
-    }, 0)
-  }
+  const unlockedAchievements = achievements.filter(a => a.unlocked)
+  const lockedAchievements = achievements.filter(a => !a.unlocked)
 
   if (loading) {
     return (
@@ -172,7 +101,7 @@ const AchievementsPage = () => {
               <Trophy className="w-6 h-6 text-white" />
             </div>
             <h3 className="font-semibold text-gray-900 dark:text-white text-sm sm:text-base">Total Points</h3>
-            <p className="text-xl sm:text-2xl font-bold text-yellow-600">{getTotalPoints()}</p>
+            <p className="text-xl sm:text-2xl font-bold text-yellow-600">{points}</p>
           </div>
           
           <div className="card text-center">
@@ -197,7 +126,7 @@ const AchievementsPage = () => {
             </div>
             <h3 className="font-semibold text-gray-900 dark:text-white text-sm sm:text-base">Completion</h3>
             <p className="text-xl sm:text-2xl font-bold text-purple-600">
-              {Math.round((unlockedAchievements.length / achievements.length) * 100)}%
+              {achievements.length ? Math.round((unlockedAchievements.length / achievements.length) * 100) : 0}%
             </p>
           </div>
         </motion.div>
@@ -220,7 +149,7 @@ const AchievementsPage = () => {
           <div className="w-full bg-gray-200 dark:bg-gray-700 rounded-full h-4">
             <div 
               className="h-4 bg-gradient-to-r from-primary-500 to-secondary-500 rounded-full transition-all duration-1000 ease-out"
-              style={{ width: `${(unlockedAchievements.length / achievements.length) * 100}%` }}
+              style={{ width: `${achievements.length ? (unlockedAchievements.length / achievements.length) * 100 : 0}%` }}
             />
           </div>
         </motion.div>
@@ -13,19 +13,20 @@ if [ -z "$DATABASE_URL" ] || [ "$DATABASE_URL" = "postgresql://username:password
     export DATABASE_URL="sqlite:///finmate.db"
 fi
 
-# Initialize database tables
+# Create tables and apply schema migrations once, before any worker starts
 echo "Initializing database..."
-python -c "
-try:
-    from app import app, db
-    with app.app_context():
-        db.create_all()
-        print('Database tables created successfully!')
-except Exception as e:
-    print(f'Database initialization error: {e}')
-    print('Continuing with startup...')
-"
+if ! flask --app app migrate; then
+    echo "Database initialization error"
+    echo "Continuing with startup..."
+fi
+
+# SERVER_MODE=asgi serves the app with uvicorn (see asgi.py), so slow
+# model calls and queries do not block other requests
+if [ "$SERVER_MODE" = "asgi" ]; then
+    echo "Starting uvicorn server..."
+    exec uvicorn --factory asgi:create_asgi_app --host 0.0.0.0 --port $PORT --workers 1 --log-level info
+fi
 
 # Start the Flask application with gunicorn
 echo "Starting gunicorn server..."
-exec gunicorn --bind 0.0.0.0:$PORT --workers 1 --timeout 120 --log-level info app:app
+exec gunicorn --bind 0.0.0.0:$PORT --workers 1 --timeout 120 --log-level info 'app:create_app()'